@@ -0,0 +1,186 @@
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Generator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from libs.cache import IndexGeneration
+
+
+@dataclass
+class CachedAnswer:
+    """A streamed answer recorded for replay."""
+
+    embedding: np.ndarray
+    chunks: List[str]
+    sources: List[str]
+    created_at: float = field(default_factory=time.monotonic)
+
+    def replay(self) -> Generator[Union[str, List[str]], None, None]:
+        """
+        Replay the answer with the same protocol as ``chat_answer``.
+
+        Yields:
+            Union[str, List[str]]: Text chunks, followed by the list of sources.
+        """
+        yield from self.chunks
+        yield list(self.sources)
+
+
+def hash_chat_history(chat_history: Optional[List[Dict[str, str]]], turns: int) -> str:
+    """
+    Hash the most recent messages of a formatted chat history.
+
+    Args:
+        chat_history (Optional[List[Dict[str, str]]]): History from ``format_chat_history``.
+        turns (int): Number of trailing messages included in the hash.
+
+    Returns:
+        str: Hex digest of the recent history.
+    """
+    recent = (chat_history or [])[-turns:] if turns > 0 else []
+    return hashlib.sha256(json.dumps(recent, sort_keys=True).encode()).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of chat answers for near-duplicate questions.
+
+    Answers are grouped by research area and recent chat history. A question
+    hits the cache when the cosine similarity between its embedding and a
+    cached question is at least ``threshold``. Every entry is dropped when
+    the index generation changes, i.e. when a paper is added or removed.
+
+    Args:
+        generation (IndexGeneration): Generation of the indexed papers.
+        threshold (float): Minimum cosine similarity for a hit.
+        maxsize (int): Maximum number of cached answers.
+        ttl (Optional[float]): Seconds an answer stays valid.
+    """
+
+    def __init__(
+        self,
+        generation: IndexGeneration,
+        threshold: float = 0.95,
+        maxsize: int = 256,
+        ttl: Optional[float] = None,
+    ):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generation = generation
+        self._seen_generation = generation.current()
+        self._entries: Dict[Tuple[str, str], List[CachedAnswer]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self) -> int:
+        generation = self._generation.current()
+        if generation != self._seen_generation:
+            self._entries.clear()
+            self._seen_generation = generation
+        return generation
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl is not None and entry.created_at + self.ttl < time.monotonic()
+
+    def lookup(
+        self, embedding: List[float], research_area: str, history_key: str
+    ) -> Tuple[Optional[CachedAnswer], int]:
+        """
+        Find a cached answer for a similar question.
+
+        Args:
+            embedding (List[float]): Embedding of the question.
+            research_area (str): Research area selected by the user.
+            history_key (str): Hash of the recent chat history.
+
+        Returns:
+            Tuple[Optional[CachedAnswer], int]: The closest cached answer above
+                the threshold, and the index generation it was looked up in,
+                to pass to ``store`` with the answer generated on a miss.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            generation = self._check_generation()
+            bucket = self._entries.get((research_area, history_key), [])
+            bucket[:] = [entry for entry in bucket if not self._expired(entry)]
+            if bucket:
+                similarities = np.stack([entry.embedding for entry in bucket]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return bucket[best], generation
+            self.misses += 1
+            return None, generation
+
+    def store(
+        self,
+        embedding: List[float],
+        research_area: str,
+        history_key: str,
+        chunks: List[str],
+        sources: List[str],
+        generation: int,
+    ) -> None:
+        """
+        Record a fully streamed answer.
+
+        The answer is dropped if papers were added or removed since the
+        lookup, since it was generated from the previous index.
+
+        Args:
+            embedding (List[float]): Embedding of the question.
+            research_area (str): Research area selected by the user.
+            history_key (str): Hash of the recent chat history.
+            chunks (List[str]): Streamed text chunks, in order.
+            sources (List[str]): Sources yielded at the end of the stream.
+            generation (int): Generation returned by ``lookup``.
+        """
+        entry = CachedAnswer(self._normalize(embedding), list(chunks), list(sources))
+        with self._lock:
+            if self._check_generation() != generation:
+                return
+            self._entries.setdefault((research_area, history_key), []).append(entry)
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = [
+            (entry.created_at, key, entry)
+            for key, bucket in self._entries.items()
+            for entry in bucket
+        ]
+        for _, key, entry in sorted(entries, key=lambda item: item[0])[
+            : max(len(entries) - self.maxsize, 0)
+        ]:
+            self._entries[key].remove(entry)
+            if not self._entries[key]:
+                del self._entries[key]
+
+    def invalidate(self) -> None:
+        """Drop every cached answer in this process."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the cache counters.
+
+        Returns:
+            Dict[str, int]: Number of entries, hits and misses.
+        """
+        return {
+            "size": sum(len(bucket) for bucket in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from libs.config import RESEARCH_AREAS, Config
+from libs.inference import achat_answer
+from libs.limiter import DeadlineExceeded
+from libs.resources import warm_up
+from libs.tracing import metrics
+
+config = Config()
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_ROLES = ("user", "assistant")
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted.
+
+    Args:
+        status_code (int): 429 when the queue is full, 503 when the wait timed out.
+        reason (str): Short description for the response and metrics.
+    """
+
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Cap concurrent chat streams, with a bounded queue of waiting requests.
+
+    Requests beyond ``max_concurrency`` wait in a queue of ``max_queue``
+    slots. A full queue rejects immediately with 429, and a request that
+    waits longer than ``queue_timeout`` seconds is rejected with 503, so
+    overload shows up as fast errors instead of piling up latency.
+
+    Args:
+        max_concurrency (int): Streams served at the same time.
+        max_queue (int): Requests allowed to wait for a slot.
+        queue_timeout (float): Seconds a request may wait.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot.
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out.
+        """
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            raise Overloaded(429, "queue full")
+
+        self.waiting += 1
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded(503, "queue timeout") from None
+        finally:
+            self.waiting -= 1
+            metrics.observe(
+                "api_queue_seconds",
+                "Time chat requests waited for a slot.",
+                time.perf_counter() - started_at,
+            )
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def retry_after(self) -> int:
+        return max(1, int(self.queue_timeout))
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that frees its admission slot however it ends.
+
+    The slot is released when the response has been sent, failed, or was
+    cancelled by a client disconnect, including before the body generator
+    started, in which case the generator is closed without running.
+
+    Args:
+        content (AsyncIterator[str]): Body of the response.
+        release (Callable[[], None]): Frees the admission slot.
+        **kwargs: Arguments of ``StreamingResponse``.
+    """
+
+    def __init__(
+        self, content: AsyncIterator[str], release: Callable[[], None], **kwargs: Any
+    ):
+        super().__init__(content, **kwargs)
+        self._content = content
+        self._release = release
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+            await self._content.aclose()
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event (str): Event name.
+        data (Dict[str, Any]): JSON payload.
+
+    Returns:
+        str: The event, ending with a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_answer(
+    question: str,
+    messages: List[Dict[str, str]],
+    research_area: str,
+    session_id: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream ``achat_answer`` as Server-Sent Events.
+
+    Text chunks are sent as ``token`` events and source lists as ``sources``
+    events; the stream ends with ``done``, or ``error`` if the answer failed.
+
+    Args:
+        question (str): The user's question.
+        messages (List[Dict[str, str]]): Conversation, ending with the question.
+        research_area (str): Research area used to filter the documents.
+        session_id (Optional[str]): Session of the user, for fair queueing.
+
+    Yields:
+        str: Formatted events.
+    """
+    try:
+        answer = achat_answer(question, messages, research_area, session_id)
+        async with aclosing(answer):
+            async for chunk in answer:
+                if isinstance(chunk, list):
+                    yield format_event("sources", {"sources": chunk})
+                else:
+                    yield format_event("token", {"text": chunk})
+    except DeadlineExceeded:
+        yield format_event("error", {"detail": "The server is overloaded."})
+        return
+    except Exception:
+        logger.exception("Failed to answer a chat request")
+        yield format_event("error", {"detail": "Failed to answer the question."})
+        return
+    yield format_event("done", {})
+
+
+async def chat(request: Request) -> Any:
+    """
+    Answer a question as a stream of Server-Sent Events.
+
+    The JSON body has a ``question``, an optional ``research_area`` and
+    optional ``messages`` in the Streamlit format. Requests are queued
+    fairly by the ``X-Session-Id`` header, or by client address without it.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"detail": "The body must be JSON."}, status_code=400)
+
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        return JSONResponse({"detail": "A question is required."}, status_code=400)
+    research_area = body.get("research_area", "All")
+    if research_area != "All" and research_area not in RESEARCH_AREAS:
+        return JSONResponse({"detail": "Unknown research area."}, status_code=400)
+    messages = body.get("messages") or []
+    if not isinstance(messages, list) or not all(
+        isinstance(message, dict)
+        and message.get("role") in MESSAGE_ROLES
+        and isinstance(message.get("content"), str)
+        for message in messages
+    ):
+        return JSONResponse(
+            {"detail": "Messages must be a list of role and content objects."},
+            status_code=400,
+        )
+    messages = [
+        {"role": message["role"], "content": message["content"]} for message in messages
+    ]
+    if not messages or messages[-1] != {"role": "user", "content": question}:
+        messages.append({"role": "user", "content": question})
+
+    # Without a header the request gets a session of its own: behind a proxy
+    # every client has the same address, so one would throttle all of them.
+    session_id = request.headers.get("x-session-id")
+
+    admission: AdmissionController = request.app.state.admission
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        metrics.inc(
+            "api_rejections_total", "Chat requests rejected by reason.", reason=e.reason
+        )
+        return JSONResponse(
+            {"detail": f"The server is overloaded ({e.reason})."},
+            status_code=e.status_code,
+            headers={"Retry-After": str(admission.retry_after())},
+        )
+
+    return AdmittedStreamingResponse(
+        stream_answer(question, messages, research_area, session_id),
+        release=admission.release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def health(request: Request) -> Any:
+    admission: AdmissionController = request.app.state.admission
+    return JSONResponse({"active": admission.active, "waiting": admission.waiting})
+
+
+async def metrics_endpoint(request: Request) -> Any:
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    app.state.admission = AdmissionController(
+        config.API_MAX_CONCURRENCY, config.API_MAX_QUEUE, config.API_QUEUE_TIMEOUT
+    )
+    await asyncio.to_thread(warm_up)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/health", health),
+        Route("/metrics", metrics_endpoint),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description="Serve the chat as Server-Sent Events."
+    )
+    argument_parser.add_argument("--host", default="0.0.0.0")
+    argument_parser.add_argument("--port", type=int, default=8000)
+    argument_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes; the concurrency and queue limits apply to each.",
+    )
+    arguments = argument_parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        "libs.api:app",
+        host=arguments.host,
+        port=arguments.port,
+        workers=arguments.workers,
+        timeout_graceful_shutdown=30,
+    )
+
+
+if __name__ == "__main__":
+    main()
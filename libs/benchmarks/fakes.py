@@ -0,0 +1,491 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import numpy as np
+from llama_index.core import Document
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import (
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from libs.local_vector_store import LocalVectorStore
+
+VOCABULARY = (
+    "robot formation control quadrotor drone trajectory tracking controller "
+    "lyapunov stability kinematic dynamic model mobile ground aerial swarm "
+    "leader follower consensus obstacle avoidance path planning sensor fusion "
+    "localization mapping vision camera lidar imu estimation kalman filter "
+    "human interaction gesture teleoperation education competition learning "
+    "neural network reinforcement policy simulation experiment platform "
+    "actuator torque velocity position error gain adaptive robust nonlinear"
+).split()
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class Latency:
+    """
+    Latency distribution of a fake API call.
+
+    Samples are log-normal around ``median``. A ``sigma`` of zero gives a
+    constant latency.
+
+    Args:
+        median (float): Median latency in seconds.
+        sigma (float, optional): Log-normal shape parameter. Defaults to 0.
+        seed (int, optional): Seed of the sampler. Defaults to 0.
+    """
+
+    def __init__(self, median: float, sigma: float = 0.0, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, value: str, seed: int = 0) -> "Latency":
+        """
+        Parse ``median[:sigma]``, e.g. ``0.2:0.5``.
+
+        Args:
+            value (str): Latency specification.
+            seed (int, optional): Seed of the sampler. Defaults to 0.
+
+        Returns:
+            Latency: The distribution.
+        """
+        median, _, sigma = value.partition(":")
+        return cls(float(median), float(sigma or 0), seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median
+        return self._random.lognormvariate(np.log(self.median), self.sigma)
+
+    def sleep(self) -> None:
+        time.sleep(self.sample())
+
+    async def asleep(self) -> None:
+        await asyncio.sleep(self.sample())
+
+
+DEFAULT_LATENCIES = {
+    "chat": 0.6,
+    "first_token": 0.4,
+    "token": 0.02,
+    "rerank": 0.15,
+    "embed": 0.1,
+    "vector_query": 0.05,
+    "vector_write": 0.08,
+    "parse": 1.5,
+}
+
+
+def create_latencies(
+    overrides: Optional[Dict[str, str]] = None, sigma: float = 0.3, seed: int = 0
+) -> Dict[str, Latency]:
+    """
+    Build the latency distributions of every fake call.
+
+    Args:
+        overrides (Optional[Dict[str, str]]): ``median[:sigma]`` per call name.
+        sigma (float, optional): Default log-normal shape. Defaults to 0.3.
+        seed (int, optional): Base seed of the samplers. Defaults to 0.
+
+    Returns:
+        Dict[str, Latency]: Distributions keyed by call name.
+
+    Raises:
+        ValueError: If an override names an unknown call.
+    """
+    overrides = overrides or {}
+    unknown = set(overrides) - set(DEFAULT_LATENCIES)
+    if unknown:
+        raise ValueError(f"Unknown latency names: {', '.join(sorted(unknown))}")
+    latencies = {}
+    for offset, (name, median) in enumerate(sorted(DEFAULT_LATENCIES.items())):
+        if name in overrides:
+            latencies[name] = Latency.parse(overrides[name], seed + offset)
+        else:
+            latencies[name] = Latency(median, sigma, seed + offset)
+    return latencies
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def fake_embedding(text: str, dimension: int) -> List[float]:
+    """
+    Embed text deterministically as a hashed bag of words.
+
+    Texts that share words get similar vectors, so retrieval over fake
+    embeddings still returns related chunks.
+
+    Args:
+        text (str): Text to embed.
+        dimension (int): Size of the vector.
+
+    Returns:
+        List[float]: Unit-length embedding.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for token in tokenize(text) or [""]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimension
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+class _FakeCohere:
+    def __init__(
+        self,
+        latencies: Dict[str, Latency],
+        dimension: int = 256,
+        answer_tokens: int = 80,
+    ):
+        self.latencies = latencies
+        self.dimension = dimension
+        self.answer_tokens = answer_tokens
+        self.calls: Dict[str, int] = {}
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _search_queries(self, message: str) -> SimpleNamespace:
+        keywords = [token for token in tokenize(message) if token in VOCABULARY]
+        queries = [message]
+        if keywords:
+            queries.append(" ".join(keywords))
+        return SimpleNamespace(
+            search_queries=[SimpleNamespace(text=query) for query in queries],
+            text="",
+            meta=self._meta(
+                len(tokenize(message)), sum(len(tokenize(query)) for query in queries)
+            ),
+        )
+
+    @staticmethod
+    def _meta(input_tokens: int, output_tokens: int) -> Any:
+        return SimpleNamespace(
+            billed_units=SimpleNamespace(
+                input_tokens=input_tokens, output_tokens=output_tokens
+            )
+        )
+
+    def _answer_tokens(self, message: str) -> List[str]:
+        words = tokenize(message) or ["answer"]
+        return [
+            f"{words[i % len(words)]} " if i % 7 else f"{VOCABULARY[i % 50]}. "
+            for i in range(self.answer_tokens)
+        ]
+
+    @staticmethod
+    def _document_ids(documents: Optional[List[Dict[str, str]]]) -> List[str]:
+        return [
+            document.get("id", f"doc_{index}")
+            for index, document in enumerate(documents or [])
+        ]
+
+    def _stream_end(
+        self, message: str, documents: Optional[List[Dict[str, str]]]
+    ) -> Any:
+        input_tokens = len(tokenize(message)) + sum(
+            len(tokenize(document.get("snippet", ""))) for document in documents or []
+        )
+        return SimpleNamespace(
+            event_type="stream-end",
+            response=SimpleNamespace(
+                documents=[
+                    {**document, "id": document_id}
+                    for document_id, document in zip(
+                        self._document_ids(documents), documents or []
+                    )
+                ],
+                meta=self._meta(input_tokens, self.answer_tokens),
+            ),
+        )
+
+    def _citations(self, document_ids: List[str], index: int) -> Any:
+        return SimpleNamespace(
+            event_type="citation-generation",
+            citations=[SimpleNamespace(document_ids=[document_ids[index]])],
+        )
+
+    def _rerank(self, query: str, documents: List[str], top_n: int) -> Any:
+        query_tokens = set(tokenize(query))
+        scores = [
+            len(query_tokens & set(tokenize(document))) / (len(query_tokens) or 1)
+            for document in documents
+        ]
+        ranking = sorted(range(len(documents)), key=lambda i: (-scores[i], i))
+        return SimpleNamespace(
+            results=[
+                SimpleNamespace(index=i, relevance_score=scores[i])
+                for i in ranking[:top_n]
+            ]
+        )
+
+    def _embed(self, texts: List[str]) -> Any:
+        return SimpleNamespace(
+            embeddings=SimpleNamespace(
+                float_=[fake_embedding(text, self.dimension) for text in texts]
+            )
+        )
+
+
+class FakeCohereClient(_FakeCohere):
+    """
+    Stand-in for ``cohere.Client`` with injected latency.
+
+    Args:
+        latencies (Dict[str, Latency]): Distributions from ``create_latencies``.
+        dimension (int, optional): Embedding size. Defaults to 256.
+        answer_tokens (int, optional): Tokens per streamed answer. Defaults to 80.
+    """
+
+    def chat(
+        self, message: str, search_queries_only: bool = False, **kwargs: Any
+    ) -> Any:
+        self._count("chat")
+        self.latencies["chat"].sleep()
+        if search_queries_only:
+            return self._search_queries(message)
+        return SimpleNamespace(text="".join(self._answer_tokens(message)))
+
+    def chat_stream(
+        self,
+        message: str,
+        documents: Optional[List[Dict[str, str]]] = None,
+        **kwargs: Any,
+    ) -> Iterator[Any]:
+        self._count("chat_stream")
+        self.latencies["first_token"].sleep()
+        document_ids = self._document_ids(documents)
+        for index, token in enumerate(self._answer_tokens(message)):
+            if index:
+                self.latencies["token"].sleep()
+            yield SimpleNamespace(event_type="text-generation", text=token)
+            if index % 20 == 19 and index // 20 < len(document_ids):
+                yield self._citations(document_ids, index // 20)
+        yield self._stream_end(message, documents)
+
+    def rerank(self, query: str, documents: List[str], top_n: int, **kwargs) -> Any:
+        self._count("rerank")
+        self.latencies["rerank"].sleep()
+        return self._rerank(query, documents, top_n)
+
+    def embed(self, texts: List[str], **kwargs: Any) -> Any:
+        self._count("embed")
+        self.latencies["embed"].sleep()
+        return self._embed(texts)
+
+
+class FakeAsyncCohereClient(_FakeCohere):
+    """
+    Stand-in for ``cohere.AsyncClient`` with injected latency.
+
+    Args:
+        latencies (Dict[str, Latency]): Distributions from ``create_latencies``.
+        dimension (int, optional): Embedding size. Defaults to 256.
+        answer_tokens (int, optional): Tokens per streamed answer. Defaults to 80.
+    """
+
+    async def chat(
+        self, message: str, search_queries_only: bool = False, **kwargs: Any
+    ) -> Any:
+        self._count("chat")
+        await self.latencies["chat"].asleep()
+        if search_queries_only:
+            return self._search_queries(message)
+        return SimpleNamespace(text="".join(self._answer_tokens(message)))
+
+    async def chat_stream(
+        self,
+        message: str,
+        documents: Optional[List[Dict[str, str]]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Any]:
+        self._count("chat_stream")
+        await self.latencies["first_token"].asleep()
+        document_ids = self._document_ids(documents)
+        for index, token in enumerate(self._answer_tokens(message)):
+            if index:
+                await self.latencies["token"].asleep()
+            yield SimpleNamespace(event_type="text-generation", text=token)
+            if index % 20 == 19 and index // 20 < len(document_ids):
+                yield self._citations(document_ids, index // 20)
+        yield self._stream_end(message, documents)
+
+    async def rerank(
+        self, query: str, documents: List[str], top_n: int, **kwargs
+    ) -> Any:
+        self._count("rerank")
+        await self.latencies["rerank"].asleep()
+        return self._rerank(query, documents, top_n)
+
+    async def embed(self, texts: List[str], **kwargs: Any) -> Any:
+        self._count("embed")
+        await self.latencies["embed"].asleep()
+        return self._embed(texts)
+
+
+class FakePineconeVectorStore(LocalVectorStore):
+    """
+    Local vector store that adds the latency of a remote Pinecone index.
+
+    Args:
+        persist_path (str): Directory holding the snapshot files.
+        latencies (Dict[str, Latency]): Distributions from ``create_latencies``.
+    """
+
+    _latencies: Dict[str, Latency] = PrivateAttr()
+
+    def __init__(self, persist_path: str, latencies: Dict[str, Latency], **kwargs):
+        super().__init__(persist_path=persist_path, **kwargs)
+        self._latencies = latencies
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakePineconeVectorStore"
+
+    def add(self, nodes, **add_kwargs: Any) -> List[str]:
+        self._latencies["vector_write"].sleep()
+        return super().add(nodes, **add_kwargs)
+
+    def delete_nodes(self, node_ids=None, filters=None, **delete_kwargs: Any) -> None:
+        self._latencies["vector_write"].sleep()
+        super().delete_nodes(node_ids, filters, **delete_kwargs)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        self._latencies["vector_query"].sleep()
+        return super().query(query, **kwargs)
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        await self._latencies["vector_query"].asleep()
+        return super().query(query, **kwargs)
+
+
+class FakeLlamaParse:
+    """
+    Stand-in for ``LlamaParse`` that turns any file into synthetic markdown.
+
+    The text depends only on the file contents, so the same file always
+    parses to the same document.
+
+    Args:
+        latency (Latency): Parse latency per file.
+        sections (int, optional): Sections per document. Defaults to 12.
+        sentences (int, optional): Sentences per section. Defaults to 8.
+    """
+
+    def __init__(self, latency: Latency, sections: int = 12, sentences: int = 8):
+        self.latency = latency
+        self.sections = sections
+        self.sentences = sentences
+
+    def load_data(self, file_path: str) -> List[Document]:
+        self.latency.sleep()
+        with open(file_path, "rb") as file:
+            digest = hashlib.sha256(file.read()).digest()
+        generator = random.Random(digest)
+
+        def sentence() -> str:
+            words = generator.choices(VOCABULARY, k=generator.randint(8, 20))
+            return " ".join(words).capitalize() + "."
+
+        lines = [f"# {' '.join(generator.choices(VOCABULARY, k=6)).title()}", ""]
+        for section in range(self.sections):
+            lines.append(f"## {section + 1}. {generator.choice(VOCABULARY).title()}")
+            lines.append("")
+            lines.append(" ".join(sentence() for _ in range(self.sentences)))
+            lines.append("")
+        return [Document(text="\n".join(lines))]
+
+
+def install_fakes(
+    directory: str,
+    latencies: Dict[str, Latency],
+    dimension: int = 256,
+    answer_tokens: int = 80,
+) -> Dict[str, Any]:
+    """
+    Replace every external client of the resource layer with a fake.
+
+    Stores and caches are created under ``directory`` so runs never touch
+    the application's data.
+
+    Args:
+        directory (str): Scratch directory for the stores.
+        latencies (Dict[str, Latency]): Distributions from ``create_latencies``.
+        dimension (int, optional): Embedding size. Defaults to 256.
+        answer_tokens (int, optional): Tokens per streamed answer. Defaults to 80.
+
+    Returns:
+        Dict[str, Any]: The fake clients, keyed by name.
+    """
+    from llama_index.core.llms.mock import MockLLM
+
+    from libs import resources
+    from libs.cache import IndexGeneration
+    from libs.config import RESEARCH_AREAS, Config
+    from libs.lexical_index import LexicalIndex
+    from libs.paper_ledger import PaperLedger
+    from libs.parse_cache import ParseCache
+    from libs.table_summaries import TableSummaryCache
+    from libs.vector_stores import PartitionedVectorStore, partition_path
+
+    resources.clear_resources()
+    client = FakeCohereClient(latencies, dimension, answer_tokens)
+    async_client = FakeAsyncCohereClient(latencies, dimension, answer_tokens)
+    vector_store_path = os.path.join(directory, "vector_store")
+    if Config().VECTOR_STORE_PARTITIONING:
+        vector_store = PartitionedVectorStore(
+            lambda name: FakePineconeVectorStore(
+                partition_path(vector_store_path, name), latencies
+            ),
+            RESEARCH_AREAS,
+        )
+    else:
+        vector_store = FakePineconeVectorStore(vector_store_path, latencies)
+    parser = FakeLlamaParse(latencies["parse"])
+
+    resources.get_cohere_client.set(client)
+    resources.get_async_cohere_factory.set(lambda: async_client)
+    resources.get_llm.set(MockLLM())
+    resources.get_vector_store.set(vector_store)
+    resources.get_parser.set(parser)
+    resources.get_parse_cache.set(
+        ParseCache(os.path.join(directory, "parse"), 64 * 1024 * 1024)
+    )
+    resources.get_table_summary_cache.set(
+        TableSummaryCache(os.path.join(directory, "table_summaries.sqlite3"))
+    )
+    resources.get_index_generation.set(
+        IndexGeneration(os.path.join(directory, "index_generation"))
+    )
+    resources.get_lexical_index.set(
+        LexicalIndex(os.path.join(directory, "lexical_index.sqlite3"))
+    )
+    resources.get_paper_ledger.set(
+        PaperLedger(os.path.join(directory, "paper_ledger.json"))
+    )
+    return {
+        "cohere": client,
+        "async_cohere": async_client,
+        "vector_store": vector_store,
+        "parser": parser,
+    }
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+MODULES = {
+    "libs.inference": "CHAT_RESOURCES",
+    "libs.indexing_articles": "INDEXING_RESOURCES",
+}
+
+# Clients are built with placeholder keys, which they accept without calling
+# their APIs, and the local vector store stands in for Pinecone, whose client
+# looks the index up over the network. That keeps the benchmark offline.
+OFFLINE_ENVIRONMENT = {
+    "COHERE_API_KEY": "offline",
+    "GROQ_API_KEY": "offline",
+    "LLAMA_CLOUD_API_KEY": "offline",
+    "PINECONE_API_KEY": "offline",
+    "VECTOR_STORE_BACKEND": "local",
+}
+
+SCRIPT = """
+import time
+started_at = time.perf_counter()
+import {module}
+imported_at = time.perf_counter()
+if {eager}:
+    from libs import resources
+    resources.warm_up(resources.{resources})
+print(imported_at - started_at, time.perf_counter() - started_at)
+"""
+
+
+def measure(module: str, eager: bool, runs: int) -> Dict[str, float]:
+    """
+    Time a module import in fresh interpreters.
+
+    The interpreters run offline, with ``OFFLINE_ENVIRONMENT`` and their
+    stores under a scratch ``CACHE_DIR``.
+
+    Args:
+        module (str): Module to import.
+        eager (bool): Whether to also initialize the module's resources, which
+            is what importing the module used to cost.
+        runs (int): Number of interpreters to start.
+
+    Returns:
+        Dict[str, float]: Median import and total seconds.
+
+    Raises:
+        RuntimeError: If the interpreter fails.
+    """
+    script = SCRIPT.format(module=module, eager=eager, resources=MODULES[module])
+    imports: List[float] = []
+    totals: List[float] = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            result = subprocess.run(
+                [sys.executable, "-c", script],
+                capture_output=True,
+                text=True,
+                cwd=os.getcwd(),
+                env={**os.environ, **OFFLINE_ENVIRONMENT, "CACHE_DIR": cache_dir},
+            )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        imported, total = map(float, result.stdout.split()[-2:])
+        imports.append(imported)
+        totals.append(total)
+    return {"import": statistics.median(imports), "total": statistics.median(totals)}
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description=(
+            "Compare the lazy import time of the app modules with an eager "
+            "start that builds every client up front."
+        )
+    )
+    argument_parser.add_argument("--runs", type=int, default=5)
+    argument_parser.add_argument(
+        "--module", choices=sorted(MODULES), action="append", dest="modules"
+    )
+    argument_parser.add_argument("--json", action="store_true", help="Print JSON.")
+    arguments = argument_parser.parse_args()
+
+    report = {}
+    for module in arguments.modules or sorted(MODULES):
+        lazy = measure(module, eager=False, runs=arguments.runs)
+        eager = measure(module, eager=True, runs=arguments.runs)
+        report[module] = {
+            "lazy_seconds": lazy["import"],
+            "eager_seconds": eager["total"],
+            "reduction": 1 - lazy["import"] / eager["total"],
+        }
+
+    if arguments.json:
+        print(json.dumps(report, indent=2))
+        return
+    for module, result in report.items():
+        print(
+            f"{module}: lazy {result['lazy_seconds']:.2f}s, "
+            f"eager {result['eager_seconds']:.2f}s "
+            f"({result['reduction']:.0%} faster startup)"
+        )
+
+
+if __name__ == "__main__":
+    main()
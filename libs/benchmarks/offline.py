@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from libs.benchmarks.fakes import (
+    DEFAULT_LATENCIES,
+    VOCABULARY,
+    create_latencies,
+    install_fakes,
+)
+from libs.config import RESEARCH_AREAS
+
+# Metrics where a larger value is an improvement; every other metric is a latency.
+HIGHER_IS_BETTER = {"chunks_per_second", "papers_per_minute"}
+
+QUESTION_TEMPLATES = (
+    "How does the {0} {1} handle {2}?",
+    "What {0} methods are used for {1} {2}?",
+    "Which papers compare {0} and {1} in {2} experiments?",
+    "Explain the {0} approach to {1} with {2}.",
+)
+
+
+class _InMemoryFile:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+
+    Args:
+        samples (List[float]): Latencies in seconds.
+
+    Returns:
+        Dict[str, float]: Mean, p50 and p95 in seconds.
+    """
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0}
+    values = np.asarray(samples)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+    }
+
+
+def make_questions(count: int, seed: int) -> List[str]:
+    generator = random.Random(seed)
+    return [
+        generator.choice(QUESTION_TEMPLATES).format(*generator.sample(VOCABULARY, 3))
+        for _ in range(count)
+    ]
+
+
+def reset_query_caches() -> None:
+    """Drop the embedding, rerank and answer caches so every run is cold."""
+    from libs import resources
+
+    resources.get_embedding_cache.clear()
+    resources.get_rerank_cache.clear()
+    resources.get_answer_cache.clear()
+
+
+def run_ingestion(papers: int, seed: int) -> Dict[str, float]:
+    """
+    Index synthetic papers through the same path as the admin page.
+
+    Args:
+        papers (int): Number of papers to index.
+        seed (int): Seed of the paper contents and metadata.
+
+    Returns:
+        Dict[str, float]: Papers, chunks, seconds and throughput.
+    """
+    from libs.indexing_articles import (
+        add_metadata,
+        create_article_metadata,
+        iter_split_documents,
+        load_document,
+        save_paper,
+    )
+    from libs.paper_ledger import compute_document_id
+    from libs.resources import get_index_generation, get_paper_ledger
+
+    generator = random.Random(seed)
+    started_at = time.perf_counter()
+    for number in range(papers):
+        file = _InMemoryFile(f"paper-{number}.pdf", f"{seed}-{number}".encode())
+        metadata = create_article_metadata(
+            article_title=" ".join(generator.choices(VOCABULARY, k=5)).title(),
+            first_author=f"Author {number}",
+            research_area=generator.choice(RESEARCH_AREAS),
+            publication_year=generator.randint(2010, 2024),
+            gdrive_url=f"https://example.org/papers/{number}",
+        )
+        document_id = compute_document_id(file.getvalue(), metadata)
+        documents = add_metadata(load_document(file), metadata)
+        save_paper(iter_split_documents(documents), metadata, document_id)
+    get_index_generation().bump()
+    seconds = time.perf_counter() - started_at
+
+    chunks = sum(
+        len(entry["chunk_ids"]) for entry in get_paper_ledger().papers().values()
+    )
+    return {
+        "papers": papers,
+        "chunks": chunks,
+        "seconds": seconds,
+        "chunks_per_second": chunks / seconds if seconds else 0.0,
+        "papers_per_minute": papers / seconds * 60 if seconds else 0.0,
+    }
+
+
+def run_retrieval(
+    questions: List[str], research_area: str, warm_caches: bool
+) -> Dict[str, Dict[str, float]]:
+    """
+    Time multi-query retrieval and the rerank of its candidates.
+
+    Args:
+        questions (List[str]): Questions, each retrieved with two queries.
+        research_area (str): Research area filter.
+        warm_caches (bool): Keep the query caches between runs.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Retrieval and rerank latency summaries.
+    """
+    from libs.http_clients import get_background_loop
+    from libs.inference import arerank_documents, aretrieve_documents, merge_candidates
+
+    loop = get_background_loop()
+    retrieval, rerank = [], []
+    for question in questions:
+        if not warm_caches:
+            reset_query_caches()
+        queries = [question, " ".join(question.split()[1:4])]
+        started_at = time.perf_counter()
+        documents = asyncio.run_coroutine_threadsafe(
+            aretrieve_documents(queries, research_area), loop
+        ).result()
+        retrieval.append(time.perf_counter() - started_at)
+        if documents:
+            started_at = time.perf_counter()
+            asyncio.run_coroutine_threadsafe(
+                arerank_documents(question, merge_candidates(documents)), loop
+            ).result()
+            rerank.append(time.perf_counter() - started_at)
+    return {"retrieval": summarize(retrieval), "rerank": summarize(rerank)}
+
+
+def run_chat(
+    questions: List[str], research_area: str, warm_caches: bool
+) -> Dict[str, Any]:
+    """
+    Time full chat turns through ``chat_answer``.
+
+    Args:
+        questions (List[str]): Questions to ask.
+        research_area (str): Research area filter.
+        warm_caches (bool): Keep the query caches between runs.
+
+    Returns:
+        Dict[str, Any]: Time-to-first-token and end-to-end summaries.
+    """
+    from libs.inference import chat_answer
+
+    first_token, end_to_end = [], []
+    for question in questions:
+        if not warm_caches:
+            reset_query_caches()
+        history = [{"role": "user", "content": question}]
+        started_at = time.perf_counter()
+        first_token_at = None
+        for chunk in chat_answer(question, history, research_area):
+            if first_token_at is None and isinstance(chunk, str):
+                first_token_at = time.perf_counter()
+        finished_at = time.perf_counter()
+        first_token.append((first_token_at or finished_at) - started_at)
+        end_to_end.append(finished_at - started_at)
+    return {
+        "time_to_first_token": summarize(first_token),
+        "end_to_end": summarize(end_to_end),
+    }
+
+
+def flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            metrics[name] = float(value)
+    return metrics
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Describe the change of every metric relative to a baseline.
+
+    Args:
+        report (Dict[str, Any]): Current results.
+        baseline (Dict[str, Any]): Results of a previous run.
+
+    Returns:
+        List[str]: One line per metric present in both runs.
+    """
+    current, previous = flatten(report["results"]), flatten(baseline["results"])
+    lines = []
+    for name in sorted(current.keys() & previous.keys()):
+        if not previous[name]:
+            continue
+        change = current[name] / previous[name] - 1
+        better = change > 0 if name.split(".")[-1] in HIGHER_IS_BETTER else change < 0
+        verdict = "better" if better else "worse" if change else "same"
+        lines.append(
+            f"{name}: {previous[name]:.4f} -> {current[name]:.4f} "
+            f"({change:+.1%}, {verdict})"
+        )
+    return lines
+
+
+def run_benchmarks(
+    papers: int = 10,
+    questions: int = 20,
+    research_area: str = "All",
+    latency_overrides: Optional[Dict[str, str]] = None,
+    sigma: float = 0.3,
+    seed: int = 0,
+    warm_caches: bool = False,
+    directory: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run the ingestion, retrieval, rerank and chat benchmarks against fakes.
+
+    Args:
+        papers (int, optional): Synthetic papers to index. Defaults to 10.
+        questions (int, optional): Questions per benchmark. Defaults to 20.
+        research_area (str, optional): Research area filter. Defaults to "All".
+        latency_overrides (Optional[Dict[str, str]]): ``median[:sigma]`` per call.
+        sigma (float, optional): Default latency spread. Defaults to 0.3.
+        seed (int, optional): Seed of every random choice. Defaults to 0.
+        warm_caches (bool, optional): Keep query caches between runs. Defaults to False.
+        directory (Optional[str]): Scratch directory. Defaults to a temporary one.
+
+    Returns:
+        Dict[str, Any]: Settings and results.
+    """
+    latencies = create_latencies(latency_overrides, sigma, seed)
+    with tempfile.TemporaryDirectory() as scratch:
+        install_fakes(directory or scratch, latencies)
+        asked = make_questions(questions, seed)
+        results = {"ingestion": run_ingestion(papers, seed)}
+        results.update(run_retrieval(asked, research_area, warm_caches))
+        results["chat"] = run_chat(asked, research_area, warm_caches)
+    return {
+        "settings": {
+            "papers": papers,
+            "questions": questions,
+            "research_area": research_area,
+            "latencies": {
+                name: [latency.median, latency.sigma]
+                for name, latency in latencies.items()
+            },
+            "seed": seed,
+            "warm_caches": warm_caches,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, retrieval and chat against fake services."
+    )
+    argument_parser.add_argument("--papers", type=int, default=10)
+    argument_parser.add_argument("--questions", type=int, default=20)
+    argument_parser.add_argument("--research-area", default="All")
+    argument_parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="NAME=MEDIAN[:SIGMA]",
+        help=f"Override a latency in seconds. Names: {', '.join(DEFAULT_LATENCIES)}.",
+    )
+    argument_parser.add_argument("--sigma", type=float, default=0.3)
+    argument_parser.add_argument("--seed", type=int, default=0)
+    argument_parser.add_argument("--warm-caches", action="store_true")
+    argument_parser.add_argument("--output", help="Save the results as JSON.")
+    argument_parser.add_argument("--baseline", help="JSON results to compare with.")
+    arguments = argument_parser.parse_args()
+
+    overrides = dict(value.split("=", 1) for value in arguments.latency)
+    report = run_benchmarks(
+        papers=arguments.papers,
+        questions=arguments.questions,
+        research_area=arguments.research_area,
+        latency_overrides=overrides,
+        sigma=arguments.sigma,
+        seed=arguments.seed,
+        warm_caches=arguments.warm_caches,
+    )
+
+    print(json.dumps(report["results"], indent=2))
+    if arguments.output:
+        os.makedirs(os.path.dirname(os.path.abspath(arguments.output)), exist_ok=True)
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: the baseline was recorded with different settings.")
+        print("\n".join(compare(report, baseline)))
+
+
+if __name__ == "__main__":
+    main()
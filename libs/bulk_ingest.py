@@ -0,0 +1,308 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from libs.config import RESEARCH_AREAS
+from libs.indexing_articles import (
+    create_article_metadata,
+    create_documents,
+    is_paper_indexed,
+    save_paper,
+)
+from libs.paper_ledger import compute_document_id
+from libs.resources import get_index_generation
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+METADATA_FIELDS = (
+    "article_title",
+    "first_author",
+    "research_area",
+    "publication_year",
+    "gdrive_url",
+)
+
+
+class LocalFile:
+    """
+    Minimal stand-in for Streamlit's ``UploadedFile`` backed by a file on disk.
+
+    The file is read on the first ``getvalue`` call only.
+
+    Args:
+        path (str): Path to the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._data: Optional[bytes] = None
+
+    def getvalue(self) -> bytes:
+        if self._data is None:
+            with open(self.path, "rb") as file:
+                self._data = file.read()
+        return self._data
+
+
+def read_metadata_sheet(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the metadata sheet, keyed by file name.
+
+    The sheet is a CSV or JSONL file with a ``file`` column plus the fields
+    of the admin form: article_title, first_author, research_area,
+    publication_year and gdrive_url.
+
+    Args:
+        path (str): Path to the CSV or JSONL sheet.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Metadata rows keyed by file name.
+
+    Raises:
+        ValueError: If a row is missing a required field.
+    """
+    with open(path, newline="") as file:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    sheet = {}
+    for row in rows:
+        missing = [field for field in ("file", *METADATA_FIELDS) if not row.get(field)]
+        if missing:
+            raise ValueError(f"Metadata row {row} is missing {', '.join(missing)}.")
+        sheet[os.path.basename(row["file"])] = row
+    return sheet
+
+
+def row_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the article metadata of a metadata sheet row.
+
+    Args:
+        row (Dict[str, Any]): Row from ``read_metadata_sheet``.
+
+    Returns:
+        Dict[str, Any]: Article metadata.
+
+    Raises:
+        ValueError: If the research area is unknown or the year is not an integer.
+    """
+    if row["research_area"] not in RESEARCH_AREAS:
+        # The chat filter and the index partitions could never reach it.
+        raise ValueError(f"Unknown research area {row['research_area']!r}.")
+    try:
+        publication_year = int(row["publication_year"])
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"Invalid publication year {row['publication_year']!r}."
+        ) from None
+    return create_article_metadata(
+        row["article_title"],
+        row["first_author"],
+        row["research_area"],
+        publication_year,
+        row["gdrive_url"],
+    )
+
+
+class Manifest:
+    """
+    Per-file ingestion status persisted as JSON, used to resume a run.
+
+    Args:
+        path (str): Path to the manifest file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.entries = json.load(file)
+
+    def is_done(self, file_name: str) -> bool:
+        return self.entries.get(file_name, {}).get("status") == "done"
+
+    def record(self, file_name: str, status: str, **details: Any) -> None:
+        """
+        Record the status of a file and save the manifest atomically.
+
+        Args:
+            file_name (str): Name of the ingested file.
+            status (str): One of "done" or "failed".
+        """
+        self.entries[file_name] = {
+            "status": status,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **details,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.entries, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def init_worker(workers: int) -> None:
+    """
+    Give a worker process its share of the table summary rate limit.
+
+    Every worker paces its own LLM calls, so together they would otherwise
+    send ``workers`` times ``TABLE_SUMMARY_REQUESTS_PER_MINUTE``.
+
+    Args:
+        workers (int): Number of parsing processes.
+    """
+    from libs import resources
+
+    resources.config.TABLE_SUMMARY_REQUESTS_PER_MINUTE /= workers
+
+
+def parse_file(path: str, metadata: Dict[str, Any]) -> Tuple[str, Optional[List[Any]]]:
+    """
+    Identify one file and, unless it is already indexed, parse and split it
+    into nodes. Runs in a worker process, which reads the file once.
+
+    Args:
+        path (str): Path to the PDF or DOCX file.
+        metadata (Dict[str, Any]): Article metadata added to every node.
+
+    Returns:
+        Tuple[str, Optional[List[Any]]]: The document id, and the nodes ready
+            to be indexed, or None if this version is already indexed.
+    """
+    file = LocalFile(path)
+    document_id = compute_document_id(file.getvalue(), metadata)
+    if is_paper_indexed(document_id, metadata):
+        return document_id, None
+    return document_id, create_documents(file, metadata)
+
+
+def ingest_directory(
+    directory: str, sheet_path: str, manifest_path: str, workers: int
+) -> Dict[str, float]:
+    """
+    Ingest every PDF/DOCX in a directory that the manifest has not marked done.
+
+    Files are read, identified, parsed and split in parallel worker
+    processes, which share the table summary rate limit; the resulting nodes
+    are embedded and inserted by this process, one file at a time, and the
+    manifest is updated after each file. A file whose metadata row or
+    contents cannot be used is recorded as failed without stopping the run.
+
+    Args:
+        directory (str): Directory containing the papers.
+        sheet_path (str): CSV or JSONL metadata sheet.
+        manifest_path (str): Manifest used to resume interrupted runs.
+        workers (int): Number of parsing processes.
+
+    Returns:
+        Dict[str, float]: Run statistics.
+    """
+    sheet = read_metadata_sheet(sheet_path)
+    manifest = Manifest(manifest_path)
+
+    pending = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.lower().endswith(SUPPORTED_EXTENSIONS):
+            continue
+        if manifest.is_done(file_name):
+            continue
+        if file_name not in sheet:
+            manifest.record(file_name, "failed", error="No metadata row.")
+            continue
+        try:
+            metadata = row_metadata(sheet[file_name])
+        except ValueError as e:
+            manifest.record(file_name, "failed", error=str(e))
+            print(f"[failed] {file_name}: {e}")
+            continue
+        pending.append((file_name, metadata))
+
+    started_at = time.perf_counter()
+    stats = {"files": 0, "failed": 0, "chunks": 0}
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(workers,),
+    ) as executor:
+        futures = {
+            executor.submit(parse_file, os.path.join(directory, file_name), metadata): (
+                file_name,
+                metadata,
+            )
+            for file_name, metadata in pending
+        }
+
+        for future in as_completed(futures):
+            file_name, metadata = futures[future]
+            try:
+                document_id, nodes = future.result()
+                if nodes is None:
+                    manifest.record(file_name, "done", unchanged=True)
+                    print(f"[unchanged] {file_name}")
+                    continue
+                save_paper([nodes], metadata, document_id)
+            except Exception as e:
+                stats["failed"] += 1
+                manifest.record(file_name, "failed", error=str(e))
+                print(f"[failed] {file_name}: {e}")
+                continue
+            stats["files"] += 1
+            stats["chunks"] += len(nodes)
+            manifest.record(file_name, "done", chunks=len(nodes))
+            print(f"[done] {file_name}: {len(nodes)} chunks")
+
+    if stats["files"]:
+        get_index_generation().bump()
+
+    elapsed = time.perf_counter() - started_at
+    stats["seconds"] = elapsed
+    stats["files_per_minute"] = stats["files"] / elapsed * 60 if elapsed else 0.0
+    stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+    return stats
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description="Ingest a directory of PDF/DOCX papers into the index."
+    )
+    argument_parser.add_argument("directory", help="Directory containing the papers.")
+    argument_parser.add_argument(
+        "--metadata", required=True, help="CSV or JSONL metadata sheet."
+    )
+    argument_parser.add_argument(
+        "--manifest",
+        help="Manifest path. Defaults to .ingest_manifest.json inside the directory.",
+    )
+    argument_parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Parsing processes."
+    )
+    arguments = argument_parser.parse_args()
+
+    stats = ingest_directory(
+        arguments.directory,
+        arguments.metadata,
+        arguments.manifest
+        or os.path.join(arguments.directory, ".ingest_manifest.json"),
+        arguments.workers,
+    )
+    print(
+        f"Ingested {stats['files']} files ({stats['failed']} failed), "
+        f"{stats['chunks']} chunks in {stats['seconds']:.1f}s: "
+        f"{stats['files_per_minute']:.2f} files/min, "
+        f"{stats['chunks_per_second']:.2f} chunks/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
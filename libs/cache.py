@@ -0,0 +1,279 @@
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with an optional time to live.
+
+    Args:
+        maxsize (int): Maximum number of entries kept in memory.
+        ttl (Optional[float]): Seconds an entry stays valid. None disables expiry.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a value from the cache.
+
+        Args:
+            key (Hashable): Cache key.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss or expired entry.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key (Hashable): Cache key.
+            value (Any): Value to store.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the cache counters.
+
+        Returns:
+            Dict[str, int]: Number of entries, hits and misses.
+        """
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for use in cache keys (case and whitespace insensitive).
+
+    Args:
+        text (str): Text to normalize.
+
+    Returns:
+        str: Normalized text.
+    """
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings.
+
+    Entries are keyed by the normalized text plus the embedding model name.
+    The first tier is an in-memory LRU with a time to live; the optional
+    second tier is a SQLite file that survives process restarts.
+
+    Args:
+        model_name (str): Name of the embedding model, part of every key.
+        maxsize (int): Maximum number of embeddings kept in memory.
+        ttl (Optional[float]): Seconds an embedding stays valid.
+        path (Optional[str]): SQLite file for the on-disk tier, or None to disable it.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.ttl = ttl
+        self.disk_hits = 0
+        self._memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB, created_at REAL)"
+            )
+            self._disk.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if self.ttl is not None and created_at + self.ttl < time.time():
+            return None
+        return array("f", blob).tolist()
+
+    def _disk_set(self, key: str, embedding: List[float]) -> None:
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                (key, array("f", embedding).tobytes(), time.time()),
+            )
+            self._disk.commit()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self._disk is not None:
+            embedding = self._disk_get(key)
+            if embedding is not None:
+                self.disk_hits += 1
+                self._memory.set(key, embedding)
+                return embedding
+        return None
+
+    def _store(self, key: str, embedding: List[float]) -> None:
+        self._memory.set(key, embedding)
+        if self._disk is not None:
+            self._disk_set(key, embedding)
+
+    def get_or_compute(
+        self, text: str, embed: Callable[[str], List[float]]
+    ) -> List[float]:
+        """
+        Return the cached embedding for a text, computing it on a miss.
+
+        Args:
+            text (str): Text to embed.
+            embed (Callable[[str], List[float]]): Function that embeds the text.
+
+        Returns:
+            List[float]: The embedding.
+        """
+        key = self._key(text)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = embed(text)
+            self._store(key, embedding)
+        return embedding
+
+    async def aget_or_compute(
+        self, text: str, embed: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        """
+        Async variant of ``get_or_compute``.
+
+        Args:
+            text (str): Text to embed.
+            embed (Callable[[str], Awaitable[List[float]]]): Coroutine function
+                that embeds the text.
+
+        Returns:
+            List[float]: The embedding.
+        """
+        key = self._key(text)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = await embed(text)
+            self._store(key, embedding)
+        return embedding
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the cache counters.
+
+        Returns:
+            Dict[str, int]: Memory size, hits (memory and disk) and misses.
+        """
+        memory_stats = self._memory.stats()
+        return {
+            "size": memory_stats["size"],
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "disk_hits": self.disk_hits,
+            "misses": memory_stats["misses"] - self.disk_hits,
+        }
+
+
+class IndexGeneration:
+    """
+    Counter shared through a file that changes whenever the index changes.
+
+    The chatbot and the admin area run as separate processes, so caches that
+    depend on the index contents compare generations instead of being
+    cleared directly. They only see each other's changes when they share the
+    file, so separate deployments must mount the same ``CACHE_DIR`` volume.
+
+    Args:
+        path (str): File that stores the generation.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def current(self) -> int:
+        """
+        Read the current generation.
+
+        Returns:
+            int: The generation, 0 if the index was never changed.
+        """
+        try:
+            with open(self.path) as file:
+                return int(file.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        """
+        Advance the generation, invalidating every dependent cache.
+
+        Returns:
+            int: The new generation.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Writers in other processes bump too, so the read and the write must
+        # happen under one lock for no increment to be lost.
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generation = self.current() + 1
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(str(generation))
+            os.replace(tmp_path, self.path)
+        return generation
@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import logging
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from libs.config import Config
+from libs.resources import (
+    get_async_cohere_client,
+    get_history_summary_cache,
+    get_tokenizer,
+)
+
+config = Config()
+
+logger = logging.getLogger(__name__)
+
+SOURCES_PATTERN = re.compile(r"\n\s*Sources:\s*\n.*\Z", re.DOTALL)
+
+SUMMARY_PROMPT = """Update the summary of a conversation between a user and AuRoRA, the virtual assistant of NERo (Núcleo de Especialização em Robótica).
+Keep the papers, authors, research topics and open questions the user cares about, and drop small talk.
+Reply with the updated summary only, in at most {max_words} words.
+
+## Current summary
+{summary}
+
+## New messages
+{messages}"""
+
+_pending_summaries: Set[str] = set()
+_summary_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text down to at most ``max_tokens`` tokens.
+
+    Args:
+        text (str): Text to cut.
+        max_tokens (int): Token budget.
+
+    Returns:
+        str: The text, truncated if needed.
+    """
+    tokenizer = get_tokenizer()
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[: max(max_tokens, 0)])
+
+
+def strip_sources(content: str) -> str:
+    """
+    Remove the "Sources:" list the chat page appends to assistant answers.
+
+    Args:
+        content (str): Message content.
+
+    Returns:
+        str: The content without its source list.
+    """
+    return SOURCES_PATTERN.sub("", content).rstrip()
+
+
+def format_chat_history(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Convert Streamlit messages, except the current question, to Cohere's format.
+
+    Args:
+        messages (List[Dict[str, str]]): Streamlit chat messages.
+
+    Returns:
+        List[Dict[str, str]]: Messages with USER and CHATBOT roles.
+    """
+    chat_history = []
+
+    for message in messages[:-1]:
+        if message["role"] == "user":
+            chat_history.append({"role": "USER", "message": message["content"]})
+        elif message["role"] == "assistant":
+            chat_history.append(
+                {"role": "CHATBOT", "message": strip_sources(message["content"])}
+            )
+
+    return chat_history
+
+
+def split_recent(
+    chat_history: List[Dict[str, str]], recent_turns: int, max_tokens: int
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Split the history into older messages and the recent ones kept verbatim.
+
+    At most ``recent_turns`` user/assistant turns are kept, and fewer when
+    they exceed ``max_tokens``. The newest message is always kept,
+    truncated if it alone exceeds the budget.
+
+    Args:
+        chat_history (List[Dict[str, str]]): Messages in Cohere's format.
+        recent_turns (int): Number of turns kept verbatim.
+        max_tokens (int): Token budget of the recent messages.
+
+    Returns:
+        Tuple[List[Dict[str, str]], List[Dict[str, str]]]: Older and recent messages.
+    """
+    start = max(len(chat_history) - 2 * recent_turns, 0)
+    sizes = [count_tokens(message["message"]) for message in chat_history[start:]]
+    while len(sizes) > 1 and sum(sizes) > max_tokens:
+        sizes.pop(0)
+        start += 1
+
+    older, recent = chat_history[:start], chat_history[start:]
+    if recent and sizes[0] > max_tokens:
+        recent = [
+            {
+                "role": recent[0]["role"],
+                "message": truncate_tokens(recent[0]["message"], max_tokens),
+            }
+        ]
+    return older, recent
+
+
+def _prefix_keys(messages: List[Dict[str, str]]) -> List[str]:
+    digest = hashlib.sha256()
+    keys = [digest.hexdigest()]
+    for message in messages:
+        digest.update(f"{message['role']}\0{message['message']}\0".encode("utf-8"))
+        keys.append(digest.hexdigest())
+    return keys
+
+
+def _format_messages(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{message['role']}: {message['message']}" for message in messages)
+
+
+def extractive_summary(messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Summarize messages without a model call by truncating each of them.
+
+    Args:
+        messages (List[Dict[str, str]]): Messages to summarize.
+        max_tokens (int): Token budget of the summary.
+
+    Returns:
+        str: One truncated line per message.
+    """
+    if not messages or max_tokens <= 0:
+        return ""
+    per_message = max(max_tokens // len(messages), 1)
+    lines = [
+        f"{message['role']}: {truncate_tokens(message['message'], per_message)}"
+        for message in messages
+    ]
+    return truncate_tokens("\n".join(lines), max_tokens)
+
+
+async def summarize_messages(
+    summary: Optional[str], messages: List[Dict[str, str]], max_tokens: int
+) -> str:
+    """
+    Fold messages into a running summary with a Cohere model.
+
+    Args:
+        summary (Optional[str]): Summary of the messages before these.
+        messages (List[Dict[str, str]]): Messages to fold in.
+        max_tokens (int): Token budget of the new summary.
+
+    Returns:
+        str: The updated summary.
+    """
+    response = await get_async_cohere_client().chat(
+        model=config.HISTORY_SUMMARY_MODEL,
+        message=SUMMARY_PROMPT.format(
+            max_words=max_tokens * 3 // 4,
+            summary=summary or "(empty)",
+            messages=_format_messages(messages),
+        ),
+        temperature=0.0,
+        max_tokens=max_tokens,
+    )
+    return truncate_tokens(response.text.strip(), max_tokens)
+
+
+def _schedule_summary(
+    key: str, summary: Optional[str], messages: List[Dict[str, str]]
+) -> None:
+    if key in _pending_summaries:
+        return
+    _pending_summaries.add(key)
+
+    async def refresh() -> None:
+        try:
+            get_history_summary_cache().set(
+                key,
+                await summarize_messages(
+                    summary, messages, config.HISTORY_SUMMARY_MAX_TOKENS
+                ),
+            )
+        except Exception:
+            logger.exception("Failed to summarize the chat history")
+        finally:
+            _pending_summaries.discard(key)
+
+    task = asyncio.get_running_loop().create_task(refresh())
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+def summarize_older(older: List[Dict[str, str]]) -> str:
+    """
+    Get the running summary of the older messages.
+
+    Summaries are cached by the exact messages they cover. The longest cached
+    summary is used, and messages it does not cover yet are added as a
+    truncated excerpt while the summary is refreshed in the background, so
+    summarization never delays the answer.
+
+    Args:
+        older (List[Dict[str, str]]): Messages that are no longer kept verbatim.
+
+    Returns:
+        str: Summary of at most ``config.HISTORY_SUMMARY_MAX_TOKENS`` tokens.
+    """
+    cache = get_history_summary_cache()
+    keys = _prefix_keys(older)
+    covered, summary = 0, None
+    for length in range(len(older), 0, -1):
+        summary = cache.get(keys[length])
+        if summary is not None:
+            covered = length
+            break
+
+    if covered == len(older):
+        return summary
+
+    remainder = older[covered:]
+    _schedule_summary(keys[-1], summary, remainder)
+    budget = config.HISTORY_SUMMARY_MAX_TOKENS - count_tokens(summary or "")
+    return "\n".join(
+        part for part in (summary, extractive_summary(remainder, budget)) if part
+    )
+
+
+def build_chat_history(
+    chat_history: List[Dict[str, str]],
+) -> Optional[List[Dict[str, str]]]:
+    """
+    Build the token-budgeted chat history sent to Cohere for one turn.
+
+    The last ``config.HISTORY_RECENT_TURNS`` turns are kept verbatim within
+    ``config.HISTORY_MAX_TOKENS`` tokens, and older turns are replaced by a
+    running summary, so the prompt stays bounded however long the
+    conversation runs. Must be called on an event loop.
+
+    Args:
+        chat_history (List[Dict[str, str]]): History from ``format_chat_history``.
+
+    Returns:
+        Optional[List[Dict[str, str]]]: Cohere chat history, or None if empty.
+    """
+    older, recent = split_recent(
+        chat_history,
+        config.HISTORY_RECENT_TURNS,
+        config.HISTORY_MAX_TOKENS,
+    )
+    if older:
+        summary = summarize_older(older)
+        recent = [
+            {
+                "role": "SYSTEM",
+                "message": f"Summary of the earlier conversation:\n{summary}",
+            },
+            *recent,
+        ]
+    return recent or None
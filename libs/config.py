@@ -1,5 +1,17 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+RESEARCH_AREAS: List[str] = [
+    "Aerial Robot Control",
+    "Ground Robot Control",
+    "Robot Formation",
+    "Robot Control",
+    "Formation Control",
+    "Human-Robot Interaction",
+    "Artificial Intelligence",
+    "Robotics Competition",
+    "Educational Robotics",
+]
 
 
 class Config:
@@ -10,6 +22,179 @@ class Config:
         self.LLAMA_CLOUD_API_KEY: str = os.environ.get("LLAMA_CLOUD_API_KEY", "")
         self.GROQ_API_KEY: str = os.environ.get("GROQ_API_KEY", "")
 
+        # Shared state of the chatbot and the admin area (index generation,
+        # lexical index, paper ledger). When they run as separate deployments,
+        # both must mount the same volume here.
+        self.CACHE_DIR: str = os.environ.get("CACHE_DIR", ".cache")
+        self.INDEX_GENERATION_PATH: str = os.path.join(
+            self.CACHE_DIR, "index_generation"
+        )
+
+        self.HTTP_MAX_CONNECTIONS: int = int(
+            os.environ.get("HTTP_MAX_CONNECTIONS", "100")
+        )
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(
+            os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+        self.HTTP_KEEPALIVE_EXPIRY: float = float(
+            os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30")
+        )
+        self.HTTP_TIMEOUT: float = float(os.environ.get("HTTP_TIMEOUT", "60"))
+        self.HTTP_CONNECT_TIMEOUT: float = float(
+            os.environ.get("HTTP_CONNECT_TIMEOUT", "5")
+        )
+
+        self.VECTOR_STORE_BACKEND: str = os.environ.get(
+            "VECTOR_STORE_BACKEND", "pinecone"
+        )
+        self.LOCAL_VECTOR_STORE_PATH: str = os.environ.get(
+            "LOCAL_VECTOR_STORE_PATH", os.path.join(self.CACHE_DIR, "vector_store")
+        )
+        self.VECTOR_STORE_PARTITIONING: bool = (
+            os.environ.get("VECTOR_STORE_PARTITIONING", "true").lower() == "true"
+        )
+        # Written by ``python -m libs.vector_stores`` once the vectors indexed
+        # before partitioning have moved to their research area.
+        self.VECTOR_STORE_MIGRATION_PATH: str = os.environ.get(
+            "VECTOR_STORE_MIGRATION_PATH",
+            os.path.join(self.CACHE_DIR, "vector_store_migrated"),
+        )
+
+        # With HYBRID_RETRIEVAL this can drop to 8, but only once
+        # ``python -m libs.lexical_index`` has added the papers indexed before
+        # the lexical index existed; until then the BM25 leg cannot make up
+        # for the smaller vector leg.
+        self.SIMILARITY_TOP_K: int = int(os.environ.get("SIMILARITY_TOP_K", "10"))
+        self.RETRIEVAL_TIMEOUT: float = float(
+            os.environ.get("RETRIEVAL_TIMEOUT", "5.0")
+        )
+        self.SPECULATIVE_RETRIEVAL: bool = (
+            os.environ.get("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+        )
+        self.SPECULATIVE_MATCH_THRESHOLD: float = float(
+            os.environ.get("SPECULATIVE_MATCH_THRESHOLD", "0.6")
+        )
+        self.HYBRID_RETRIEVAL: bool = (
+            os.environ.get("HYBRID_RETRIEVAL", "true").lower() == "true"
+        )
+        self.LEXICAL_TOP_K: int = int(os.environ.get("LEXICAL_TOP_K", "8"))
+        self.LEXICAL_INDEX_PATH: str = os.environ.get(
+            "LEXICAL_INDEX_PATH", os.path.join(self.CACHE_DIR, "lexical_index.sqlite3")
+        )
+
+        self.PAPER_LEDGER_PATH: str = os.environ.get(
+            "PAPER_LEDGER_PATH", os.path.join(self.CACHE_DIR, "paper_ledger.json")
+        )
+        self.PARSE_CACHE_DIR: str = os.environ.get(
+            "PARSE_CACHE_DIR", os.path.join(self.CACHE_DIR, "parse")
+        )
+        self.PARSE_CACHE_MAX_BYTES: int = int(
+            os.environ.get("PARSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))
+        )
+        self.TABLE_SUMMARY_CACHE_PATH: str = os.environ.get(
+            "TABLE_SUMMARY_CACHE_PATH",
+            os.path.join(self.CACHE_DIR, "table_summaries.sqlite3"),
+        )
+        self.TABLE_SUMMARY_WORKERS: int = int(
+            os.environ.get("TABLE_SUMMARY_WORKERS", "8")
+        )
+        self.TABLE_SUMMARY_REQUESTS_PER_MINUTE: float = float(
+            os.environ.get("TABLE_SUMMARY_REQUESTS_PER_MINUTE", "30")
+        )
+        self.INGEST_EMBED_BATCH_SIZE: int = int(
+            os.environ.get("INGEST_EMBED_BATCH_SIZE", "384")
+        )
+        self.INGEST_UPSERT_BATCH_SIZE: int = int(
+            os.environ.get("INGEST_UPSERT_BATCH_SIZE", "100")
+        )
+        self.INGEST_QUEUE_SIZE: int = int(os.environ.get("INGEST_QUEUE_SIZE", "4"))
+
+        self.EMBED_MAX_CONCURRENCY: int = int(
+            os.environ.get("EMBED_MAX_CONCURRENCY", "4")
+        )
+        self.EMBED_REQUESTS_PER_SECOND: float = float(
+            os.environ.get("EMBED_REQUESTS_PER_SECOND", "10")
+        )
+        self.EMBEDDING_CACHE_SIZE: int = int(
+            os.environ.get("EMBEDDING_CACHE_SIZE", "1024")
+        )
+        self.EMBEDDING_CACHE_TTL: float = float(
+            os.environ.get("EMBEDDING_CACHE_TTL", "86400")
+        )
+        self.EMBEDDING_CACHE_PATH: str = os.environ.get("EMBEDDING_CACHE_PATH", "")
+
+        self.RERANK_MAX_TOP_N: int = int(os.environ.get("RERANK_MAX_TOP_N", "5"))
+        self.RERANK_MIN_TOP_N: int = int(os.environ.get("RERANK_MIN_TOP_N", "1"))
+        self.RERANK_MIN_RELEVANCE: float = float(
+            os.environ.get("RERANK_MIN_RELEVANCE", "0.1")
+        )
+        self.RERANK_RELATIVE_RELEVANCE: float = float(
+            os.environ.get("RERANK_RELATIVE_RELEVANCE", "0.5")
+        )
+        self.CONTEXT_MAX_TOKENS: int = int(os.environ.get("CONTEXT_MAX_TOKENS", "1500"))
+        self.CONTEXT_SNIPPET_MAX_TOKENS: int = int(
+            os.environ.get("CONTEXT_SNIPPET_MAX_TOKENS", "600")
+        )
+        self.RERANK_TIMEOUT: float = float(os.environ.get("RERANK_TIMEOUT", "2.0"))
+        self.RERANK_FALLBACK_TOP_N: int = int(
+            os.environ.get("RERANK_FALLBACK_TOP_N", "3")
+        )
+        self.RERANK_CACHE_SIZE: int = int(os.environ.get("RERANK_CACHE_SIZE", "512"))
+        self.RERANK_CACHE_TTL: float = float(os.environ.get("RERANK_CACHE_TTL", "3600"))
+
+        self.ANSWER_CACHE_THRESHOLD: float = float(
+            os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95")
+        )
+        self.ANSWER_CACHE_SIZE: int = int(os.environ.get("ANSWER_CACHE_SIZE", "256"))
+        self.ANSWER_CACHE_TTL: float = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+        self.ANSWER_CACHE_HISTORY_TURNS: int = int(
+            os.environ.get("ANSWER_CACHE_HISTORY_TURNS", "4")
+        )
+
+        self.HISTORY_RECENT_TURNS: int = int(
+            os.environ.get("HISTORY_RECENT_TURNS", "3")
+        )
+        self.HISTORY_MAX_TOKENS: int = int(os.environ.get("HISTORY_MAX_TOKENS", "2000"))
+        self.HISTORY_SUMMARY_MAX_TOKENS: int = int(
+            os.environ.get("HISTORY_SUMMARY_MAX_TOKENS", "300")
+        )
+        self.HISTORY_SUMMARY_MODEL: str = os.environ.get(
+            "HISTORY_SUMMARY_MODEL", "command-r-08-2024"
+        )
+        self.HISTORY_SUMMARY_CACHE_SIZE: int = int(
+            os.environ.get("HISTORY_SUMMARY_CACHE_SIZE", "1024")
+        )
+        self.HISTORY_SUMMARY_CACHE_TTL: float = float(
+            os.environ.get("HISTORY_SUMMARY_CACHE_TTL", "86400")
+        )
+
+        self.STREAM_FRAME_RATE: float = float(os.environ.get("STREAM_FRAME_RATE", "10"))
+        self.STREAM_FLUSH_BYTES: int = int(os.environ.get("STREAM_FLUSH_BYTES", "2048"))
+
+        self.API_MAX_CONCURRENCY: int = int(os.environ.get("API_MAX_CONCURRENCY", "32"))
+        self.API_MAX_QUEUE: int = int(os.environ.get("API_MAX_QUEUE", "64"))
+        self.API_QUEUE_TIMEOUT: float = float(os.environ.get("API_QUEUE_TIMEOUT", "10"))
+
+        self.COHERE_MAX_IN_FLIGHT: int = int(
+            os.environ.get("COHERE_MAX_IN_FLIGHT", "16")
+        )
+        self.VECTOR_STORE_MAX_IN_FLIGHT: int = int(
+            os.environ.get("VECTOR_STORE_MAX_IN_FLIGHT", "32")
+        )
+        # One chat turn runs the speculative retrieval and every generated
+        # query at once, about five embed and vector calls, so the cap must
+        # stay above that for a turn not to queue behind itself.
+        self.UPSTREAM_MAX_PER_SESSION: int = int(
+            os.environ.get("UPSTREAM_MAX_PER_SESSION", "8")
+        )
+        self.CHAT_DEADLINE: float = float(os.environ.get("CHAT_DEADLINE", "30"))
+
+        self.TRACING_ENABLED: bool = (
+            os.environ.get("TRACING_ENABLED", "false").lower() == "true"
+        )
+        self.METRICS_PATH: str = os.environ.get("METRICS_PATH", "")
+        self.METRICS_PORT: int = int(os.environ.get("METRICS_PORT", "0"))
+
     def get_secrets(self) -> Dict[str, Any]:
         return {
             "COHERE_API_KEY": self.COHERE_API_KEY,
@@ -0,0 +1,192 @@
+import re
+from typing import Dict, List, Sequence, Set, Tuple
+
+from libs.chat_history import count_tokens, truncate_tokens
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+GAP_MARKER = "..."
+
+# Snippets shorter than this are not worth a document slot.
+MIN_SNIPPET_TOKENS = 32
+
+
+def select_by_relevance(
+    ranked: Sequence[Tuple[str, float]],
+    min_top_n: int,
+    min_relevance: float,
+    relative_relevance: float,
+) -> List[Tuple[str, float]]:
+    """
+    Choose how many reranked documents to keep from their relevance scores.
+
+    A document is kept when its score is at least ``min_relevance`` and at
+    least ``relative_relevance`` times the best score. The first
+    ``min_top_n`` documents are always kept.
+
+    Args:
+        ranked (Sequence[Tuple[str, float]]): Keys and scores, best first.
+        min_top_n (int): Documents kept regardless of their scores.
+        min_relevance (float): Absolute score cutoff.
+        relative_relevance (float): Cutoff as a fraction of the best score.
+
+    Returns:
+        List[Tuple[str, float]]: The kept keys and scores, best first.
+    """
+    if not ranked:
+        return []
+    cutoff = max(min_relevance, ranked[0][1] * relative_relevance)
+    return [
+        (key, score)
+        for position, (key, score) in enumerate(ranked)
+        if position < min_top_n or score >= cutoff
+    ]
+
+
+def split_passages(text: str) -> List[Tuple[int, str, bool]]:
+    """
+    Split a snippet into sentences, keeping every Markdown table row whole.
+
+    Args:
+        text (str): Snippet text.
+
+    Returns:
+        List[Tuple[int, str, bool]]: Line number, text and whether the
+            passage is a table row.
+    """
+    passages = []
+    for line_number, line in enumerate(text.splitlines()):
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("|"):
+            passages.append((line_number, line, True))
+            continue
+        for sentence in SENTENCE_PATTERN.split(line.strip()):
+            if sentence:
+                passages.append((line_number, sentence, False))
+    return passages
+
+
+def _table_headers(passages: List[Tuple[int, str, bool]]) -> Dict[int, List[int]]:
+    headers, table_start = {}, None
+    for index, (line_number, _, is_row) in enumerate(passages):
+        if not is_row:
+            table_start = None
+            continue
+        previous = passages[index - 1] if index else None
+        if table_start is None or previous[0] != line_number - 1:
+            table_start = index
+        # The header row and the |---| separator that follows it.
+        headers[index] = [
+            header
+            for header in (table_start, table_start + 1)
+            if header < index and passages[header][2]
+        ]
+    return headers
+
+
+def excerpt(text: str, query_terms: Set[str], max_tokens: int) -> str:
+    """
+    Cut a snippet down to the passages that best match the query.
+
+    Passages are chosen by the number of query terms they contain, and kept
+    in their original order with a marker where text was skipped. A chosen
+    table row brings its header along.
+
+    Args:
+        text (str): Snippet text.
+        query_terms (Set[str]): Terms of the question, from ``tokenize``.
+        max_tokens (int): Token budget of the excerpt.
+
+    Returns:
+        str: The excerpt, or the whole text if it fits.
+    """
+    from libs.lexical_index import tokenize
+
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    passages = split_passages(text)
+    if not passages:
+        return truncate_tokens(text, max_tokens)
+    sizes = [count_tokens(passage) + 1 for _, passage, _ in passages]
+    scores = [len(query_terms.intersection(tokenize(p))) for _, p, _ in passages]
+    headers = _table_headers(passages)
+
+    chosen: Set[int] = set()
+    used = 0
+    for index in sorted(range(len(passages)), key=lambda i: (-scores[i], i)):
+        if index in chosen:
+            continue
+        needed = [index] + [h for h in headers.get(index, []) if h not in chosen]
+        cost = sum(sizes[i] for i in needed)
+        if used + cost <= max_tokens:
+            chosen.update(needed)
+            used += cost
+
+    if not chosen:
+        best = min(range(len(passages)), key=lambda i: (-scores[i], i))
+        return truncate_tokens(passages[best][1], max_tokens)
+
+    parts: List[str] = []
+    previous = None
+    for index in sorted(chosen):
+        line_number, passage, _ = passages[index]
+        if previous is not None:
+            if previous != index - 1:
+                parts.append(f"\n{GAP_MARKER}\n")
+            elif passages[previous][0] == line_number:
+                parts.append(" ")
+            else:
+                parts.append("\n")
+        elif index > 0:
+            parts.append(f"{GAP_MARKER}\n")
+        parts.append(passage)
+        previous = index
+    if previous < len(passages) - 1:
+        parts.append(f"\n{GAP_MARKER}")
+    return "".join(parts)
+
+
+def pack_documents(
+    question: str,
+    documents: List[Dict[str, str]],
+    max_tokens: int,
+    snippet_max_tokens: int,
+) -> List[Dict[str, str]]:
+    """
+    Fit the documents sent to the chat model into a token budget.
+
+    Documents are packed in rank order. Each gets an equal share of what is
+    left of the budget, capped at ``snippet_max_tokens``, so budget unused
+    by short snippets goes to the following ones. Documents that would get
+    fewer than ``MIN_SNIPPET_TOKENS`` are dropped, except the first.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Dict[str, str]]): Documents with a title and a snippet.
+        max_tokens (int): Token budget of every document together.
+        snippet_max_tokens (int): Token budget of a single document.
+
+    Returns:
+        List[Dict[str, str]]: Documents with excerpted snippets.
+    """
+    from libs.lexical_index import tokenize
+
+    query_terms = set(tokenize(question))
+    packed = []
+    remaining = max_tokens
+    for position, document in enumerate(documents):
+        title_tokens = count_tokens(document["title"])
+        share = (
+            min(snippet_max_tokens, remaining // (len(documents) - position))
+            - title_tokens
+        )
+        if share < MIN_SNIPPET_TOKENS:
+            if packed:
+                break
+            share = MIN_SNIPPET_TOKENS
+        snippet = excerpt(document["snippet"], query_terms, share)
+        remaining -= title_tokens + count_tokens(snippet)
+        packed.append({**document, "snippet": snippet})
+    return packed
@@ -0,0 +1,388 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import cohere
+from cohere.core.api_error import ApiError
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+COHERE_MAX_BATCH_TEXTS = 96
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket that limits the rate of outgoing requests.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to latency and rate limiting (AIMD).
+
+    The limit grows by one slot per window of successful calls and is halved
+    when the provider answers 429 or when latency degrades to more than
+    ``latency_factor`` times the best latency observed.
+
+    Args:
+        initial (int): Initial number of concurrent calls.
+        maximum (int): Upper bound of concurrent calls.
+        latency_factor (float): Latency degradation that triggers a decrease.
+    """
+
+    def __init__(self, initial: int, maximum: int, latency_factor: float = 3.0):
+        self.limit = float(max(1, min(initial, maximum)))
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self._best_latency: Optional[float] = None
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Block until a concurrency slot is free and take it."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        """
+        Free a slot and adapt the limit to the outcome of the call.
+
+        Args:
+            latency (Optional[float]): Duration of a successful call in seconds.
+            throttled (bool): Whether the call was rate limited.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            elif latency is not None:
+                if self._best_latency is None or latency < self._best_latency:
+                    self._best_latency = latency
+                if latency > self._best_latency * self.latency_factor:
+                    self.limit = max(1.0, self.limit / 2)
+                else:
+                    self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+def pack_batches(
+    texts: List[str], max_texts: int, max_chars: int
+) -> Iterator[List[int]]:
+    """
+    Pack texts into batches that respect the API's size limits.
+
+    Args:
+        texts (List[str]): Texts to embed.
+        max_texts (int): Maximum number of texts per request.
+        max_chars (int): Maximum number of characters per request.
+
+    Yields:
+        List[int]: Indices of the texts in each batch.
+    """
+    batch, chars = [], 0
+    for index, text in enumerate(texts):
+        if batch and (len(batch) >= max_texts or chars + len(text) > max_chars):
+            yield batch
+            batch, chars = [], 0
+        batch.append(index)
+        chars += len(text)
+    if batch:
+        yield batch
+
+
+class EmbeddingService:
+    """
+    Cohere embedding client with adaptive batching and rate-limit-aware retries.
+
+    Texts are packed into batches sized to the API limits and sent
+    concurrently. Requests go through a token bucket, concurrency adapts to
+    observed latency and 429 responses, and a failed batch is retried on its
+    own with exponential backoff and full jitter.
+
+    Args:
+        client (cohere.Client): Cohere client.
+        model (str): Embedding model name.
+        input_type (str): Cohere input type, e.g. "search_document".
+        max_concurrency (int, optional): Upper bound of concurrent requests. Defaults to 4.
+        requests_per_second (float, optional): Token bucket rate. Defaults to 10.
+        max_batch_chars (int, optional): Character budget per request. Defaults to 200000.
+        max_retries (int, optional): Retries per batch. Defaults to 6.
+        base_delay (float, optional): First backoff delay in seconds. Defaults to 1.
+        max_delay (float, optional): Maximum backoff delay in seconds. Defaults to 60.
+        async_client (Optional[Callable[[], Any]], optional): Returns the async
+            Cohere client of the running event loop, used by ``aembed``.
+            Without it, ``aembed`` runs ``embed`` in a thread.
+    """
+
+    def __init__(
+        self,
+        client: cohere.Client,
+        model: str,
+        input_type: str,
+        max_concurrency: int = 4,
+        requests_per_second: float = 10.0,
+        max_batch_chars: int = 200_000,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        async_client: Optional[Callable[[], Any]] = None,
+    ):
+        self.client = client
+        self.async_client = async_client
+        self.model = model
+        self.input_type = input_type
+        self.max_batch_chars = max_batch_chars
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._bucket = TokenBucket(requests_per_second, max(requests_per_second, 1))
+        self._limiter = AdaptiveLimiter(max(1, max_concurrency // 2), max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="embed"
+        )
+        self._counters = {
+            "texts": 0,
+            "batches": 0,
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed_batches": 0,
+        }
+        self._busy_seconds = 0.0
+        self._active_requests = 0
+        self._active_since = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def _begin_request(self) -> None:
+        with self._lock:
+            self._counters["requests"] += 1
+            if self._active_requests == 0:
+                self._active_since = time.monotonic()
+            self._active_requests += 1
+
+    def _end_request(self) -> None:
+        with self._lock:
+            self._active_requests -= 1
+            if self._active_requests == 0:
+                self._busy_seconds += time.monotonic() - self._active_since
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        return isinstance(error, ApiError) and error.status_code in (
+            RETRYABLE_STATUS_CODES
+        )
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self._bucket.acquire()
+            self._limiter.acquire()
+            started_at = time.monotonic()
+            self._begin_request()
+            try:
+                response = self.client.embed(
+                    texts=texts,
+                    model=self.model,
+                    input_type=self.input_type,
+                    embedding_types=["float"],
+                    truncate="END",
+                    batching=False,
+                )
+            except Exception as e:
+                self._end_request()
+                throttled = isinstance(e, ApiError) and e.status_code == 429
+                self._limiter.release(throttled=throttled)
+                if throttled:
+                    self._count("rate_limited")
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    self._count("failed_batches")
+                    raise
+                self._count("retries")
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                time.sleep(random.uniform(0, delay))
+                continue
+
+            self._end_request()
+            self._limiter.release(latency=time.monotonic() - started_at)
+            self._count("batches")
+            self._count("texts", len(texts))
+            return response.embeddings.float_
+
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        client = self.async_client()
+        for attempt in range(self.max_retries + 1):
+            self._begin_request()
+            try:
+                response = await client.embed(
+                    texts=texts,
+                    model=self.model,
+                    input_type=self.input_type,
+                    embedding_types=["float"],
+                    truncate="END",
+                    batching=False,
+                )
+            except Exception as e:
+                self._end_request()
+                if isinstance(e, ApiError) and e.status_code == 429:
+                    self._count("rate_limited")
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    self._count("failed_batches")
+                    raise
+                self._count("retries")
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+                continue
+
+            self._end_request()
+            self._count("batches")
+            self._count("texts", len(texts))
+            return response.embeddings.float_
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async variant of ``embed``, using the pooled async client of the loop.
+
+        Concurrency is left to the limiter of that client rather than the
+        thread-based limits of ``embed``.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text, in input order.
+        """
+        if self.async_client is None:
+            return await asyncio.to_thread(self.embed, texts)
+        batches = list(
+            pack_batches(texts, COHERE_MAX_BATCH_TEXTS, self.max_batch_chars)
+        )
+        results = await asyncio.gather(
+            *(self._aembed_batch([texts[i] for i in batch]) for batch in batches)
+        )
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, batch_embeddings in zip(batches, results):
+            for index, embedding in zip(batch, batch_embeddings):
+                embeddings[index] = embedding
+        return embeddings
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, retrying rate-limited or failed batches individually.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding per text, in input order.
+        """
+        batches = list(
+            pack_batches(texts, COHERE_MAX_BATCH_TEXTS, self.max_batch_chars)
+        )
+        if len(batches) == 1:
+            return self._embed_batch(texts)
+
+        futures = [
+            self._executor.submit(self._embed_batch, [texts[i] for i in batch])
+            for batch in batches
+        ]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, future in zip(batches, futures):
+            for index, embedding in zip(batch, future.result()):
+                embeddings[index] = embedding
+        return embeddings
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report the throughput counters.
+
+        Returns:
+            Dict[str, float]: Request counters, current concurrency limit and
+            texts embedded per second while requests were in flight.
+        """
+        with self._lock:
+            stats: Dict[str, float] = dict(self._counters)
+            busy_seconds = self._busy_seconds
+        stats["concurrency_limit"] = int(self._limiter.limit)
+        stats["texts_per_second"] = (
+            stats["texts"] / busy_seconds if busy_seconds else 0.0
+        )
+        return stats
+
+
+class ServiceEmbedding(BaseEmbedding):
+    """
+    LlamaIndex embedding model backed by an ``EmbeddingService``.
+
+    Args:
+        service (EmbeddingService): Service that performs the requests.
+    """
+
+    _service: EmbeddingService = PrivateAttr()
+
+    def __init__(self, service: EmbeddingService, **kwargs: Any):
+        kwargs.setdefault("model_name", service.model)
+        kwargs.setdefault("embed_batch_size", 2048)
+        super().__init__(**kwargs)
+        self._service = service
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ServiceEmbedding"
+
+    @property
+    def service(self) -> EmbeddingService:
+        return self._service
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._service.embed([query])[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._service.embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._service.embed(texts)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._service.aembed([query]))[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._service.aembed([text]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._service.aembed(texts)
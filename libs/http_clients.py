@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    TypeVar,
+)
+
+from libs.config import Config
+
+if TYPE_CHECKING:
+    import httpx
+
+T = TypeVar("T")
+
+config = Config()
+
+_http_client: Optional["httpx.Client"] = None
+_loop_resources: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]"
+) = weakref.WeakKeyDictionary()
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> "httpx.Timeout":
+    import httpx
+
+    return httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> "httpx.Client":
+    """
+    Get the process-wide pooled HTTP client for synchronous calls.
+
+    Returns:
+        httpx.Client: Client with keep-alive connection pooling.
+    """
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                import httpx
+
+                _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+    return _http_client
+
+
+def loop_local(name: str, factory: Callable[[], T]) -> T:
+    """
+    Get a resource shared by every coroutine of the running event loop.
+
+    Async HTTP connections are bound to the loop that opened them, so pooled
+    async clients are created once per loop instead of once per process.
+
+    Args:
+        name (str): Name of the resource.
+        factory (Callable[[], T]): Builds the resource on first use.
+
+    Returns:
+        T: The resource for the running loop.
+    """
+    resources = _loop_resources.setdefault(asyncio.get_running_loop(), {})
+    if name not in resources:
+        resources[name] = factory()
+    return resources[name]
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """
+    Get the pooled async HTTP client of the running event loop.
+
+    Returns:
+        httpx.AsyncClient: Client with keep-alive connection pooling.
+    """
+    import httpx
+
+    return loop_local(
+        "http_client",
+        lambda: httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+    )
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop used to run async code from sync callers.
+
+    Returns:
+        asyncio.AbstractEventLoop: A loop running forever in a daemon thread.
+    """
+    global _background_loop
+    if _background_loop is None:
+        with _lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="async-loop", daemon=True
+                ).start()
+                _background_loop = loop
+    return _background_loop
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_END = object()
+
+
+def iterate_in_background(async_iterator: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator from synchronous code.
+
+    The iterator is drained by a single task on the background loop, so many
+    callers share the same loop and pooled connections, and context
+    variables set by the iterator (and those of the caller) stay visible for
+    its whole lifetime. Closing the returned generator cancels the task,
+    which closes the async iterator as well.
+
+    Args:
+        async_iterator (AsyncIterator[T]): Async generator to consume.
+
+    Yields:
+        T: The items of the async iterator.
+    """
+    loop = get_background_loop()
+    context = contextvars.copy_context()
+    items: "queue.Queue" = queue.Queue()
+
+    async def consume() -> None:
+        for variable, value in context.items():
+            variable.set(value)
+        try:
+            async for item in async_iterator:
+                items.put(item)
+        except Exception as e:
+            items.put(_Failure(e))
+        finally:
+            items.put(_END)
+            aclose = getattr(async_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    future = asyncio.run_coroutine_threadsafe(consume(), loop)
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        future.cancel()
@@ -1,66 +1,57 @@
 import os
 import tempfile
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Union
 
-import nest_asyncio
 import streamlit as st
-from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
-from llama_index.core.node_parser import MarkdownElementNodeParser
-from llama_index.embeddings.cohere import CohereEmbedding
-from llama_index.llms.groq import Groq
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_parse import LlamaParse
-from pinecone import Pinecone
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 from libs.config import Config
-
-nest_asyncio.apply()
-
-config = Config()
-
-embed_model = CohereEmbedding(
-    model="embed-english-v3.0",
-    input_type="search_document",
-    api_key=config.COHERE_API_KEY,
-)
-
-llm = Groq(
-    model="llama-3.1-8b-instant",
-    api_key=config.GROQ_API_KEY,
-    is_function_calling_model=False,
-)
-
-Settings.llm = llm
-Settings.embed_model = embed_model
-
-Settings.chunk_size = 512
-Settings.chunk_overlap = 20
-
-pc = Pinecone(
-    api_key=config.PINECONE_API_KEY,
+from libs.paper_ledger import assign_chunk_ids, compute_document_id, get_paper_key
+from libs.resources import (
+    PARSER_SETTINGS,
+    get_document_embed_model,
+    get_index_generation,
+    get_lexical_index,
+    get_node_parser,
+    get_paper_ledger,
+    get_parse_cache,
+    get_parser,
+    get_vector_store,
 )
 
-pinecone_index = pc.Index(config.PINECONE_INDEX)
+if TYPE_CHECKING:
+    from llama_index.core import Document
 
-vector_store = PineconeVectorStore(
-    pinecone_index=pinecone_index,
-    embedding=embed_model,
-    api_key=config.PINECONE_API_KEY,
-)
-storage_context = StorageContext.from_defaults(vector_store=vector_store)
+config = Config()
 
-parser = LlamaParse(
-    api_key=config.LLAMA_CLOUD_API_KEY,
-    result_type="markdown",
-    num_workers=4,
-    verbose=True,
-)
+DELETE_BATCH_SIZE = 1000
 
-node_parser = MarkdownElementNodeParser(llm=llm, num_workers=8)
 
+def create_article_metadata(
+    article_title: str,
+    first_author: str,
+    research_area: str,
+    publication_year: int,
+    gdrive_url: str,
+) -> Dict[str, Union[str, int]]:
+    """
+    Creates a metadata dictionary for the article.
 
-def add_metadata(documents: List[Document], metadata: Dict[str, Any]) -> List[Document]:
+    Returns:
+        Dict[str, Union[str, int]]: The article metadata.
+    """
+    return {
+        "article_title": article_title,
+        "first_author": first_author,
+        "research_area": research_area,
+        "publication_year": publication_year,
+        "source": gdrive_url,
+    }
+
+
+def add_metadata(
+    documents: List["Document"], metadata: Dict[str, Any]
+) -> List["Document"]:
     """
     Add metadata to a list of documents.
 
@@ -76,7 +67,7 @@ def add_metadata(documents: List[Document], metadata: Dict[str, Any]) -> List[Do
     return documents
 
 
-def create_documents(file: UploadedFile, metadata: Dict[str, Any]) -> List[Document]:
+def create_documents(file: UploadedFile, metadata: Dict[str, Any]) -> List["Document"]:
     """
     Load documents, add metadata, and split into chunks.
 
@@ -92,9 +83,9 @@ def create_documents(file: UploadedFile, metadata: Dict[str, Any]) -> List[Docum
     return split_documents(documents_with_metadata)
 
 
-def load_document(file: UploadedFile) -> List[Document]:
+def load_document(file: UploadedFile) -> List["Document"]:
     """
-    Load documents using LlamaParse.
+    Load documents using LlamaParse, reusing cached results for known files.
 
     Args:
         file (UploadedFile): Uploaded file object.
@@ -105,26 +96,34 @@ def load_document(file: UploadedFile) -> List[Document]:
     Raises:
         ValueError: If the file cannot be processed.
     """
+    parse_cache = get_parse_cache()
+    file_bytes = file.getvalue()
+    cache_key = parse_cache.key(file_bytes, PARSER_SETTINGS)
+    documents = parse_cache.get(cache_key)
+    if documents:
+        return documents
+
     with tempfile.NamedTemporaryFile(
         delete=False, suffix=f".{file.name.split('.')[-1]}"
     ) as tmp_file:
-        tmp_file.write(file.getvalue())
+        tmp_file.write(file_bytes)
         tmp_file_path = tmp_file.name
 
     try:
-        documents = parser.load_data(tmp_file_path)
+        documents = get_parser().load_data(tmp_file_path)
         if not documents:
             raise ValueError("No documents were extracted from the file.")
+        parse_cache.set(cache_key, documents)
     except Exception as e:
         raise ValueError(f"Error processing file: {str(e)}") from e
     finally:
         os.remove(tmp_file_path)
-        return documents
+    return documents
 
 
 def split_documents(
-    documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200
-) -> List[Document]:
+    documents: List["Document"], chunk_size: int = 1000, chunk_overlap: int = 200
+) -> List["Document"]:
     """
     Split documents into chunks.
 
@@ -136,31 +135,164 @@ def split_documents(
     Returns:
         List[Document]: List of document chunks.
     """
-    nodes = node_parser.get_nodes_from_documents(documents)
-    base_nodes, objects = node_parser.get_nodes_and_objects(nodes)
-    return base_nodes + objects
+    return [chunk for chunks in iter_split_documents(documents) for chunk in chunks]
+
+
+def iter_split_documents(documents: List["Document"]) -> Iterator[List["Document"]]:
+    """
+    Split documents into chunks lazily, one source document at a time.
+
+    Args:
+        documents (List[Document]): List of documents to be split.
+
+    Yields:
+        List[Document]: The chunks of each document.
+    """
+    node_parser = get_node_parser()
+    for document in documents:
+        nodes = node_parser.get_nodes_from_documents([document])
+        base_nodes, objects = node_parser.get_nodes_and_objects(nodes)
+        yield base_nodes + objects
 
 
-def create_and_save_index(documents: List[Document]) -> None:
+def create_and_save_index(documents: Iterable["Document"]) -> Dict[str, float]:
     """
-    Insert documents into Pinecone index.
+    Stream documents into the vector store and the lexical index.
+
+    Chunks are embedded in batches and upserted while later chunks are still
+    being produced, see ``run_ingestion_pipeline``.
 
     Args:
-        documents (List[Document]): List of documents to create index from.
+        documents (Iterable[Document]): Chunks to index, possibly a generator.
+
+    Returns:
+        Dict[str, float]: Pipeline statistics.
 
     Raises:
         ValueError: If there's an error creating or saving the index.
     """
+    from libs.ingestion_pipeline import run_ingestion_pipeline
+
     try:
-        VectorStoreIndex(documents, storage_context=storage_context)
+        return run_ingestion_pipeline(
+            documents,
+            get_document_embed_model(),
+            get_vector_store(),
+            embed_batch_size=config.INGEST_EMBED_BATCH_SIZE,
+            upsert_batch_size=config.INGEST_UPSERT_BATCH_SIZE,
+            queue_size=config.INGEST_QUEUE_SIZE,
+            on_upsert=get_lexical_index().add_nodes,
+        )
     except Exception as e:
         raise ValueError(f"Error creating or saving index: {str(e)}") from e
 
 
-def embed_documents(file: UploadedFile, metadata: Dict[str, Any]) -> None:
+def is_paper_indexed(document_id: str, metadata: Dict[str, Any]) -> bool:
+    """
+    Check whether this exact version of a paper is already indexed.
+
+    Args:
+        document_id (str): Id computed by ``compute_document_id``.
+        metadata (Dict[str, Any]): Metadata of the document.
+
+    Returns:
+        bool: True if the ledger already holds this version.
+    """
+    entry = get_paper_ledger().get(get_paper_key(metadata))
+    return entry is not None and entry["document_id"] == document_id
+
+
+def delete_chunks(chunk_ids: List[str]) -> None:
+    """
+    Delete chunks from the vector store and the lexical index.
+
+    Args:
+        chunk_ids (List[str]): Ids of the chunks to delete.
+    """
+    vector_store = get_vector_store()
+    for start in range(0, len(chunk_ids), DELETE_BATCH_SIZE):
+        vector_store.delete_nodes(chunk_ids[start : start + DELETE_BATCH_SIZE])
+    get_lexical_index().delete_nodes(chunk_ids)
+
+
+def save_paper(
+    chunk_groups: Iterable[List["Document"]], metadata: Dict[str, Any], document_id: str
+) -> None:
+    """
+    Store a new version of a paper, writing only the chunks that changed.
+
+    Chunks get content-derived ids, so chunks that are already stored for the
+    previous version are skipped, and chunks that no longer exist are deleted.
+
+    Args:
+        chunk_groups (Iterable[List[Document]]): Chunks of the paper, grouped
+            by source document, e.g. from ``iter_split_documents``.
+        metadata (Dict[str, Any]): Metadata of the document.
+        document_id (str): Id computed by ``compute_document_id``.
+
+    Raises:
+        ValueError: If the paper has no chunks.
+    """
+    paper_ledger = get_paper_ledger()
+    paper_key = get_paper_key(metadata)
+    previous = paper_ledger.get(paper_key)
+    previous_chunk_ids = set(previous["chunk_ids"]) if previous else set()
+    chunk_ids = []
+    occurrences: Dict[str, int] = {}
+
+    def new_documents() -> Iterator["Document"]:
+        for documents in chunk_groups:
+            assign_chunk_ids(documents, paper_key, document_id, occurrences)
+            for document in documents:
+                chunk_ids.append(document.node_id)
+                if document.node_id not in previous_chunk_ids:
+                    yield document
+
+    create_and_save_index(new_documents())
+    if not chunk_ids:
+        # Keep the previous version rather than replacing it with nothing.
+        raise ValueError("No chunks were extracted from the paper.")
+    delete_chunks(sorted(previous_chunk_ids - set(chunk_ids)))
+
+    paper_ledger.record(paper_key, document_id, metadata, chunk_ids)
+
+
+def delete_paper(paper_key: str) -> bool:
+    """
+    Delete a paper and every chunk it owns.
+
+    Args:
+        paper_key (str): Key of the paper in the ledger.
+
+    Returns:
+        bool: True if the paper was found and deleted, False otherwise.
+    """
+    paper_ledger = get_paper_ledger()
+    entry = paper_ledger.get(paper_key)
+    if entry is None:
+        return False
+    delete_chunks(entry["chunk_ids"])
+    paper_ledger.remove(paper_key)
+    get_index_generation().bump()
+    return True
+
+
+def list_papers() -> Dict[str, Dict[str, Any]]:
+    """
+    List the indexed papers.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Ledger entries keyed by paper key.
+    """
+    return get_paper_ledger().papers()
+
+
+def embed_documents(file: UploadedFile, metadata: Dict[str, Any]) -> bool:
     """
     Embed documents into the vector store.
 
+    Re-uploading an unchanged file with the same metadata is a no-op.
+
     Args:
         file (UploadedFile): Uploaded file object.
         metadata (Dict[str, Any]): Metadata of the document.
@@ -169,8 +301,13 @@ def embed_documents(file: UploadedFile, metadata: Dict[str, Any]) -> None:
         bool: True if embedding is successful, False otherwise.
     """
     try:
-        documents = create_documents(file, metadata)
-        create_and_save_index(documents)
+        document_id = compute_document_id(file.getvalue(), metadata)
+        if is_paper_indexed(document_id, metadata):
+            st.info("This version of the paper is already indexed.")
+            return True
+        documents = add_metadata(load_document(file), metadata)
+        save_paper(iter_split_documents(documents), metadata, document_id)
+        get_index_generation().bump()
         return True
     except Exception as e:
         st.error(f"Error during document embedding: {str(e)}")
@@ -1,39 +1,50 @@
-from typing import Dict, Generator, List
-
-import cohere
-from llama_index.core import VectorStoreIndex
-from llama_index.core.settings import Settings
-from llama_index.core.vector_stores import (
-    FilterOperator,
-    MetadataFilter,
-    MetadataFilters,
+import asyncio
+import hashlib
+import logging
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
-from llama_index.embeddings.cohere import CohereEmbedding
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from pinecone import Pinecone
 
+from libs.answer_cache import hash_chat_history
+from libs.cache import normalize_text
+from libs.chat_history import build_chat_history, count_tokens, format_chat_history
 from libs.config import Config
-
-config = Config()
-
-cohere_client = cohere.Client(api_key=config.COHERE_API_KEY)
-embeddings = CohereEmbedding(
-    model="embed-english-v3.0", input_type="search_query", api_key=config.COHERE_API_KEY
+from libs.context_packer import pack_documents, select_by_relevance
+from libs.http_clients import iterate_in_background
+from libs.limiter import DeadlineExceeded, request_scope, stage_timeout
+from libs.resources import (
+    get_answer_cache,
+    get_async_cohere_client,
+    get_embedding_cache,
+    get_lexical_index,
+    get_query_embed_model,
+    get_rerank_cache,
+    get_retriever_registry,
+    get_vector_store_limiter,
 )
-
-Settings.embed_model = embeddings
-
-pc = Pinecone(
-    api_key=config.PINECONE_API_KEY,
+from libs.tracing import (
+    annotate,
+    mark,
+    record_degraded,
+    span,
+    start_trace,
+    track_degraded,
 )
 
-pinecone_index = pc.Index(config.PINECONE_INDEX)
+if TYPE_CHECKING:
+    from llama_index.core.schema import NodeWithScore
 
-vector_store = PineconeVectorStore(
-    pinecone_index=pinecone_index,
-    embedding=embeddings,
-    api_key=config.PINECONE_API_KEY,
-)
+config = Config()
+
+logger = logging.getLogger(__name__)
 
 
 preamble = """
@@ -46,107 +57,554 @@ Unless the user requests a different style of answer, respond in complete senten
 """
 
 
-def rerank_documents(question: str, documents):
-    docs = [doc.text for doc in documents]
-    rerank = cohere_client.rerank(
-        model="rerank-english-v3.0", query=question, documents=docs, top_n=3
-    )
+def candidate_key(document: "NodeWithScore") -> str:
+    """
+    Identify a retrieved node by id, falling back to a hash of its text.
+
+    Args:
+        document (NodeWithScore): Retrieved node.
+
+    Returns:
+        str: Key shared by duplicate candidates.
+    """
+    if document.node.node_id:
+        return document.node.node_id
+    return hashlib.sha256(document.node.get_content().encode("utf-8")).hexdigest()
 
-    reranked_documents = [documents[result.index] for result in rerank.results]
 
+def merge_candidates(documents: List["NodeWithScore"]) -> List["NodeWithScore"]:
+    """
+    Collapse duplicate candidates, keeping the best retrieval score of each.
+
+    Args:
+        documents (List[NodeWithScore]): Candidates from every augmented query.
+
+    Returns:
+        List[NodeWithScore]: Unique candidates in first-seen order.
+    """
+    merged: Dict[str, "NodeWithScore"] = {}
+    for document in documents:
+        key = candidate_key(document)
+        best = merged.get(key)
+        if best is None:
+            merged[key] = document
+        elif document.score is not None and (
+            best.score is None or document.score > best.score
+        ):
+            best.score = document.score
+    return list(merged.values())
+
+
+def format_reranked_documents(documents: List["NodeWithScore"]) -> List[Dict[str, str]]:
     return [
         {
             "title": f'[{doc.metadata.get("first_author")} ({int(doc.metadata.get("publication_year"))}). {doc.metadata.get("article_title")}]({doc.metadata.get("source")})',
             "snippet": doc.get_content(),
+            "id": f"doc_{index}",
         }
-        for doc in reranked_documents
+        for index, doc in enumerate(documents)
     ]
 
 
-def format_documents(query: str, research_area: str) -> List[Dict[str, str]]:
-    filter = (
-        MetadataFilters(
-            filters=[
-                MetadataFilter(
-                    key="research_area", operator=FilterOperator.EQ, value=research_area
-                ),
-            ]
-        )
-        if research_area != "All"
-        else None
-    )
+def degraded_reason(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, DeadlineExceeded):
+        return "shed"
+    return "error"
 
-    retriever = VectorStoreIndex.from_vector_store(vector_store).as_retriever(
-        similarity_top_k=10,
-        filters=filter,
-    )
 
-    documents = retriever.retrieve(query)
+def local_rerank(
+    question: str, documents: List["NodeWithScore"], keys: List[str]
+) -> List[Tuple[str, float]]:
+    """
+    Rank candidates without Cohere, for when the rerank is unavailable.
+
+    BM25 over the candidate texts is fused by reciprocal rank with the
+    vector similarity of the candidates. Candidates found by the lexical
+    search only have no similarity and rank last on it.
+
+    Args:
+        question (str): The user's question.
+        documents (List[NodeWithScore]): Unique retrieval candidates.
+        keys (List[str]): Key of each candidate.
+
+    Returns:
+        List[Tuple[str, float]]: Keys and fused scores, best first.
+    """
+    from libs.lexical_index import bm25_scores
+
+    lexical = bm25_scores(question, [doc.text for doc in documents])
+    similarity = [
+        doc.score if doc.score is not None else float("-inf") for doc in documents
+    ]
+    fused = [0.0] * len(documents)
+    for scores in (lexical, similarity):
+        ranking = sorted(range(len(documents)), key=lambda i: (-scores[i], i))
+        for rank, index in enumerate(ranking, start=1):
+            fused[index] += 1.0 / (60 + rank)
+    ranking = sorted(range(len(documents)), key=lambda i: (-fused[i], i))
+    return [(keys[index], fused[index]) for index in ranking]
+
+
+async def arerank_documents(
+    question: str, documents: List["NodeWithScore"]
+) -> List[Dict[str, str]]:
+    """
+    Rerank candidates and pack the most relevant ones into the context budget.
+
+    Cohere scores up to ``RERANK_MAX_TOP_N`` candidates; how many are kept
+    depends on their relevance scores, and their snippets are excerpted so
+    the documents fit in ``CONTEXT_MAX_TOKENS``. If Cohere fails or does not
+    answer within ``RERANK_TIMEOUT`` seconds (or the turn's deadline), the
+    candidates are ranked locally by ``local_rerank`` instead.
+
+    Args:
+        question (str): The user's question.
+        documents (List[NodeWithScore]): Unique retrieval candidates.
+
+    Returns:
+        List[Dict[str, str]]: Documents for ``chat_stream``.
+    """
+    keys = [candidate_key(doc) for doc in documents]
+    cache_key = (normalize_text(question), frozenset(keys))
+    rerank_cache = get_rerank_cache()
+
+    with span("rerank", candidates=len(documents)) as stage:
+        ranked = rerank_cache.get(cache_key)
+        stage.set(cache_hit=ranked is not None)
+        annotate(rerank_cache_hit=ranked is not None)
+
+        if ranked is None:
+            docs = [doc.text for doc in documents]
+            try:
+                rerank = await asyncio.wait_for(
+                    get_async_cohere_client().rerank(
+                        model="rerank-english-v3.0",
+                        query=question,
+                        documents=docs,
+                        top_n=config.RERANK_MAX_TOP_N,
+                    ),
+                    stage_timeout(config.RERANK_TIMEOUT),
+                )
+            except Exception as e:
+                reason = degraded_reason(e)
+                logger.warning("Rerank failed (%s); ranking locally", reason)
+                record_degraded("rerank", reason)
+                stage.set(fallback=reason)
+                selected = local_rerank(question, documents, keys)[
+                    : config.RERANK_FALLBACK_TOP_N
+                ]
+            else:
+                ranked = [
+                    (keys[result.index], result.relevance_score)
+                    for result in rerank.results
+                ]
+                rerank_cache.set(cache_key, ranked)
+
+        if ranked is not None:
+            selected = select_by_relevance(
+                ranked,
+                config.RERANK_MIN_TOP_N,
+                config.RERANK_MIN_RELEVANCE,
+                config.RERANK_RELATIVE_RELEVANCE,
+            )
+        stage.set(top_n=len(selected))
+
+    documents_by_key = dict(zip(keys, documents))
+    with span("context_packing") as stage:
+        packed = pack_documents(
+            question,
+            format_reranked_documents([documents_by_key[key] for key, _ in selected]),
+            config.CONTEXT_MAX_TOKENS,
+            config.CONTEXT_SNIPPET_MAX_TOKENS,
+        )
+        context_tokens = sum(
+            count_tokens(doc["title"]) + count_tokens(doc["snippet"]) for doc in packed
+        )
+        stage.set(documents=len(packed), context_tokens=context_tokens)
+    annotate(context_documents=len(packed), context_tokens=context_tokens)
+    return packed
+
+
+async def aembed_query(text: str) -> List[float]:
+    """
+    Embed a query through the embedding cache.
+
+    Args:
+        text (str): Query to embed.
+
+    Returns:
+        List[float]: The embedding.
+    """
+    cache_hit = True
+
+    async def embed(text: str) -> List[float]:
+        nonlocal cache_hit
+        cache_hit = False
+        # The async Cohere client of the loop holds the limiter slot.
+        return await get_query_embed_model().aget_query_embedding(text)
+
+    with span("embed_query") as stage:
+        embedding = await get_embedding_cache().aget_or_compute(text, embed)
+        stage.set(cache_hit=cache_hit)
+    return embedding
+
+
+async def aformat_documents(query: str, research_area: str) -> List["NodeWithScore"]:
+    from llama_index.core.schema import QueryBundle
+
+    from libs.lexical_index import reciprocal_rank_fusion
+
+    retriever = get_retriever_registry().get(research_area)
+    embedding = await aembed_query(query)
+
+    with span("vector_query") as stage:
+        async with get_vector_store_limiter().slot():
+            documents = await retriever.aretrieve(
+                QueryBundle(query_str=query, embedding=embedding)
+            )
+        stage.set(results=len(documents))
+
+    if config.HYBRID_RETRIEVAL:
+        with span("lexical_search") as stage:
+            # SQLite and BM25 scoring block, so keep them off the shared loop.
+            lexical_documents = await asyncio.to_thread(
+                get_lexical_index().search, query, research_area, config.LEXICAL_TOP_K
+            )
+            stage.set(results=len(lexical_documents))
+        if lexical_documents:
+            # Keep the fused order but the vector similarity as the score,
+            # which ``local_rerank`` ranks by when the rerank is unavailable.
+            similarity = {doc.node.node_id: doc.score for doc in documents}
+            documents = reciprocal_rank_fusion([documents, lexical_documents])[
+                : config.SIMILARITY_TOP_K
+            ]
+            for doc in documents:
+                doc.score = similarity.get(doc.node.node_id)
 
     return documents
 
 
-def format_chat_history(messages: List[Dict[str, str]]) -> str:
-    chat_history = []
+async def aretrieve_query(
+    query: str, research_area: str
+) -> Optional[List["NodeWithScore"]]:
+    """
+    Retrieve documents for one query within ``config.RETRIEVAL_TIMEOUT`` seconds.
+
+    Args:
+        query (str): Search query to run against the vector store.
+        research_area (str): Research area used to filter the results.
+
+    Returns:
+        Optional[List[NodeWithScore]]: Retrieved documents, or None if the
+        query timed out or failed.
+    """
+    try:
+        return await asyncio.wait_for(
+            aformat_documents(query, research_area),
+            stage_timeout(config.RETRIEVAL_TIMEOUT),
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Retrieval timed out for query %r", query)
+        record_degraded("retrieval", "timeout")
+    except DeadlineExceeded as e:
+        logger.warning("Retrieval skipped for query %r: %s", query, e)
+        record_degraded("retrieval", "shed")
+    except Exception:
+        logger.exception("Retrieval failed for query %r", query)
+        record_degraded("retrieval", "error")
+    return None
+
+
+async def aretrieve_documents(
+    queries: List[str], research_area: str
+) -> List["NodeWithScore"]:
+    """
+    Retrieve documents for several queries concurrently.
+
+    Every query runs on the event loop at once, so the retrieval latency
+    tracks the slowest query instead of the sum of all of them. Queries that
+    do not finish within ``config.RETRIEVAL_TIMEOUT`` seconds (or that fail)
+    are skipped.
+
+    Args:
+        queries (List[str]): Search queries to run against the vector store.
+        research_area (str): Research area used to filter the results.
+
+    Returns:
+        List[NodeWithScore]: Retrieved documents, grouped in query order.
+    """
+    with span("retrieval", queries=len(queries)) as stage:
+        results = await asyncio.gather(
+            *[aretrieve_query(query, research_area) for query in queries]
+        )
+
+        related_documents = []
+        for documents in results:
+            if documents is not None:
+                related_documents.extend(documents)
+        stage.set(
+            results=len(related_documents),
+            failed_queries=sum(documents is None for documents in results),
+        )
 
-    for message in messages[:-1]:
-        if message["role"] == "user":
-            chat_history.append({"role": "USER", "message": message["content"]})
-        elif message["role"] == "assistant":
-            chat_history.append({"role": "CHATBOT", "message": message["content"]})
+    return related_documents
+
+
+def queries_match(query: str, other: str, threshold: float) -> bool:
+    """
+    Tell whether two search queries would retrieve about the same documents.
+
+    Args:
+        query (str): First query.
+        other (str): Second query.
+        threshold (float): Minimum Jaccard similarity of their terms.
+
+    Returns:
+        bool: True if the queries match.
+    """
+    from libs.lexical_index import tokenize
+
+    terms, other_terms = set(tokenize(query)), set(tokenize(other))
+    if not terms or not other_terms:
+        return normalize_text(query) == normalize_text(other)
+    return len(terms & other_terms) / len(terms | other_terms) >= threshold
+
+
+async def aretrieve_speculatively(
+    question: str,
+    queries: List[str],
+    research_area: str,
+    speculative: "asyncio.Task[Optional[List[NodeWithScore]]]",
+) -> List["NodeWithScore"]:
+    """
+    Complete a retrieval that was started on the raw question.
+
+    Generated queries that closely match the question are covered by the
+    speculative results; only the other queries are retrieved, concurrently
+    with the speculative retrieval if it is still running.
+
+    Args:
+        question (str): The raw question the speculative retrieval ran on.
+        queries (List[str]): Generated search queries.
+        research_area (str): Research area used to filter the results.
+        speculative (asyncio.Task): Retrieval task of the raw question.
+
+    Returns:
+        List[NodeWithScore]: Speculative results followed by the extra results.
+    """
+    covered = [
+        query
+        for query in queries
+        if queries_match(query, question, config.SPECULATIVE_MATCH_THRESHOLD)
+    ]
+    extra = [query for query in queries if query not in covered]
+    annotate(speculative_covered_queries=len(covered))
 
-    return chat_history if chat_history else None
+    speculative_documents, extra_documents = await asyncio.gather(
+        speculative, aretrieve_documents(extra, research_area)
+    )
+    if speculative_documents is None:
+        # The speculative retrieval failed, so nothing is actually covered.
+        speculative_documents = await aretrieve_documents(covered, research_area)
+    return speculative_documents + extra_documents
 
 
 def chat_answer(
-    question: str, streamlit_chat_history: List, research_area: str
-) -> Generator[str, None, None]:
-
-    augmented_queries = cohere_client.chat(
-        message=question,
-        model="command-r-plus-08-2024",
-        temperature=0.3,
-        chat_history=format_chat_history(streamlit_chat_history),
-        search_queries_only=True,
+    question: str,
+    streamlit_chat_history: List,
+    research_area: str,
+    session_id: Optional[str] = None,
+) -> Generator[Union[str, List[str]], None, None]:
+    yield from iterate_in_background(
+        achat_answer(question, streamlit_chat_history, research_area, session_id)
+    )
+
+
+async def achat_answer(
+    question: str,
+    streamlit_chat_history: List,
+    research_area: str,
+    session_id: Optional[str] = None,
+) -> AsyncGenerator[Union[str, List[str]], None]:
+    """
+    Answer a question, streaming text chunks and the sources cited so far.
+
+    Upstream calls are made on behalf of ``session_id`` and shed with
+    ``DeadlineExceeded`` once the turn is older than ``config.CHAT_DEADLINE``.
+
+    Args:
+        question (str): The user's question.
+        streamlit_chat_history (List): Messages of the conversation so far.
+        research_area (str): Research area used to filter the documents.
+        session_id (Optional[str]): Session of the user, for fair queueing.
+
+    Yields:
+        Union[str, List[str]]: Text chunks of the answer. A list with the source
+            titles cited so far is yielded whenever it grows, and a final
+            complete list ends the stream.
+    """
+    with request_scope(session_id, config.CHAT_DEADLINE), start_trace(
+        "chat", research_area=research_area
+    ), track_degraded() as degraded:
+        verbatim_history = format_chat_history(streamlit_chat_history)
+        chat_history = build_chat_history(verbatim_history)
+        annotate(
+            history_turns=len(verbatim_history),
+            history_tokens=sum(
+                count_tokens(message["message"]) for message in chat_history or []
+            ),
+        )
+        answer_cache = get_answer_cache()
+        question_embedding = await aembed_query(question)
+        history_key = hash_chat_history(
+            verbatim_history, config.ANSWER_CACHE_HISTORY_TURNS
+        )
+
+        with span("answer_cache"):
+            cached_answer, generation = answer_cache.lookup(
+                question_embedding, research_area, history_key
+            )
+        annotate(answer_cache_hit=cached_answer is not None)
+        if cached_answer is not None:
+            mark("first_token")
+            for chunk in cached_answer.replay():
+                yield chunk
+            return
+
+        chunks, sources = [], None
+        async for chunk in agenerate_answer(question, chat_history, research_area):
+            if isinstance(chunk, list):
+                sources = chunk
+            else:
+                chunks.append(chunk)
+            yield chunk
+        # Answers from a degraded turn, or citing no documents, are not worth
+        # replaying to the next similar question.
+        if sources and not degraded:
+            answer_cache.store(
+                question_embedding,
+                research_area,
+                history_key,
+                chunks,
+                sources,
+                generation,
+            )
+
+
+async def agenerate_answer(
+    question: str, chat_history: Optional[List[Dict[str, str]]], research_area: str
+) -> AsyncGenerator[Union[str, List[str]], None]:
+    client = get_async_cohere_client()
+
+    speculative = None
+    if config.SPECULATIVE_RETRIEVAL:
+        speculative = asyncio.create_task(aretrieve_query(question, research_area))
+
+    try:
+        with span("query_generation"):
+            augmented_queries = await client.chat(
+                message=question,
+                model="command-r-plus-08-2024",
+                temperature=0.3,
+                chat_history=chat_history,
+                search_queries_only=True,
+            )
+    except BaseException:
+        if speculative is not None:
+            speculative.cancel()
+        raise
+    annotate(
+        augmented_queries=len(augmented_queries.search_queries or []),
+        **billed_tokens(augmented_queries, "query_"),
     )
 
-    related_documents = []
     if augmented_queries.search_queries:
-        for augmented_query in augmented_queries.search_queries:
-            documents = format_documents(augmented_query.text, research_area)
-            related_documents.extend(documents)
-        if related_documents:
-            documents = rerank_documents(question, related_documents)
+        queries = [
+            augmented_query.text for augmented_query in augmented_queries.search_queries
+        ]
+        if speculative is not None:
+            related_documents = await aretrieve_speculatively(
+                question, queries, research_area, speculative
+            )
+        else:
+            related_documents = await aretrieve_documents(queries, research_area)
+        candidates = merge_candidates(related_documents)
+        annotate(candidates=len(candidates))
+        if candidates:
+            documents = await arerank_documents(question, candidates)
         else:
             documents = None
     else:
+        if speculative is not None:
+            speculative.cancel()
         documents = None
 
-    citations = []
-    for event in cohere_client.chat_stream(
-        model="command-r-plus-08-2024",
-        message=question,
-        preamble=preamble,
-        chat_history=format_chat_history(streamlit_chat_history),
-        documents=documents,
-        temperature=0.0,
-    ):
-        if event.event_type == "text-generation":
-            yield event.text
-        elif event.event_type == "citation-generation":
-            for cit in event.citations:
-                citations.extend(cit.document_ids)
-        elif event.event_type == "stream-end":
-            sources = process_citations(event, citations)
-            yield sources
-
-
-def process_citations(event, citations):
-    unique_citations = set(citations)
-    sources = [
-        doc["title"]
-        for citation in unique_citations
-        for doc in event.response.documents
-        if doc["id"] == citation
-    ]
-    return list(set(sources))
+    titles = {doc["id"]: doc["title"] for doc in documents or []}
+    sources: List[str] = []
+    with span("generation", documents=len(documents or [])) as stage:
+        async for event in client.chat_stream(
+            model="command-r-plus-08-2024",
+            message=question,
+            preamble=preamble,
+            chat_history=chat_history,
+            documents=documents,
+            temperature=0.0,
+        ):
+            if event.event_type == "text-generation":
+                mark("first_token")
+                yield event.text
+            elif event.event_type == "citation-generation":
+                if add_cited_sources(sources, event.citations, titles):
+                    mark("first_source")
+                    yield list(sources)
+            elif event.event_type == "stream-end":
+                tokens = billed_tokens(event.response)
+                stage.set(**tokens)
+                annotate(**tokens)
+                yield list(sources)
+
+
+def billed_tokens(response, prefix: str = "") -> Dict[str, int]:
+    """
+    Read the billed token counts of a Cohere response.
+
+    Args:
+        response: Cohere chat response.
+        prefix (str, optional): Prefix of the returned keys. Defaults to "".
+
+    Returns:
+        Dict[str, int]: ``input_tokens`` and ``output_tokens`` when reported.
+    """
+    billed_units = getattr(getattr(response, "meta", None), "billed_units", None)
+    tokens = {}
+    for kind in ("input", "output"):
+        value = getattr(billed_units, f"{kind}_tokens", None)
+        if value is not None:
+            tokens[f"{prefix}{kind}_tokens"] = int(value)
+    return tokens
+
+
+def add_cited_sources(
+    sources: List[str], citations: List[Any], titles: Dict[str, str]
+) -> bool:
+    """
+    Add the titles of newly cited documents to the sources, in citation order.
+
+    Args:
+        sources (List[str]): Titles cited so far, updated in place.
+        citations (List[Any]): Citations of a ``citation-generation`` event.
+        titles (Dict[str, str]): Title of each document id sent to the model.
+
+    Returns:
+        bool: Whether any title was added.
+    """
+    added = False
+    for citation in citations:
+        for document_id in citation.document_ids:
+            title = titles.get(document_id)
+            if title is not None and title not in sources:
+                sources.append(title)
+                added = True
+    return added
@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+_DONE = object()
+
+
+def batched(items: Iterable[BaseNode], batch_size: int) -> Iterator[List[BaseNode]]:
+    """
+    Group an iterable into lists of at most ``batch_size`` items.
+
+    Args:
+        items (Iterable[BaseNode]): Items to group.
+        batch_size (int): Maximum size of each batch.
+
+    Yields:
+        List[BaseNode]: Consecutive batches.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Stage(threading.Thread):
+    """Thread that feeds the items of an iterator into a bounded queue."""
+
+    def __init__(self, name: str, items: Iterable, output: "queue.Queue"):
+        super().__init__(name=name, daemon=True)
+        self.items = items
+        self.output = output
+        self.error: Optional[BaseException] = None
+        self.stopped = threading.Event()
+
+    def _put(self, item) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.output.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self) -> None:
+        try:
+            for item in self.items:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._put(_DONE)
+
+
+def _drain(source: "queue.Queue", stage: _Stage) -> Iterator:
+    while True:
+        item = source.get()
+        if item is _DONE:
+            if stage.error is not None:
+                raise stage.error
+            return
+        yield item
+
+
+def run_ingestion_pipeline(
+    nodes: Iterable[BaseNode],
+    embed_model: BaseEmbedding,
+    vector_store: BasePydanticVectorStore,
+    embed_batch_size: int,
+    upsert_batch_size: int,
+    queue_size: int,
+    on_upsert: Optional[Callable[[List[BaseNode]], None]] = None,
+) -> Dict[str, float]:
+    """
+    Stream nodes through split, embed and upsert stages connected by bounded queues.
+
+    The split stage (the ``nodes`` iterator) and the embedding stage each run
+    in their own thread, and this thread performs the upserts, so parsing,
+    embedding calls and vector store writes overlap. At most ``queue_size``
+    batches wait between two stages, and embeddings are dropped from the
+    nodes once they are upserted, so memory stays flat for large papers.
+
+    Args:
+        nodes (Iterable[BaseNode]): Nodes to index, typically a generator.
+        embed_model (BaseEmbedding): Model used to embed node text.
+        vector_store (BasePydanticVectorStore): Destination vector store.
+        embed_batch_size (int): Number of texts per embedding call.
+        upsert_batch_size (int): Number of nodes per vector store write.
+        queue_size (int): Maximum number of batches buffered between stages.
+        on_upsert (Optional[Callable[[List[BaseNode]], None]]): Called with every
+            upserted batch, e.g. to update the lexical index.
+
+    Returns:
+        Dict[str, float]: Number of nodes, embedding calls, upserts and seconds.
+    """
+    started_at = time.perf_counter()
+    stats = {"nodes": 0, "embed_batches": 0, "upserts": 0}
+
+    split_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    split_stage = _Stage("ingest-split", batched(nodes, embed_batch_size), split_queue)
+
+    def embed_batches() -> Iterator[BaseNode]:
+        for batch in _drain(split_queue, split_stage):
+            texts = [
+                node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch
+            ]
+            embeddings = embed_model.get_text_embedding_batch(texts)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+            stats["embed_batches"] += 1
+            yield from batch
+
+    embed_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    embed_stage = _Stage(
+        "ingest-embed", batched(embed_batches(), upsert_batch_size), embed_queue
+    )
+
+    split_stage.start()
+    embed_stage.start()
+    try:
+        for batch in _drain(embed_queue, embed_stage):
+            vector_store.add(batch)
+            if on_upsert is not None:
+                on_upsert(batch)
+            for node in batch:
+                node.embedding = None
+            stats["nodes"] += len(batch)
+            stats["upserts"] += 1
+    finally:
+        split_stage.stopped.set()
+        embed_stage.stopped.set()
+
+    stats["seconds"] = time.perf_counter() - started_at
+    return stats
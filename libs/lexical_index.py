@@ -0,0 +1,327 @@
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from llama_index.core.schema import BaseNode, NodeWithScore
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by de do does for from has have how in is it its of on "
+    "or that the this to was were what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms, dropping common stopwords.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: Terms in order of appearance.
+    """
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.casefold())
+        if token not in STOPWORDS
+    ]
+
+
+def bm25_weight(
+    tf: int,
+    df: int,
+    total: int,
+    length: int,
+    average_length: float,
+    k1: float,
+    b: float,
+) -> float:
+    """
+    BM25 weight of one term in one document.
+
+    Args:
+        tf (int): Occurrences of the term in the document.
+        df (int): Documents containing the term.
+        total (int): Documents in the collection.
+        length (int): Terms in the document.
+        average_length (float): Average terms per document.
+        k1 (float): Term frequency saturation.
+        b (float): Length normalization.
+
+    Returns:
+        float: The weight.
+    """
+    idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+    return (
+        idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / (average_length or 1)))
+    )
+
+
+def bm25_scores(
+    query: str, texts: List[str], k1: float = 1.5, b: float = 0.75
+) -> List[float]:
+    """
+    Score texts against a query with BM25, using the texts as the collection.
+
+    Args:
+        query (str): Search query.
+        texts (List[str]): Texts to score.
+        k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+        b (float, optional): BM25 length normalization. Defaults to 0.75.
+
+    Returns:
+        List[float]: One score per text.
+    """
+    terms = set(tokenize(query))
+    counts = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(count.values()) for count in counts]
+    average_length = sum(lengths) / (len(lengths) or 1)
+    document_frequency = {
+        term: sum(1 for count in counts if term in count) for term in terms
+    }
+    scores = []
+    for count, length in zip(counts, lengths):
+        score = 0.0
+        for term in terms & count.keys():
+            score += bm25_weight(
+                count[term],
+                document_frequency[term],
+                len(texts),
+                length,
+                average_length,
+                k1,
+                b,
+            )
+        scores.append(score)
+    return scores
+
+
+def reciprocal_rank_fusion(
+    result_lists: Iterable[List[NodeWithScore]], k: int = 60
+) -> List[NodeWithScore]:
+    """
+    Fuse ranked result lists with reciprocal-rank fusion.
+
+    Args:
+        result_lists (Iterable[List[NodeWithScore]]): Ranked lists to fuse.
+        k (int, optional): Rank smoothing constant. Defaults to 60.
+
+    Returns:
+        List[NodeWithScore]: Unique nodes ordered by fused score.
+    """
+    fused: Dict[str, NodeWithScore] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            node_id = result.node.node_id
+            if node_id not in fused:
+                fused[node_id] = NodeWithScore(node=result.node, score=0.0)
+            fused[node_id].score += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda result: result.score, reverse=True)
+
+
+class LexicalIndex:
+    """
+    Incrementally maintained BM25 inverted index over node text.
+
+    Postings, document lengths and the serialized nodes live in a SQLite
+    file, so ingestion can add papers while the chatbot keeps querying it.
+    The chatbot only sees papers added by the admin area when both use the
+    same file, so separate deployments must share the ``CACHE_DIR`` volume.
+    Papers indexed before the lexical index existed are added by
+    ``python -m libs.lexical_index``.
+
+    Args:
+        path (str): SQLite file holding the index.
+        k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+        b (float, optional): BM25 length normalization. Defaults to 0.75.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    node_id TEXT PRIMARY KEY,
+                    research_area TEXT,
+                    length INTEGER,
+                    node TEXT
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT,
+                    node_id TEXT,
+                    tf INTEGER,
+                    PRIMARY KEY (term, node_id)
+                );
+                CREATE INDEX IF NOT EXISTS postings_node_id ON postings (node_id);
+                """)
+
+    def add_nodes(self, nodes: List[BaseNode]) -> None:
+        """
+        Insert or replace nodes in the index.
+
+        Args:
+            nodes (List[BaseNode]): Nodes to index.
+        """
+        with self._lock, self._connection:
+            for node in nodes:
+                terms = Counter(tokenize(node.get_content()))
+                self._delete(node.node_id)
+                self._connection.execute(
+                    "INSERT INTO documents VALUES (?, ?, ?, ?)",
+                    (
+                        node.node_id,
+                        node.metadata.get("research_area"),
+                        sum(terms.values()),
+                        json.dumps(node_to_metadata_dict(node, remove_text=False)),
+                    ),
+                )
+                self._connection.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, node.node_id, tf) for term, tf in terms.items()],
+                )
+
+    def _delete(self, node_id: str) -> None:
+        self._connection.execute("DELETE FROM documents WHERE node_id = ?", (node_id,))
+        self._connection.execute("DELETE FROM postings WHERE node_id = ?", (node_id,))
+
+    def delete_nodes(self, node_ids: List[str]) -> None:
+        """
+        Remove nodes from the index.
+
+        Args:
+            node_ids (List[str]): Ids of the nodes to remove.
+        """
+        with self._lock, self._connection:
+            for node_id in node_ids:
+                self._delete(node_id)
+
+    def search(self, query: str, research_area: str, top_k: int) -> List[NodeWithScore]:
+        """
+        Rank indexed nodes against a query with BM25.
+
+        Args:
+            query (str): Search query.
+            research_area (str): Research area used to filter the results, or "All".
+            top_k (int): Maximum number of results.
+
+        Returns:
+            List[NodeWithScore]: Matching nodes ordered by BM25 score.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        area_clause = "" if research_area == "All" else " AND d.research_area = ?"
+        area_params = [] if research_area == "All" else [research_area]
+        placeholders = ",".join("?" * len(terms))
+
+        with self._lock:
+            total, average_length = self._connection.execute(
+                "SELECT COUNT(*), AVG(length) FROM documents"
+            ).fetchone()
+            if not total:
+                return []
+            document_frequency = dict(
+                self._connection.execute(
+                    f"SELECT term, COUNT(*) FROM postings "
+                    f"WHERE term IN ({placeholders}) GROUP BY term",
+                    terms,
+                ).fetchall()
+            )
+            rows = self._connection.execute(
+                f"SELECT p.node_id, p.term, p.tf, d.length FROM postings p "
+                f"JOIN documents d ON d.node_id = p.node_id "
+                f"WHERE p.term IN ({placeholders}){area_clause}",
+                terms + area_params,
+            ).fetchall()
+
+        scores: Dict[str, float] = {}
+        for node_id, term, tf, length in rows:
+            scores[node_id] = scores.get(node_id, 0.0) + bm25_weight(
+                tf,
+                document_frequency[term],
+                total,
+                length,
+                average_length,
+                self.k1,
+                self.b,
+            )
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            NodeWithScore(node=node, score=score)
+            for node_id, score in best
+            if (node := self._get_node(node_id)) is not None
+        ]
+
+    def _get_node(self, node_id: str) -> Optional[BaseNode]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT node FROM documents WHERE node_id = ?", (node_id,)
+            ).fetchone()
+        return metadata_dict_to_node(json.loads(row[0])) if row else None
+
+
+def backfill(index: LexicalIndex, records: Iterable, batch_size: int = 500) -> int:
+    """
+    Add the nodes stored in the vector store to the lexical index.
+
+    Args:
+        index (LexicalIndex): Index to fill.
+        records (Iterable): ``(id, embedding, metadata)`` records, e.g. from
+            ``libs.vector_stores.read_records``.
+        batch_size (int, optional): Nodes per transaction. Defaults to 500.
+
+    Returns:
+        int: Number of nodes added.
+    """
+    added = 0
+    batch: List[BaseNode] = []
+    for node_id, _, metadata in records:
+        node = metadata_dict_to_node(metadata)
+        node.id_ = node_id
+        batch.append(node)
+        if len(batch) >= batch_size:
+            index.add_nodes(batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        index.add_nodes(batch)
+        added += len(batch)
+    return added
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description="Fill the lexical index from the vector store."
+    )
+    argument_parser.add_argument("--batch-size", type=int, default=500)
+    arguments = argument_parser.parse_args()
+
+    from libs.resources import get_lexical_index, get_vector_store
+    from libs.vector_stores import read_records
+
+    added = backfill(
+        get_lexical_index(), read_records(get_vector_store()), arguments.batch_size
+    )
+    print(f"Added {added} nodes to the lexical index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from libs.tracing import COUNT_BUCKETS, annotate, metrics
+
+ANONYMOUS_SESSION = "anonymous"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+_session: ContextVar[str] = ContextVar("session", default=ANONYMOUS_SESSION)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of making an upstream call for a request that is out of time."""
+
+
+@contextmanager
+def request_scope(
+    session_id: Optional[str] = None, timeout: Optional[float] = None
+) -> Iterator[None]:
+    """
+    Set the session and deadline that upstream calls in this context inherit.
+
+    Tasks created inside the scope copy it, so speculative and parallel calls
+    are limited on behalf of the same session and deadline. A nested scope
+    can only shorten the deadline.
+
+    Args:
+        session_id (Optional[str]): Session used for fair queueing. Without
+            one, the scope keeps the enclosing session, or gets a session of
+            its own when there is none, so anonymous requests do not share
+            one session's cap.
+        timeout (Optional[float]): Seconds from now until the deadline. None or
+            0 keeps the current deadline.
+    """
+    deadline = _deadline.get()
+    if timeout:
+        new_deadline = time.monotonic() + timeout
+        deadline = new_deadline if deadline is None else min(deadline, new_deadline)
+    deadline_token = _deadline.set(deadline)
+    session = session_id or _session.get()
+    if session == ANONYMOUS_SESSION:
+        session = f"{ANONYMOUS_SESSION}-{uuid.uuid4().hex}"
+    session_token = _session.set(session)
+    try:
+        yield
+    finally:
+        for variable, token in ((_deadline, deadline_token), (_session, session_token)):
+            try:
+                variable.reset(token)
+            except ValueError:
+                # Finalized from another context, e.g. an abandoned async generator.
+                pass
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Get the time left before the current deadline.
+
+    Returns:
+        Optional[float]: Seconds left, or None without a deadline.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def stage_timeout(budget: float) -> float:
+    """
+    Get the timeout of a pipeline stage, cut short by the current deadline.
+
+    Args:
+        budget (float): Seconds the stage may take.
+
+    Returns:
+        float: The smaller of the budget and the time left, at least 0.
+    """
+    remaining = remaining_time()
+    return budget if remaining is None else max(0.0, min(budget, remaining))
+
+
+class RateLimiter:
+    """
+    Space out calls to stay under a provider's requests-per-minute limit.
+
+    Each call reserves the next free start time, so bursts are smoothed into
+    evenly spaced calls instead of failing with rate-limit errors. The state
+    is guarded by a lock, so one limiter can be shared by every loop of the
+    process.
+
+    Args:
+        requests_per_minute (float): Calls allowed per minute. 0 disables the limit.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    async def wait(self) -> None:
+        """Wait until the next call may start."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class _Waiter:
+    def __init__(self, session: str):
+        self.session = session
+        self.loop = asyncio.get_running_loop()
+        self.future: "asyncio.Future[None]" = self.loop.create_future()
+        self.granted = False
+
+
+class UpstreamLimiter:
+    """
+    Cap in-flight calls to an upstream provider, fairly across sessions.
+
+    Calls beyond ``max_in_flight`` wait in one queue per session, and freed
+    slots go to the sessions in turn, so a session with many queued calls
+    delays the others by at most one call each. A session never holds more
+    than ``max_per_session`` slots. Calls are shed with ``DeadlineExceeded``
+    when the deadline of their request passes before they get a slot.
+
+    The state is guarded by a lock and waiters are woken on their own event
+    loop, so one limiter can be shared by every loop of the process.
+
+    Args:
+        provider (str): Provider name, used as the metrics label.
+        max_in_flight (int): Calls allowed at the same time.
+        max_per_session (int): Calls one session may have in flight.
+    """
+
+    def __init__(self, provider: str, max_in_flight: int, max_per_session: int):
+        self.provider = provider
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_per_session = max(1, max_per_session)
+        self.in_flight = 0
+        self.queued = 0
+        self._in_flight_by_session: Dict[str, int] = {}
+        self._waiters: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _can_start(self, session: str) -> bool:
+        return (
+            self.in_flight < self.max_in_flight
+            and self._in_flight_by_session.get(session, 0) < self.max_per_session
+        )
+
+    def _start(self, session: str) -> None:
+        self.in_flight += 1
+        self._in_flight_by_session[session] = (
+            self._in_flight_by_session.get(session, 0) + 1
+        )
+
+    def _grant_waiters(self) -> None:
+        granted = True
+        while granted and self.in_flight < self.max_in_flight:
+            granted = False
+            for session in list(self._waiters):
+                if not self._can_start(session):
+                    continue
+                waiters = self._waiters[session]
+                waiter = waiters.popleft()
+                if waiters:
+                    self._waiters.move_to_end(session)
+                else:
+                    del self._waiters[session]
+                self.queued -= 1
+                self._start(session)
+                waiter.granted = True
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+                granted = True
+                break
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge(
+            "upstream_in_flight",
+            "Upstream calls in flight.",
+            self.in_flight,
+            provider=self.provider,
+        )
+        metrics.set_gauge(
+            "upstream_queue_depth",
+            "Upstream calls waiting for a slot.",
+            self.queued,
+            provider=self.provider,
+        )
+
+    def _shed(self, reason: str) -> DeadlineExceeded:
+        metrics.inc(
+            "upstream_shed_total",
+            "Upstream calls shed before being made.",
+            provider=self.provider,
+            reason=reason,
+        )
+        annotate(shed=True)
+        return DeadlineExceeded(f"{self.provider} call shed: {reason}")
+
+    async def acquire(self) -> str:
+        """
+        Wait for a slot on behalf of the current session.
+
+        Returns:
+            str: The session, to pass to ``release``.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before a slot was free.
+        """
+        timeout = remaining_time()
+        if timeout is not None and timeout <= 0:
+            raise self._shed("expired")
+
+        session = _session.get()
+        with self._lock:
+            if self._can_start(session):
+                self._start(session)
+                self._update_gauges()
+                return session
+            waiter = _Waiter(session)
+            self._waiters.setdefault(session, deque()).append(waiter)
+            self.queued += 1
+            depth = self.queued
+            self._update_gauges()
+        metrics.observe(
+            "upstream_queue_depth_on_arrival",
+            "Upstream calls already waiting when a call is queued.",
+            depth - 1,
+            buckets=COUNT_BUCKETS,
+            provider=self.provider,
+        )
+
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException as e:
+            with self._lock:
+                if waiter.granted:
+                    self._release(session)
+                else:
+                    self._waiters[session].remove(waiter)
+                    if not self._waiters[session]:
+                        del self._waiters[session]
+                    self.queued -= 1
+                self._update_gauges()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("queue timeout") from None
+            raise
+        finally:
+            metrics.observe(
+                "upstream_wait_seconds",
+                "Time upstream calls waited for a slot.",
+                time.perf_counter() - started_at,
+                provider=self.provider,
+            )
+        return session
+
+    def _release(self, session: str) -> None:
+        self.in_flight -= 1
+        self._in_flight_by_session[session] -= 1
+        if not self._in_flight_by_session[session]:
+            del self._in_flight_by_session[session]
+        self._grant_waiters()
+
+    def release(self, session: str) -> None:
+        """
+        Free a slot and hand it to the next waiting session.
+
+        Args:
+            session (str): Session returned by ``acquire``.
+        """
+        with self._lock:
+            self._release(session)
+            self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        session = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(session)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LimitedAsyncCohere:
+    """
+    Async Cohere client whose calls go through an ``UpstreamLimiter``.
+
+    A ``chat_stream`` holds its slot until the stream is consumed or closed.
+    Other attributes are passed through to the wrapped client.
+
+    Args:
+        client (cohere.AsyncClient): Client to wrap.
+        limiter (UpstreamLimiter): Limiter of the Cohere API.
+    """
+
+    def __init__(self, client: Any, limiter: UpstreamLimiter):
+        self.client = client
+        self.limiter = limiter
+
+    async def chat(self, **kwargs: Any) -> Any:
+        async with self.limiter.slot():
+            return await self.client.chat(**kwargs)
+
+    async def chat_stream(self, **kwargs: Any) -> AsyncIterator[Any]:
+        async with self.limiter.slot():
+            async for event in self.client.chat_stream(**kwargs):
+                yield event
+
+    async def rerank(self, **kwargs: Any) -> Any:
+        async with self.limiter.slot():
+            return await self.client.rerank(**kwargs)
+
+    async def embed(self, **kwargs: Any) -> Any:
+        async with self.limiter.slot():
+            return await self.client.embed(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
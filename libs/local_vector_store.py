@@ -0,0 +1,739 @@
+import argparse
+import fcntl
+import itertools
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+NODES_FILE = "nodes.jsonl"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+# Stores written before segments kept a single snapshot in the store directory.
+LEGACY_SEGMENT = "."
+
+# Times a reader retries when a compaction removed the segments it was loading.
+LOAD_ATTEMPTS = 3
+
+
+@dataclass
+class _Snapshot:
+    """
+    Immutable view of the store contents, swapped atomically on writes.
+
+    Rows are only ever appended: replaced and deleted rows stay in place
+    with ``alive`` cleared, so a write never copies the embeddings. The
+    row blocks in ``chunks`` are joined into one matrix on the first query.
+    ``segments`` and ``tombstones`` mirror the manifest on disk, and
+    ``segment_of`` tells the segment of every row.
+    """
+
+    chunks: List[np.ndarray]
+    ids: List[str]
+    metadata: List[Dict[str, Any]]
+    alive: np.ndarray
+    segment_of: np.ndarray
+    segments: List[Dict[str, Any]] = field(default_factory=list)
+    tombstones: Dict[str, int] = field(default_factory=dict)
+    masks: Dict[Tuple[str, str], np.ndarray] = field(default_factory=dict)
+    matrix: Optional[np.ndarray] = None
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        if self.matrix is None:
+            chunks = [chunk for chunk in self.chunks if len(chunk)]
+            if not chunks:
+                self.matrix = np.zeros((0, 0), dtype=np.float32)
+            elif len(chunks) == 1:
+                self.matrix = chunks[0]
+            else:
+                self.matrix = np.concatenate(chunks)
+        return self.matrix
+
+    def mask(self, key: str, value: Any) -> np.ndarray:
+        cache_key = (key, json.dumps(value, sort_keys=True, default=str))
+        mask = self.masks.get(cache_key)
+        if mask is None:
+            mask = np.fromiter(
+                (entry.get(key) == value for entry in self.metadata),
+                dtype=bool,
+                count=len(self.metadata),
+            )
+            self.masks[cache_key] = mask
+        return mask
+
+    def live(self) -> List[int]:
+        return np.bincount(
+            self.segment_of[self.alive], minlength=len(self.segments)
+        ).tolist()
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (embeddings / norms).astype(np.float32)
+
+
+def _empty_snapshot() -> _Snapshot:
+    return _Snapshot([], [], [], np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64))
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """
+    In-process vector store backed by a contiguous float32 NumPy matrix.
+
+    Embeddings are L2-normalized when added, so a query is a single
+    matrix-vector product followed by a partial sort. Equality masks for
+    metadata filters (such as ``research_area``) are computed once per value
+    and reused.
+
+    On disk, records live in immutable segment directories listed by a
+    manifest, which is replaced atomically, so a reader always sees a
+    consistent set of segments. A write adds one segment (or a tombstone
+    for deletes) and merges the newest segments while they outgrow the one
+    before, so a record is rewritten O(log n) times instead of on every
+    write. Writers hold an exclusive lock on ``manifest.lock`` while they
+    reload, rewrite and replace the manifest, so processes writing at once
+    (e.g. ``libs.bulk_ingest`` and the admin area) never drop each other's
+    segments. When another process replaces the manifest, the next query
+    reloads the store.
+
+    Args:
+        persist_path (str): Directory holding the manifest and the segments.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    persist_path: str
+
+    _snapshot: _Snapshot = PrivateAttr()
+    _snapshot_version: Optional[Tuple[str, int, int]] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, persist_path: str, **kwargs: Any) -> None:
+        super().__init__(persist_path=persist_path, **kwargs)
+        self._lock = threading.Lock()
+        self._snapshot = _empty_snapshot()
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def _current_version(self) -> Optional[Tuple[str, int, int]]:
+        for name in (MANIFEST_FILE, NODES_FILE):
+            try:
+                stat = os.stat(os.path.join(self.persist_path, name))
+            except FileNotFoundError:
+                continue
+            return name, stat.st_ino, stat.st_mtime_ns
+        return None
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.persist_path, MANIFEST_FILE)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        if os.path.exists(os.path.join(self.persist_path, NODES_FILE)):
+            return {"segments": [{"name": LEGACY_SEGMENT}], "tombstones": {}}
+        return None
+
+    def _read_snapshot(self, manifest: Dict[str, Any]) -> _Snapshot:
+        chunks, segments, ids, metadata, segment_of = [], [], [], [], []
+        for position, segment in enumerate(manifest["segments"]):
+            directory = os.path.join(self.persist_path, segment["name"])
+            chunks.append(
+                np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+            )
+            rows = 0
+            with open(os.path.join(directory, NODES_FILE)) as file:
+                for line in file:
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    metadata.append(record["metadata"])
+                    rows += 1
+            segment_of.extend([position] * rows)
+            segments.append({"name": segment["name"], "rows": rows})
+
+        # A later segment replaces earlier rows with the same id, and a
+        # tombstone deletes the id from the segments written before it.
+        tombstones = manifest.get("tombstones", {})
+        alive = np.ones(len(ids), dtype=bool)
+        latest: Dict[str, int] = {}
+        for row, node_id in enumerate(ids):
+            if node_id in latest:
+                alive[latest[node_id]] = False
+            latest[node_id] = row
+            if tombstones.get(node_id, 0) > segment_of[row]:
+                alive[row] = False
+        return _Snapshot(
+            chunks,
+            ids,
+            metadata,
+            alive,
+            np.asarray(segment_of, dtype=np.int64),
+            segments,
+            dict(tombstones),
+        )
+
+    def _load(self) -> None:
+        for _ in range(LOAD_ATTEMPTS):
+            version = self._current_version()
+            manifest = self._read_manifest()
+            if manifest is None:
+                self._snapshot = _empty_snapshot()
+                self._snapshot_version = version
+                return
+            try:
+                self._snapshot = self._read_snapshot(manifest)
+            except FileNotFoundError:
+                # A compaction removed segments of the manifest just read.
+                continue
+            self._snapshot_version = version
+            return
+
+    def _refresh(self) -> _Snapshot:
+        if self._current_version() != self._snapshot_version:
+            with self._lock:
+                if self._current_version() != self._snapshot_version:
+                    self._load()
+        return self._snapshot
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[_Snapshot]:
+        """
+        Lock the store against writers of every process and reload it.
+
+        Yields:
+            _Snapshot: The current contents, to build the next snapshot from.
+        """
+        os.makedirs(self.persist_path, exist_ok=True)
+        with self._lock, open(
+            os.path.join(self.persist_path, LOCK_FILE), "a"
+        ) as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self._current_version() != self._snapshot_version:
+                self._load()
+            yield self._snapshot
+
+    @staticmethod
+    def _write_segment(
+        persist_path: str,
+        embeddings: np.ndarray,
+        ids: List[str],
+        metadata: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        name = f"segment-{uuid.uuid4().hex}"
+        directory = os.path.join(persist_path, name)
+        os.makedirs(directory)
+        with open(os.path.join(directory, EMBEDDINGS_FILE), "wb") as file:
+            np.save(file, np.ascontiguousarray(embeddings, dtype=np.float32))
+        with open(os.path.join(directory, NODES_FILE), "w") as file:
+            for node_id, entry in zip(ids, metadata):
+                file.write(json.dumps({"id": node_id, "metadata": entry}) + "\n")
+        return {"name": name, "rows": len(ids)}
+
+    @staticmethod
+    def _write_manifest(
+        persist_path: str, segments: List[Dict[str, Any]], tombstones: Dict[str, int]
+    ) -> None:
+        os.makedirs(persist_path, exist_ok=True)
+        tmp_path = os.path.join(persist_path, f"{MANIFEST_FILE}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"segments": segments, "tombstones": tombstones}, file)
+        os.replace(tmp_path, os.path.join(persist_path, MANIFEST_FILE))
+
+    def _remove_segments(self, names: Iterable[str]) -> None:
+        for name in names:
+            if name == LEGACY_SEGMENT:
+                for file_name in (EMBEDDINGS_FILE, NODES_FILE):
+                    try:
+                        os.remove(os.path.join(self.persist_path, file_name))
+                    except FileNotFoundError:
+                        pass
+            else:
+                shutil.rmtree(os.path.join(self.persist_path, name), ignore_errors=True)
+
+    def _merge_segments(
+        self, snapshot: _Snapshot, obsolete: List[str], full: bool = False
+    ) -> _Snapshot:
+        segments, live = snapshot.segments, snapshot.live()
+        stored_rows = sum(segment["rows"] for segment in segments)
+        if full or stored_rows > 2 * sum(live):
+            # Mostly replaced or deleted rows: rewrite everything.
+            start = 0
+        else:
+            start = len(segments) - 1
+            merged = live[start] if segments else 0
+            while start > 0 and merged >= segments[start - 1]["rows"]:
+                start -= 1
+                merged += live[start]
+            if start >= len(segments) - 1:
+                return snapshot
+
+        # Read the merged segments back from disk rather than gathering their
+        # rows from memory, which would join every row block into one matrix.
+        tail = self._read_snapshot(
+            {
+                "segments": segments[start:],
+                "tombstones": {
+                    node_id: position - start
+                    for node_id, position in snapshot.tombstones.items()
+                    if position > start
+                },
+            }
+        )
+        rows = np.flatnonzero(tail.alive)
+        embeddings = np.asarray(tail.embeddings[rows], dtype=np.float32)
+        ids = [tail.ids[row] for row in rows]
+        metadata = [tail.metadata[row] for row in rows]
+        new_segments = segments[:start]
+        if ids:
+            new_segments.append(
+                self._write_segment(self.persist_path, embeddings, ids, metadata)
+            )
+        obsolete.extend(segment["name"] for segment in segments[start:])
+
+        if start == 0:
+            # Everything was rewritten, so drop the dead rows from memory too.
+            return _Snapshot(
+                [embeddings],
+                ids,
+                metadata,
+                np.ones(len(ids), dtype=bool),
+                np.zeros(len(ids), dtype=np.int64),
+                new_segments,
+            )
+        # Merged segments only hold live rows, so tombstones only need to
+        # reach the segments before them.
+        return _Snapshot(
+            snapshot.chunks,
+            snapshot.ids,
+            snapshot.metadata,
+            snapshot.alive,
+            np.minimum(snapshot.segment_of, start),
+            new_segments,
+            {
+                node_id: min(position, start)
+                for node_id, position in snapshot.tombstones.items()
+            },
+            snapshot.masks,
+            snapshot.matrix,
+        )
+
+    def _commit(
+        self, snapshot: _Snapshot, obsolete: List[str], full: bool = False
+    ) -> None:
+        snapshot = self._merge_segments(snapshot, obsolete, full)
+        self._write_manifest(self.persist_path, snapshot.segments, snapshot.tombstones)
+        self._snapshot = snapshot
+        self._snapshot_version = self._current_version()
+        self._remove_segments(obsolete)
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        """
+        Write the store to disk as a single segment.
+
+        Writes are persisted as they happen, so this only compacts the
+        store, or copies it to another directory.
+
+        Args:
+            persist_path (Optional[str]): Target directory. Defaults to ``self.persist_path``.
+        """
+        if persist_path is None or os.path.abspath(persist_path) == os.path.abspath(
+            self.persist_path
+        ):
+            with self._write_lock() as snapshot:
+                self._commit(snapshot, [], full=True)
+            return
+
+        snapshot = self._refresh()
+        rows = np.flatnonzero(snapshot.alive)
+        os.makedirs(persist_path, exist_ok=True)
+        segments = []
+        if len(rows):
+            segments.append(
+                self._write_segment(
+                    persist_path,
+                    snapshot.embeddings[rows],
+                    [snapshot.ids[row] for row in rows],
+                    [snapshot.metadata[row] for row in rows],
+                )
+            )
+        self._write_manifest(persist_path, segments, {})
+
+    def upsert_records(
+        self, records: Iterable[Tuple[str, List[float], Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        Insert or replace raw ``(id, embedding, metadata)`` records and persist.
+
+        Args:
+            records (Iterable[Tuple[str, List[float], Dict[str, Any]]]): Records to store.
+
+        Returns:
+            List[str]: Ids of the stored records.
+        """
+        records = list(records)
+        if not records:
+            return []
+        new_ids = [record[0] for record in records]
+        new_metadata = [record[2] for record in records]
+        new_embeddings = _normalize_rows(
+            np.asarray([record[1] for record in records], dtype=np.float32)
+        )
+        # Within the batch, the last record of an id wins.
+        last = {node_id: row for row, node_id in enumerate(new_ids)}
+        new_alive = np.fromiter(
+            (last[node_id] == row for row, node_id in enumerate(new_ids)),
+            dtype=bool,
+            count=len(new_ids),
+        )
+
+        with self._write_lock() as snapshot:
+            replaced = np.fromiter(
+                (node_id in last for node_id in snapshot.ids),
+                dtype=bool,
+                count=len(snapshot.ids),
+            )
+            segment = self._write_segment(
+                self.persist_path, new_embeddings, new_ids, new_metadata
+            )
+            self._commit(
+                _Snapshot(
+                    (
+                        [snapshot.matrix]
+                        if snapshot.matrix is not None
+                        else snapshot.chunks
+                    )
+                    + [new_embeddings],
+                    snapshot.ids + new_ids,
+                    snapshot.metadata + new_metadata,
+                    np.concatenate([snapshot.alive & ~replaced, new_alive]),
+                    np.concatenate(
+                        [
+                            snapshot.segment_of,
+                            np.full(len(new_ids), len(snapshot.segments)),
+                        ]
+                    ),
+                    snapshot.segments + [segment],
+                    snapshot.tombstones,
+                ),
+                [],
+            )
+        return new_ids
+
+    def iter_records(self) -> Iterator[Tuple[str, List[float], Dict[str, Any]]]:
+        """
+        Read every stored record.
+
+        Yields:
+            Tuple[str, List[float], Dict[str, Any]]: ``(id, embedding, metadata)``
+                records, with normalized embeddings.
+        """
+        snapshot = self._refresh()
+        embeddings = snapshot.embeddings
+        for row in np.flatnonzero(snapshot.alive):
+            yield snapshot.ids[row], embeddings[row].tolist(), snapshot.metadata[row]
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """
+        Add nodes with embeddings to the store.
+
+        Args:
+            nodes (List[BaseNode]): Nodes with embeddings.
+
+        Returns:
+            List[str]: Ids of the added nodes.
+        """
+        return self.upsert_records(
+            (
+                node.node_id,
+                node.get_embedding(),
+                node_to_metadata_dict(
+                    node, remove_text=False, flat_metadata=self.flat_metadata
+                ),
+            )
+            for node in nodes
+        )
+
+    def _remove(self, select: Callable[[_Snapshot], np.ndarray]) -> None:
+        with self._write_lock() as snapshot:
+            removed = select(snapshot) & snapshot.alive
+            if not removed.any():
+                return
+            tombstones = dict(snapshot.tombstones)
+            for row in np.flatnonzero(removed):
+                tombstones[snapshot.ids[row]] = len(snapshot.segments)
+            self._commit(
+                _Snapshot(
+                    snapshot.chunks,
+                    snapshot.ids,
+                    snapshot.metadata,
+                    snapshot.alive & ~removed,
+                    snapshot.segment_of,
+                    snapshot.segments,
+                    tombstones,
+                    snapshot.masks,
+                    snapshot.matrix,
+                ),
+                [],
+            )
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """
+        Delete every node of a document.
+
+        Args:
+            ref_doc_id (str): The doc_id of the document to delete.
+        """
+        self._remove(lambda snapshot: snapshot.mask("doc_id", ref_doc_id))
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        """
+        Delete nodes by id, by metadata filters, or by both.
+
+        Args:
+            node_ids (Optional[List[str]]): Ids of the nodes to delete.
+            filters (Optional[MetadataFilters]): Filters the deleted nodes
+                must match. With ``node_ids``, both must match.
+        """
+        if node_ids is None and filters is None:
+            return
+
+        def select(snapshot: _Snapshot) -> np.ndarray:
+            removed = np.ones(len(snapshot.ids), dtype=bool)
+            if node_ids is not None:
+                node_id_set = set(node_ids)
+                removed &= np.fromiter(
+                    (node_id in node_id_set for node_id in snapshot.ids),
+                    dtype=bool,
+                    count=len(snapshot.ids),
+                )
+            if filters is not None:
+                removed &= self._filter_mask(snapshot, filters)
+            return removed
+
+        self._remove(select)
+
+    def clear(self) -> None:
+        """Remove every node from the store."""
+        with self._write_lock() as snapshot:
+            self._write_manifest(self.persist_path, [], {})
+            self._snapshot = _empty_snapshot()
+            self._snapshot_version = self._current_version()
+            self._remove_segments(segment["name"] for segment in snapshot.segments)
+
+    def _filter_mask(self, snapshot: _Snapshot, filters: MetadataFilters) -> np.ndarray:
+        masks = []
+        for metadata_filter in filters.filters:
+            if isinstance(metadata_filter, MetadataFilters):
+                masks.append(self._filter_mask(snapshot, metadata_filter))
+            else:
+                masks.append(self._single_filter_mask(snapshot, metadata_filter))
+        if not masks:
+            return np.ones(len(snapshot.ids), dtype=bool)
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+    def _single_filter_mask(
+        self, snapshot: _Snapshot, metadata_filter: MetadataFilter
+    ) -> np.ndarray:
+        key, value = metadata_filter.key, metadata_filter.value
+        if metadata_filter.operator == FilterOperator.EQ:
+            return snapshot.mask(key, value)
+        if metadata_filter.operator == FilterOperator.NE:
+            return ~snapshot.mask(key, value)
+        if metadata_filter.operator == FilterOperator.IN:
+            return np.logical_or.reduce([snapshot.mask(key, v) for v in value])
+        if metadata_filter.operator == FilterOperator.NIN:
+            return ~np.logical_or.reduce([snapshot.mask(key, v) for v in value])
+        raise NotImplementedError(
+            f"Filter operator {metadata_filter.operator} is not supported."
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """
+        Query the store for the top k most similar nodes.
+
+        Args:
+            query (VectorStoreQuery): Query with embedding, top k and filters.
+
+        Returns:
+            VectorStoreQueryResult: Matching nodes with cosine similarities.
+        """
+        snapshot = self._refresh()
+        if not snapshot.alive.any() or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        query_embedding = np.asarray(query.query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_embedding)
+        if norm:
+            query_embedding /= norm
+
+        selected = snapshot.alive
+        if query.filters is not None:
+            selected = selected & self._filter_mask(snapshot, query.filters)
+        if query.node_ids:
+            node_ids = set(query.node_ids)
+            selected = selected & np.fromiter(
+                (node_id in node_ids for node_id in snapshot.ids),
+                dtype=bool,
+                count=len(snapshot.ids),
+            )
+
+        if selected.all():
+            scores = snapshot.embeddings @ query_embedding
+            rows = np.arange(len(scores))
+        else:
+            rows = np.flatnonzero(selected)
+            scores = snapshot.embeddings[rows] @ query_embedding
+
+        top_k = min(query.similarity_top_k, len(scores))
+        if top_k == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        nodes, similarities, ids = [], [], []
+        for position in best:
+            row = int(rows[position])
+            node = metadata_dict_to_node(snapshot.metadata[row])
+            nodes.append(node)
+            similarities.append(float(scores[position]))
+            ids.append(snapshot.ids[row])
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+
+def read_pinecone_records(
+    pinecone_index: Any, namespace: str = "", batch_size: int = 100
+) -> Iterable[Tuple[str, List[float], Dict[str, Any]]]:
+    """
+    Read every vector of a Pinecone index.
+
+    Args:
+        pinecone_index (Any): Pinecone index client.
+        namespace (str, optional): Namespace to read. Defaults to the default namespace.
+        batch_size (int, optional): Number of ids fetched per request. Defaults to 100.
+
+    Yields:
+        Tuple[str, List[float], Dict[str, Any]]: ``(id, embedding, metadata)`` records.
+    """
+    for ids in pinecone_index.list(namespace=namespace, limit=batch_size):
+        response = pinecone_index.fetch(ids=list(ids), namespace=namespace)
+        for vector_id, vector in response.vectors.items():
+            yield vector_id, vector.values, vector.metadata
+
+
+def read_jsonl_records(
+    path: str,
+) -> Iterable[Tuple[str, List[float], Dict[str, Any]]]:
+    """
+    Read ``{"id", "values", "metadata"}`` records exported by ingestion.
+
+    Args:
+        path (str): JSONL file with one record per line.
+
+    Yields:
+        Tuple[str, List[float], Dict[str, Any]]: ``(id, embedding, metadata)`` records.
+    """
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["id"], record["values"], record["metadata"]
+
+
+def main() -> None:
+    from libs.config import Config
+
+    config = Config()
+
+    argument_parser = argparse.ArgumentParser(
+        description="Sync the local vector store snapshot."
+    )
+    argument_parser.add_argument(
+        "--from-jsonl",
+        help="Read records from an ingestion export instead of Pinecone.",
+    )
+    argument_parser.add_argument(
+        "--path",
+        default=config.LOCAL_VECTOR_STORE_PATH,
+        help="Snapshot directory to write.",
+    )
+    arguments = argument_parser.parse_args()
+
+    from libs.config import RESEARCH_AREAS
+    from libs.vector_stores import PARTITION_KEY, partition_name, partition_path
+
+    if arguments.from_jsonl:
+        records = read_jsonl_records(arguments.from_jsonl)
+    else:
+        from pinecone import Pinecone
+
+        pc = Pinecone(api_key=config.PINECONE_API_KEY)
+        pinecone_index = pc.Index(config.PINECONE_INDEX)
+        namespaces = [""]
+        if config.VECTOR_STORE_PARTITIONING:
+            namespaces += [partition_name(area) for area in RESEARCH_AREAS]
+        records = itertools.chain.from_iterable(
+            read_pinecone_records(pinecone_index, namespace) for namespace in namespaces
+        )
+
+    partitions: Dict[str, List[Tuple[str, List[float], Dict[str, Any]]]] = {"": []}
+    if config.VECTOR_STORE_PARTITIONING:
+        for area in RESEARCH_AREAS:
+            partitions[partition_name(area)] = []
+        for record in records:
+            name = partition_name(record[2].get(PARTITION_KEY))
+            partitions.setdefault(name, []).append(record)
+    else:
+        partitions[""] = list(records)
+
+    synced = 0
+    for name, partition_records in partitions.items():
+        vector_store = LocalVectorStore(
+            persist_path=partition_path(arguments.path, name)
+        )
+        vector_store.clear()
+        synced += len(vector_store.upsert_records(partition_records))
+    print(f"Synced {synced} vectors into {arguments.path}")
+
+
+if __name__ == "__main__":
+    main()
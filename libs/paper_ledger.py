@@ -0,0 +1,277 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from llama_index.core.schema import BaseNode
+
+ARTICLE_FIELDS = (
+    "article_title",
+    "first_author",
+    "research_area",
+    "publication_year",
+    "source",
+)
+
+
+def compute_document_id(file_bytes: bytes, metadata: Dict[str, Any]) -> str:
+    """
+    Derive a stable document id from the file contents and its metadata.
+
+    Args:
+        file_bytes (bytes): Raw bytes of the uploaded file.
+        metadata (Dict[str, Any]): Article metadata.
+
+    Returns:
+        str: SHA-256 hex digest identifying this exact version of the paper.
+    """
+    digest = hashlib.sha256(file_bytes)
+    digest.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_paper_key(metadata: Dict[str, Any]) -> str:
+    """
+    Identify a paper across versions by its publication link.
+
+    Args:
+        metadata (Dict[str, Any]): Article metadata.
+
+    Returns:
+        str: The key under which the paper is tracked in the ledger.
+    """
+    return metadata["source"]
+
+
+def assign_chunk_ids(
+    nodes: List["BaseNode"],
+    paper_key: str,
+    document_id: str,
+    occurrences: Optional[Dict[str, int]] = None,
+) -> None:
+    """
+    Give every chunk an id derived from its content and metadata.
+
+    Unchanged chunks keep their id across re-uploads, so only new or edited
+    chunks need to be written. Identical chunks of one paper are told apart
+    by their position among the copies, so none overwrites another.
+    Relationships between the chunks, and the nodes that ``IndexNode``
+    objects point to, are remapped to the new ids, and every chunk is linked
+    to ``document_id``.
+
+    Args:
+        nodes (List[BaseNode]): Chunks of one paper.
+        paper_key (str): Key of the paper in the ledger.
+        document_id (str): Id of the paper version the chunks come from.
+        occurrences (Optional[Dict[str, int]]): Copies seen so far, shared
+            by the calls for the chunk groups of one paper.
+    """
+    from llama_index.core.schema import IndexNode, NodeRelationship, RelatedNodeInfo
+
+    if occurrences is None:
+        occurrences = {}
+    mapping = {}
+    for node in nodes:
+        digest = hashlib.sha256(paper_key.encode("utf-8"))
+        digest.update(node.get_content().encode("utf-8"))
+        digest.update(
+            json.dumps(node.metadata, sort_keys=True, default=str).encode("utf-8")
+        )
+        chunk_id = digest.hexdigest()
+        occurrence = occurrences.get(chunk_id, 0)
+        occurrences[chunk_id] = occurrence + 1
+        if occurrence:
+            digest.update(f"\0{occurrence}".encode("utf-8"))
+            chunk_id = digest.hexdigest()
+        mapping[node.node_id] = chunk_id
+
+    for node in nodes:
+        node.id_ = mapping[node.node_id]
+        for relationship, related in list(node.relationships.items()):
+            if isinstance(related, RelatedNodeInfo) and related.node_id in mapping:
+                related.node_id = mapping[related.node_id]
+        if isinstance(node, IndexNode) and node.index_id in mapping:
+            node.index_id = mapping[node.index_id]
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+            node_id=document_id
+        )
+
+
+class PaperLedger:
+    """
+    Local record of the indexed papers and the chunk ids each one owns.
+
+    Updates re-read and rewrite the file under an exclusive lock on a
+    sidecar ``.lock`` file, so the admin area and ``libs.bulk_ingest`` can
+    update it at the same time without losing entries.
+
+    Args:
+        path (str): JSON file holding the ledger.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, papers: Dict[str, Dict[str, Any]]) -> None:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(papers, file, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _update(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """
+        Lock the ledger against every process and yield its entries.
+
+        Changes made to the entries are written when the block exits.
+
+        Yields:
+            Dict[str, Dict[str, Any]]: Ledger entries keyed by paper key.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            papers = self._read()
+            yield papers
+            self._write(papers)
+
+    def get(self, paper_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the ledger entry of a paper.
+
+        Args:
+            paper_key (str): Key of the paper.
+
+        Returns:
+            Optional[Dict[str, Any]]: The entry, or None if the paper is not indexed.
+        """
+        return self._read().get(paper_key)
+
+    def papers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        List every indexed paper.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Ledger entries keyed by paper key.
+        """
+        return self._read()
+
+    def record(
+        self,
+        paper_key: str,
+        document_id: str,
+        metadata: Dict[str, Any],
+        chunk_ids: List[str],
+    ) -> None:
+        """
+        Record the current version of a paper and the chunks it owns.
+
+        Args:
+            paper_key (str): Key of the paper.
+            document_id (str): Id of the indexed version.
+            metadata (Dict[str, Any]): Article metadata.
+            chunk_ids (List[str]): Ids of the chunks stored for this version.
+        """
+        with self._update() as papers:
+            papers[paper_key] = {
+                "document_id": document_id,
+                "metadata": metadata,
+                "chunk_ids": chunk_ids,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+
+    def backfill(self, records: Iterable) -> int:
+        """
+        Record papers that were indexed before the ledger existed.
+
+        Chunks are grouped by the ``source`` in their metadata. Such papers
+        have no known document id, so uploading one again re-indexes it and
+        replaces the old chunks.
+
+        Args:
+            records (Iterable): ``(id, embedding, metadata)`` records, e.g.
+                from ``libs.vector_stores.read_records``.
+
+        Returns:
+            int: Number of papers added to the ledger.
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        for chunk_id, _, metadata in records:
+            paper_key = metadata.get("source")
+            if not paper_key:
+                continue
+            entry = found.setdefault(
+                paper_key,
+                {
+                    "metadata": {
+                        field: metadata[field]
+                        for field in ARTICLE_FIELDS
+                        if field in metadata
+                    },
+                    "chunk_ids": [],
+                },
+            )
+            entry["chunk_ids"].append(chunk_id)
+
+        added = 0
+        with self._update() as papers:
+            for paper_key, entry in found.items():
+                if paper_key in papers:
+                    continue
+                papers[paper_key] = {
+                    "document_id": None,
+                    **entry,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+                added += 1
+        return added
+
+    def remove(self, paper_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove a paper from the ledger.
+
+        Args:
+            paper_key (str): Key of the paper.
+
+        Returns:
+            Optional[Dict[str, Any]]: The removed entry, if any.
+        """
+        with self._update() as papers:
+            return papers.pop(paper_key, None)
+
+
+def main() -> None:
+    argparse.ArgumentParser(
+        description="Record papers indexed before the ledger existed."
+    ).parse_args()
+
+    from libs.resources import get_paper_ledger, get_vector_store
+    from libs.vector_stores import read_records
+
+    added = get_paper_ledger().backfill(read_records(get_vector_store()))
+    print(f"Added {added} papers to the ledger")
+
+
+if __name__ == "__main__":
+    main()
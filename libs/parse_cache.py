@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from llama_index.core import Document
+
+
+class ParseCache:
+    """
+    Size-bounded on-disk cache of parsed documents.
+
+    Entries are keyed by the SHA-256 of the file bytes plus the parser
+    settings, so re-indexing the same file skips the parser entirely. When
+    the cache grows past ``max_bytes`` the least recently used entries are
+    removed.
+
+    Args:
+        directory (str): Directory holding one JSON file per entry.
+        max_bytes (int): Maximum total size of the cache on disk.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(file_bytes: bytes, settings: Dict[str, Any]) -> str:
+        """
+        Build the cache key of a file parsed with the given settings.
+
+        Args:
+            file_bytes (bytes): Raw bytes of the file.
+            settings (Dict[str, Any]): Parser settings that affect the output.
+
+        Returns:
+            str: Hex digest used as the cache key.
+        """
+        digest = hashlib.sha256(file_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Document]]:
+        """
+        Load the parsed documents for a key.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Optional[List[Document]]: Fresh copies of the documents, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                payload = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return [Document.from_dict(document) for document in payload]
+
+    def set(self, key: str, documents: List[Document]) -> None:
+        """
+        Store parsed documents and evict old entries if the cache is too large.
+
+        Args:
+            key (str): Cache key.
+            documents (List[Document]): Parsed documents.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump([document.to_dict() for document in documents], file)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.directory, name))
+                total -= size
@@ -0,0 +1,398 @@
+import importlib.util
+import os
+import threading
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, TypeVar
+
+from libs.config import RESEARCH_AREAS, Config
+
+if TYPE_CHECKING:
+    import cohere
+    import tiktoken
+    from llama_index.core.vector_stores.types import BasePydanticVectorStore
+    from llama_index.llms.groq import Groq
+    from llama_parse import LlamaParse
+
+    from libs.answer_cache import AnswerCache
+    from libs.cache import EmbeddingCache, IndexGeneration, LRUCache
+    from libs.embedding_service import ServiceEmbedding
+    from libs.lexical_index import LexicalIndex
+    from libs.limiter import LimitedAsyncCohere, UpstreamLimiter
+    from libs.paper_ledger import PaperLedger
+    from libs.parse_cache import ParseCache
+    from libs.retrievers import RetrieverRegistry
+    from libs.table_summaries import CachedMarkdownElementNodeParser, TableSummaryCache
+
+T = TypeVar("T")
+
+config = Config()
+
+EMBED_MODEL = "embed-english-v3.0"
+
+PARSER_SETTINGS: Dict[str, Any] = {"result_type": "markdown"}
+
+CL100K_BASE_URL = (
+    "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+)
+
+_resources: List[Callable[[], Any]] = []
+
+
+def resource(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Turn a factory into a lazily initialized, process-wide resource getter.
+
+    The factory runs on the first call only and every later call returns the
+    same object, like ``st.cache_resource``: Streamlit reruns re-execute the
+    page script but keep imported modules, so they reuse the resource too.
+    The getter's ``clear()`` drops the resource so the next call rebuilds it,
+    and ``set(value)`` replaces it, e.g. with a stand-in in benchmarks.
+
+    Args:
+        factory (Callable[[], T]): Builds the resource.
+
+    Returns:
+        Callable[[], T]: The getter.
+    """
+    cached: List[T] = []
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        if not cached:
+            with lock:
+                if not cached:
+                    cached.append(factory())
+        return cached[0]
+
+    def set(value: T) -> None:
+        with lock:
+            cached[:] = [value]
+
+    get.clear = cached.clear
+    get.set = set
+    _resources.append(get)
+    return get
+
+
+def clear_resources() -> None:
+    """Drop every initialized resource."""
+    for get in _resources:
+        get.clear()
+
+
+@resource
+def enable_nested_event_loops() -> bool:
+    """
+    Allow LlamaParse and the node parser to run their event loops from
+    threads that already run one.
+
+    Returns:
+        bool: Always True.
+    """
+    import nest_asyncio
+
+    nest_asyncio.apply()
+    return True
+
+
+@resource
+def get_cohere_client() -> "cohere.Client":
+    import cohere
+
+    from libs.http_clients import get_http_client
+
+    return cohere.Client(api_key=config.COHERE_API_KEY, httpx_client=get_http_client())
+
+
+@resource
+def get_async_cohere_factory() -> Callable[[], "cohere.AsyncClient"]:
+    """
+    Get the function that builds the async Cohere client of an event loop.
+
+    Returns:
+        Callable[[], cohere.AsyncClient]: Client factory.
+    """
+    import cohere
+
+    from libs.http_clients import get_async_http_client
+
+    return lambda: cohere.AsyncClient(
+        api_key=config.COHERE_API_KEY, httpx_client=get_async_http_client()
+    )
+
+
+def get_async_cohere_client() -> "LimitedAsyncCohere":
+    """
+    Get the async Cohere client of the running event loop.
+
+    Returns:
+        LimitedAsyncCohere: Client sharing the loop's pooled HTTP connections,
+            with its calls limited by ``get_cohere_limiter``.
+    """
+    from libs.http_clients import loop_local
+    from libs.limiter import LimitedAsyncCohere
+
+    return loop_local(
+        "cohere_client",
+        lambda: LimitedAsyncCohere(get_async_cohere_factory()(), get_cohere_limiter()),
+    )
+
+
+@resource
+def get_cohere_limiter() -> "UpstreamLimiter":
+    from libs.limiter import UpstreamLimiter
+
+    return UpstreamLimiter(
+        "cohere", config.COHERE_MAX_IN_FLIGHT, config.UPSTREAM_MAX_PER_SESSION
+    )
+
+
+@resource
+def get_vector_store_limiter() -> "UpstreamLimiter":
+    from libs.limiter import UpstreamLimiter
+
+    return UpstreamLimiter(
+        config.VECTOR_STORE_BACKEND,
+        config.VECTOR_STORE_MAX_IN_FLIGHT,
+        config.UPSTREAM_MAX_PER_SESSION,
+    )
+
+
+def _create_embed_model(input_type: str) -> "ServiceEmbedding":
+    from libs.embedding_service import EmbeddingService, ServiceEmbedding
+
+    return ServiceEmbedding(
+        EmbeddingService(
+            get_cohere_client(),
+            model=EMBED_MODEL,
+            input_type=input_type,
+            max_concurrency=config.EMBED_MAX_CONCURRENCY,
+            requests_per_second=config.EMBED_REQUESTS_PER_SECOND,
+            async_client=get_async_cohere_client,
+        )
+    )
+
+
+@resource
+def get_query_embed_model() -> "ServiceEmbedding":
+    return _create_embed_model("search_query")
+
+
+@resource
+def get_document_embed_model() -> "ServiceEmbedding":
+    return _create_embed_model("search_document")
+
+
+@resource
+def get_llm() -> "Groq":
+    from llama_index.llms.groq import Groq
+
+    return Groq(
+        model="llama-3.1-8b-instant",
+        api_key=config.GROQ_API_KEY,
+        is_function_calling_model=False,
+    )
+
+
+@resource
+def get_vector_store() -> "BasePydanticVectorStore":
+    from libs.vector_stores import create_vector_store
+
+    return create_vector_store(config)
+
+
+@resource
+def get_parser() -> "LlamaParse":
+    from llama_parse import LlamaParse
+
+    enable_nested_event_loops()
+    return LlamaParse(
+        api_key=config.LLAMA_CLOUD_API_KEY,
+        num_workers=4,
+        verbose=True,
+        **PARSER_SETTINGS,
+    )
+
+
+@resource
+def get_node_parser() -> "CachedMarkdownElementNodeParser":
+    from llama_index.core import Settings
+
+    from libs.limiter import RateLimiter
+    from libs.table_summaries import CachedMarkdownElementNodeParser
+
+    enable_nested_event_loops()
+    llm = get_llm()
+    Settings.llm = llm
+    Settings.chunk_size = 512
+    Settings.chunk_overlap = 20
+    return CachedMarkdownElementNodeParser(
+        cache=get_table_summary_cache(),
+        rate_limiter=RateLimiter(config.TABLE_SUMMARY_REQUESTS_PER_MINUTE),
+        llm=llm,
+        num_workers=config.TABLE_SUMMARY_WORKERS,
+    )
+
+
+@resource
+def get_table_summary_cache() -> "TableSummaryCache":
+    from libs.table_summaries import TableSummaryCache
+
+    return TableSummaryCache(config.TABLE_SUMMARY_CACHE_PATH)
+
+
+@resource
+def get_parse_cache() -> "ParseCache":
+    from libs.parse_cache import ParseCache
+
+    return ParseCache(config.PARSE_CACHE_DIR, config.PARSE_CACHE_MAX_BYTES)
+
+
+@resource
+def get_index_generation() -> "IndexGeneration":
+    from libs.cache import IndexGeneration
+
+    return IndexGeneration(config.INDEX_GENERATION_PATH)
+
+
+@resource
+def get_lexical_index() -> "LexicalIndex":
+    from libs.lexical_index import LexicalIndex
+
+    return LexicalIndex(config.LEXICAL_INDEX_PATH)
+
+
+@resource
+def get_paper_ledger() -> "PaperLedger":
+    from libs.paper_ledger import PaperLedger
+
+    return PaperLedger(config.PAPER_LEDGER_PATH)
+
+
+@resource
+def get_embedding_cache() -> "EmbeddingCache":
+    from libs.cache import EmbeddingCache
+
+    return EmbeddingCache(
+        model_name=EMBED_MODEL,
+        maxsize=config.EMBEDDING_CACHE_SIZE,
+        ttl=config.EMBEDDING_CACHE_TTL,
+        path=config.EMBEDDING_CACHE_PATH or None,
+    )
+
+
+@resource
+def get_answer_cache() -> "AnswerCache":
+    from libs.answer_cache import AnswerCache
+
+    return AnswerCache(
+        get_index_generation(),
+        threshold=config.ANSWER_CACHE_THRESHOLD,
+        maxsize=config.ANSWER_CACHE_SIZE,
+        ttl=config.ANSWER_CACHE_TTL,
+    )
+
+
+@resource
+def get_rerank_cache() -> "LRUCache":
+    from libs.cache import LRUCache
+
+    return LRUCache(maxsize=config.RERANK_CACHE_SIZE, ttl=config.RERANK_CACHE_TTL)
+
+
+@resource
+def get_tokenizer() -> "tiktoken.Encoding":
+    """
+    Get the tokenizer used to budget prompts.
+
+    llama_index ships the ``cl100k_base`` file. It is copied into the
+    tiktoken cache when that cache does not have it yet, which keeps the
+    tokenizer working offline without changing the process environment.
+
+    Returns:
+        tiktoken.Encoding: The ``cl100k_base`` encoding.
+    """
+    import hashlib
+    import shutil
+    import tempfile
+    import uuid
+
+    import tiktoken
+
+    cache_dir = os.environ.get(
+        "TIKTOKEN_CACHE_DIR",
+        os.environ.get(
+            "DATA_GYM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "data-gym-cache")
+        ),
+    )
+    # tiktoken names cache entries after the SHA-1 of the download URL.
+    file_name = hashlib.sha1(CL100K_BASE_URL.encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, file_name)
+    if cache_dir and not os.path.exists(cache_path):
+        spec = importlib.util.find_spec("llama_index.core")
+        bundled_path = os.path.join(
+            spec.submodule_search_locations[0], "_static", "tiktoken_cache", file_name
+        )
+        if os.path.exists(bundled_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(bundled_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@resource
+def get_history_summary_cache() -> "LRUCache":
+    from libs.cache import LRUCache
+
+    return LRUCache(
+        maxsize=config.HISTORY_SUMMARY_CACHE_SIZE, ttl=config.HISTORY_SUMMARY_CACHE_TTL
+    )
+
+
+@resource
+def get_retriever_registry() -> "RetrieverRegistry":
+    from libs.retrievers import RetrieverRegistry
+
+    registry = RetrieverRegistry(
+        get_vector_store(),
+        embed_model=get_query_embed_model(),
+        similarity_top_k=config.SIMILARITY_TOP_K,
+    )
+    registry.warm_up(["All", *RESEARCH_AREAS])
+    return registry
+
+
+CHAT_RESOURCES = (
+    get_cohere_client,
+    get_query_embed_model,
+    get_embedding_cache,
+    get_answer_cache,
+    get_rerank_cache,
+    get_lexical_index,
+    get_retriever_registry,
+)
+
+INDEXING_RESOURCES = (
+    get_document_embed_model,
+    get_vector_store,
+    get_parser,
+    get_node_parser,
+    get_parse_cache,
+    get_index_generation,
+    get_lexical_index,
+    get_paper_ledger,
+)
+
+
+def warm_up(getters: Iterable[Callable[[], Any]] = CHAT_RESOURCES) -> None:
+    """
+    Initialize resources up front instead of on first use.
+
+    Args:
+        getters (Iterable[Callable[[], Any]], optional): Resource getters to
+            call. Defaults to the chat resources.
+    """
+    for get in getters:
+        get()
@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, Iterable, Optional
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.vector_stores import (
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+)
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+
+def build_research_area_filter(research_area: str) -> Optional[MetadataFilters]:
+    """
+    Build the metadata filter that restricts results to a research area.
+
+    Args:
+        research_area (str): Research area, or "All" for no filtering.
+
+    Returns:
+        Optional[MetadataFilters]: The filter, or None when no filtering applies.
+    """
+    if research_area == "All":
+        return None
+    return MetadataFilters(
+        filters=[
+            MetadataFilter(
+                key="research_area", operator=FilterOperator.EQ, value=research_area
+            ),
+        ]
+    )
+
+
+class RetrieverRegistry:
+    """
+    Process-wide cache of one retriever per research area filter.
+
+    The vector store index and every retriever are built once and reused for
+    the life of the process. The registry lives at module level, so Streamlit
+    reruns (which re-execute only the page script) keep using it.
+
+    Args:
+        vector_store (BasePydanticVectorStore): Store to retrieve from.
+        embed_model (BaseEmbedding): Model that embeds queries.
+        similarity_top_k (int): Number of results per query.
+    """
+
+    def __init__(
+        self,
+        vector_store: BasePydanticVectorStore,
+        embed_model: BaseEmbedding,
+        similarity_top_k: int,
+    ):
+        self._vector_store = vector_store
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        self._index: Optional[VectorStoreIndex] = None
+        self._retrievers: Dict[str, BaseRetriever] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.builds_saved = 0
+
+    def _build(self, research_area: str) -> BaseRetriever:
+        if self._index is None:
+            self._index = VectorStoreIndex.from_vector_store(
+                self._vector_store, embed_model=self._embed_model
+            )
+        self.builds += 1
+        return self._index.as_retriever(
+            similarity_top_k=self._similarity_top_k,
+            filters=build_research_area_filter(research_area),
+        )
+
+    def warm_up(self, research_areas: Iterable[str]) -> None:
+        """
+        Build the retrievers for the given research areas up front.
+
+        Args:
+            research_areas (Iterable[str]): Research areas to build retrievers for.
+        """
+        with self._lock:
+            for research_area in research_areas:
+                if research_area not in self._retrievers:
+                    self._retrievers[research_area] = self._build(research_area)
+
+    def get(self, research_area: str) -> BaseRetriever:
+        """
+        Get the cached retriever for a research area, building it if needed.
+
+        Args:
+            research_area (str): Research area, or "All" for no filtering.
+
+        Returns:
+            BaseRetriever: The retriever for the research area.
+        """
+        retriever = self._retrievers.get(research_area)
+        if retriever is not None:
+            self.builds_saved += 1
+            return retriever
+
+        with self._lock:
+            if research_area not in self._retrievers:
+                self._retrievers[research_area] = self._build(research_area)
+            return self._retrievers[research_area]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report how many retrievers were built and how many builds were saved.
+
+        Returns:
+            Dict[str, int]: Registry counters.
+        """
+        return {
+            "retrievers": len(self._retrievers),
+            "builds": self.builds,
+            "builds_saved": self.builds_saved,
+        }
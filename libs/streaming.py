@@ -0,0 +1,96 @@
+import io
+import time
+from typing import Callable, List, Optional
+
+CURSOR = "▌"
+
+
+def format_sources(sources: List[str]) -> str:
+    """
+    Format source titles the way answers list them in the chat history.
+
+    Args:
+        sources (List[str]): Source titles, in citation order.
+
+    Returns:
+        str: Markdown list of the sources, or an empty string.
+    """
+    if not sources:
+        return ""
+    return "\nSources:" + "".join(
+        f"\n\n[{index}] {source}" for index, source in enumerate(sources, start=1)
+    )
+
+
+class ThrottledRenderer:
+    """
+    Buffer streamed text and re-render it at a bounded frame rate.
+
+    Rendering a Markdown placeholder costs time proportional to the whole
+    answer, so rendering on every token is quadratic in the answer length.
+    Chunks are buffered and rendered at most ``frame_rate`` times per second,
+    or earlier once ``flush_bytes`` are pending.
+
+    Args:
+        render (Callable[[str], None]): Renders the full text, e.g.
+            ``placeholder.markdown``.
+        frame_rate (float): Maximum renders per second. 0 renders every chunk.
+        flush_bytes (int): Pending bytes that force a render.
+        cursor (str, optional): Suffix shown while streaming. Defaults to "▌".
+        clock (Callable[[], float], optional): Time source, in seconds.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], None],
+        frame_rate: float,
+        flush_bytes: int,
+        cursor: str = CURSOR,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.render = render
+        self.interval = 1 / frame_rate if frame_rate > 0 else 0.0
+        self.flush_bytes = flush_bytes
+        self.cursor = cursor
+        self.clock = clock
+        self.frames = 0
+        self._buffer = io.StringIO()
+        self._pending_bytes = 0
+        self._last_render: Optional[float] = None
+
+    @property
+    def text(self) -> str:
+        return self._buffer.getvalue()
+
+    def write(self, chunk: str) -> None:
+        """
+        Add a chunk, rendering if a frame is due.
+
+        Args:
+            chunk (str): Streamed text.
+        """
+        self._buffer.write(chunk)
+        self._pending_bytes += len(chunk.encode("utf-8"))
+        now = self.clock()
+        if (
+            self._last_render is None
+            or now - self._last_render >= self.interval
+            or self._pending_bytes >= self.flush_bytes
+        ):
+            self._flush(self.cursor, now)
+
+    def close(self) -> str:
+        """
+        Render the final text without the cursor.
+
+        Returns:
+            str: The full text.
+        """
+        self._flush("", self.clock())
+        return self.text
+
+    def _flush(self, suffix: str, now: float) -> None:
+        self.render(self.text + suffix)
+        self.frames += 1
+        self._pending_bytes = 0
+        self._last_render = now
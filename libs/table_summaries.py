@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.bridge.pydantic import PrivateAttr, ValidationError
+from llama_index.core.node_parser import MarkdownElementNodeParser
+from llama_index.core.node_parser.relational.base_element import (
+    Element,
+    TableOutput,
+)
+from llama_index.core.schema import Document
+
+from libs.cache import normalize_text
+from libs.limiter import RateLimiter
+
+
+def table_contexts(elements: List[Element]) -> List[str]:
+    """
+    Build the text sent to the LLM for every table, as llama_index does.
+
+    The table is joined with a neighboring caption when there is one, so the
+    summaries match those of ``MarkdownElementNodeParser``.
+
+    Args:
+        elements (List[Element]): Table elements of a document.
+
+    Returns:
+        List[str]: One context per table element, in order.
+    """
+    contexts = []
+    for index, element in enumerate(elements):
+        if element.type not in ("table", "table_text"):
+            continue
+        context = str(element.element)
+        previous = str(elements[index - 1].element).lower().strip()
+        if index > 0 and previous.startswith("table"):
+            context = str(elements[index - 1].element) + "\n" + context
+        if index + 1 < len(elements) and previous.startswith("table"):
+            context += "\n" + str(elements[index + 1].element)
+        contexts.append(context)
+    return contexts
+
+
+class TableSummaryCache:
+    """
+    On-disk cache of table summaries.
+
+    Entries are keyed by the normalized table text, the summary prompt and
+    the model name, so re-indexing a paper, or indexing another paper with
+    the same table, reuses the summary instead of calling the LLM.
+
+    Args:
+        path (str): SQLite file holding the summaries.
+    """
+
+    def __init__(self, path: str):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS table_summaries "
+            "(key TEXT PRIMARY KEY, output TEXT, created_at REAL)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def key(table_context: str, prompt: str, model_name: str) -> str:
+        """
+        Build the cache key of a table summarized with a prompt and a model.
+
+        Args:
+            table_context (str): Table text, from ``table_contexts``.
+            prompt (str): Summary prompt.
+            model_name (str): Name of the LLM.
+
+        Returns:
+            str: Hex digest used as the cache key.
+        """
+        return hashlib.sha256(
+            f"{model_name}\0{prompt}\0{normalize_text(table_context)}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[TableOutput]:
+        """
+        Load the summary for a key.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            Optional[TableOutput]: The summary, or None on a miss.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output FROM table_summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return TableOutput.parse_raw(row[0])
+
+    def set(self, key: str, output: TableOutput) -> None:
+        """
+        Store the summary for a key.
+
+        Args:
+            key (str): Cache key.
+            output (TableOutput): Summary of the table.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO table_summaries VALUES (?, ?, ?)",
+                (key, output.json(), time.time()),
+            )
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the cache counters.
+
+        Returns:
+            Dict[str, int]: Stored summaries, hits and misses.
+        """
+        with self._lock:
+            (size,) = self._connection.execute(
+                "SELECT COUNT(*) FROM table_summaries"
+            ).fetchone()
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+class CachedMarkdownElementNodeParser(MarkdownElementNodeParser):
+    """
+    ``MarkdownElementNodeParser`` that reuses cached table summaries.
+
+    Only tables missing from the cache are summarized. Identical tables are
+    summarized once, by at most ``num_workers`` concurrent calls started no
+    faster than ``rate_limiter`` allows. Plain text summaries, kept when the
+    structured output does not parse, are not cached, so the table is
+    summarized again the next time.
+
+    Args:
+        cache (TableSummaryCache): Cache of table summaries.
+        rate_limiter (RateLimiter): Pace of the LLM calls.
+        **kwargs: Arguments of ``MarkdownElementNodeParser``, e.g. ``llm``
+            and ``num_workers``.
+    """
+
+    _cache: TableSummaryCache = PrivateAttr()
+    _rate_limiter: RateLimiter = PrivateAttr()
+
+    def __init__(
+        self, cache: TableSummaryCache, rate_limiter: RateLimiter, **kwargs: Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._rate_limiter = rate_limiter
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedMarkdownElementNodeParser"
+
+    async def _summarize(self, table_context: str) -> Tuple[TableOutput, bool]:
+        from llama_index.core.indices.list.base import SummaryIndex
+        from llama_index.core.settings import Settings
+
+        llm = self.llm or Settings.llm
+        index = SummaryIndex.from_documents([Document(text=table_context)])
+        await self._rate_limiter.wait()
+        query_engine = index.as_query_engine(llm=llm, output_cls=TableOutput)
+        try:
+            response = await query_engine.aquery(self.summary_query_str)
+            return response.response, True
+        except (ValidationError, ValueError):
+            # The output did not parse; keep a plain text summary.
+            await self._rate_limiter.wait()
+            query_engine = index.as_query_engine(llm=llm)
+            response_text = await query_engine.aquery(self.summary_query_str)
+            return TableOutput(summary=str(response_text), columns=[]), False
+
+    async def aextract_table_summaries(self, elements: List[Element]) -> None:
+        from llama_index.core.settings import Settings
+
+        llm = self.llm or Settings.llm
+        model_name = llm.metadata.model_name
+        table_context_list = table_contexts(elements)
+        keys = [
+            self._cache.key(context, self.summary_query_str, model_name)
+            for context in table_context_list
+        ]
+        contexts = dict(zip(keys, table_context_list))
+
+        outputs: Dict[str, TableOutput] = {}
+        for key in contexts:
+            output = self._cache.get(key)
+            if output is not None:
+                outputs[key] = output
+
+        semaphore = asyncio.Semaphore(max(1, self.num_workers))
+
+        async def summarize(key: str) -> None:
+            async with semaphore:
+                output, parsed = await self._summarize(contexts[key])
+            if parsed:
+                self._cache.set(key, output)
+            outputs[key] = output
+
+        await asyncio.gather(
+            *(summarize(key) for key in contexts if key not in outputs)
+        )
+
+        table_elements = [e for e in elements if e.type in ("table", "table_text")]
+        for element, key in zip(table_elements, keys):
+            element.table_output = outputs[key]
+
+    def extract_table_summaries(self, elements: List[Element]) -> None:
+        asyncio_run(self.aextract_table_summaries(elements))
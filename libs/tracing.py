@@ -0,0 +1,520 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from libs.config import Config
+
+config = Config()
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "aurora"
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar(
+    "current_trace", default=None
+)
+_degraded_stages: ContextVar[Optional[List[str]]] = ContextVar(
+    "degraded_stages", default=None
+)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters, gauges and histograms in Prometheus text format.
+
+    Args:
+        prefix (str): Prefix of every metric name.
+    """
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauges: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, _Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, help: str, value: float = 1, **labels: str) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Metric name without the prefix.
+            help (str): Description of the metric.
+            value (float, optional): Increment. Defaults to 1.
+            **labels (str): Label values.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, (help, "counter"))
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, help: str, value: float, **labels: str) -> None:
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name (str): Metric name without the prefix.
+            help (str): Description of the metric.
+            value (float): Current value.
+            **labels (str): Label values.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, (help, "gauge"))
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(
+        self,
+        name: str,
+        help: str,
+        value: float,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> None:
+        """
+        Record a value in a histogram.
+
+        Args:
+            name (str): Metric name without the prefix.
+            help (str): Description of the metric.
+            value (float): Observed value.
+            buckets (Sequence[float], optional): Upper bounds of the buckets.
+            **labels (str): Label values.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, (help, "histogram"))
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition.
+        """
+        lines = []
+        with self._lock:
+            for name, (help, kind) in sorted(self._help.items()):
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full_name} {help}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                if kind in ("counter", "gauge"):
+                    series = self._counters if kind == "counter" else self._gauges
+                    for labels, value in sorted(series[name].items()):
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+                    continue
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        bucket_labels = labels + (("le", str(bound)),)
+                        lines.append(
+                            f"{full_name}_bucket{_format_labels(bucket_labels)} {count}"
+                        )
+                    bucket_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{full_name}_bucket{_format_labels(bucket_labels)} "
+                        f"{histogram.count}"
+                    )
+                    lines.append(
+                        f"{full_name}_sum{_format_labels(labels)} {histogram.sum}"
+                    )
+                    lines.append(
+                        f"{full_name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class Span:
+    """
+    Timed stage of a trace. Use it as a context manager.
+
+    Args:
+        trace (Trace): Trace the span belongs to.
+        name (str): Stage name.
+        attributes (Dict[str, Any]): Initial attributes.
+    """
+
+    def __init__(self, trace: "Trace", name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, error_type, error, traceback) -> None:
+        self.duration = time.perf_counter() - self.start
+        if error_type is not None:
+            self.attributes["error"] = error_type.__name__
+        self.trace.spans.append(self)
+
+
+class _NullSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, error_type, error, traceback) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """
+    Spans, marks and attributes recorded for one request.
+
+    Args:
+        name (str): Name of the traced operation, e.g. "chat".
+        attributes (Dict[str, Any]): Initial attributes.
+    """
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self.marks: Dict[str, float] = {}
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace": self.name,
+            "trace_id": self.trace_id,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "marks": {name: round(offset, 6) for name, offset in self.marks.items()},
+            "spans": [
+                {
+                    "name": span.name,
+                    "offset": round(span.start - self.start, 6),
+                    "duration": round(span.duration, 6),
+                    **({"attributes": span.attributes} if span.attributes else {}),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """
+    Time a stage of the current trace.
+
+    Without an active trace this returns a shared no-op span, so
+    instrumentation costs a context variable lookup when tracing is off.
+
+    Args:
+        name (str): Stage name.
+        **attributes (Any): Initial attributes.
+
+    Returns:
+        Span: Context manager for the stage.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return Span(trace, name, attributes)
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def mark(name: str) -> None:
+    """Record the time elapsed since the current trace started, if any."""
+    trace = _current_trace.get()
+    if trace is not None and name not in trace.marks:
+        trace.marks[name] = time.perf_counter() - trace.start
+
+
+def record_degraded(stage: str, reason: str) -> None:
+    """
+    Record that a stage fell back to a degraded path.
+
+    The count is exported even when tracing is disabled. The current trace,
+    if any, and the list of ``track_degraded``, if any, get the stage.
+
+    Args:
+        stage (str): Stage name, e.g. "rerank".
+        reason (str): Why it degraded, e.g. "timeout".
+    """
+    metrics.inc(
+        "degraded_total",
+        "Stages that fell back to a degraded path.",
+        stage=stage,
+        reason=reason,
+    )
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.setdefault("degraded", []).append(f"{stage}:{reason}")
+    stages = _degraded_stages.get()
+    if stages is not None:
+        stages.append(f"{stage}:{reason}")
+
+
+@contextmanager
+def track_degraded() -> Iterator[List[str]]:
+    """
+    Collect the stages that degrade within the block, traced or not.
+
+    Tasks started within the block, e.g. concurrent retrievals, add to the
+    same list.
+
+    Yields:
+        List[str]: ``"stage:reason"`` of every degraded stage so far.
+    """
+    stages: List[str] = []
+    token = _degraded_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        try:
+            _degraded_stages.reset(token)
+        except ValueError:
+            # Finalized from another context, e.g. an abandoned async generator.
+            pass
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """
+    Trace an operation when ``TRACING_ENABLED`` is set.
+
+    On exit the trace is logged as one JSON line and added to the metrics.
+    The metrics exporters run either way, so counters recorded without a
+    trace, like ``degraded_total``, are exported too.
+
+    Args:
+        name (str): Name of the traced operation.
+        **attributes (Any): Initial attributes.
+
+    Yields:
+        Optional[Trace]: The trace, or None when tracing is disabled.
+    """
+    start_metrics_exporters()
+    if not config.TRACING_ENABLED:
+        try:
+            yield None
+        finally:
+            if config.METRICS_PATH:
+                try:
+                    write_metrics(config.METRICS_PATH)
+                except Exception:
+                    logger.exception(
+                        "Failed to write metrics to %s", config.METRICS_PATH
+                    )
+        return
+
+    trace = Trace(name, attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Finalized from another context, e.g. an abandoned async generator.
+            pass
+        trace.duration = time.perf_counter() - trace.start
+        try:
+            record_trace(trace)
+        except Exception:
+            logger.exception("Failed to record trace %s", trace.trace_id)
+
+
+def record_trace(trace: Trace) -> None:
+    """
+    Log a finished trace and add it to the metrics.
+
+    Args:
+        trace (Trace): The finished trace.
+    """
+    logger.info(json.dumps(trace.to_dict(), default=str))
+
+    if trace.attributes.get("degraded"):
+        metrics.inc(
+            "degraded_traces_total",
+            "Traced operations with at least one degraded stage.",
+            trace=trace.name,
+        )
+    metrics.observe(
+        "trace_seconds",
+        "Duration of traced operations.",
+        trace.duration,
+        trace=trace.name,
+    )
+    for stage in trace.spans:
+        metrics.observe(
+            "span_seconds",
+            "Duration of each stage.",
+            stage.duration,
+            trace=trace.name,
+            span=stage.name,
+        )
+    for name, offset in trace.marks.items():
+        metrics.observe(
+            "mark_seconds",
+            "Time from the start of the operation to a milestone.",
+            offset,
+            trace=trace.name,
+            mark=name,
+        )
+    for name, value in trace.attributes.items():
+        if isinstance(value, bool):
+            if name.endswith("_cache_hit"):
+                metrics.inc(
+                    "cache_requests_total",
+                    "Cache lookups by result.",
+                    cache=name[: -len("_cache_hit")],
+                    result="hit" if value else "miss",
+                )
+        elif isinstance(value, int) and name.endswith("_tokens"):
+            metrics.inc(
+                "tokens_total",
+                "Tokens used by traced operations.",
+                value,
+                trace=trace.name,
+                kind=name[: -len("_tokens")],
+            )
+        elif isinstance(value, int):
+            metrics.observe(
+                "trace_count",
+                "Counts recorded by traced operations.",
+                value,
+                buckets=COUNT_BUCKETS,
+                trace=trace.name,
+                attribute=name,
+            )
+
+    if config.METRICS_PATH:
+        write_metrics(config.METRICS_PATH)
+
+
+def write_metrics(path: str) -> None:
+    """
+    Write the metrics to a file, e.g. for node_exporter's textfile collector.
+
+    Args:
+        path (str): Destination file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(metrics.render())
+    os.replace(temporary_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_metrics_exporters() -> None:
+    """
+    Start the ``/metrics`` endpoint on ``METRICS_PORT`` and the JSON trace log.
+
+    Safe to call repeatedly; only the first call has an effect.
+    """
+    global _exporters_started
+    if _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+        if config.METRICS_PORT:
+            try:
+                server = ThreadingHTTPServer(("", config.METRICS_PORT), _MetricsHandler)
+            except OSError:
+                logger.warning(
+                    "Metrics port %s is already in use; not serving /metrics.",
+                    config.METRICS_PORT,
+                )
+                return
+            threading.Thread(
+                target=server.serve_forever, name="metrics-server", daemon=True
+            ).start()
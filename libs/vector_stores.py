@@ -0,0 +1,502 @@
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.vector_stores.pinecone import PineconeVectorStore
+from llama_index.vector_stores.pinecone.base import _to_pinecone_filter
+
+from libs.config import RESEARCH_AREAS, Config
+from libs.http_clients import get_async_http_client
+
+PINECONE_API_VERSION = "2024-07"
+
+PARTITION_KEY = "research_area"
+
+MIGRATION_BATCH_SIZE = 100
+
+
+class AsyncPineconeVectorStore(PineconeVectorStore):
+    """
+    Pinecone vector store with a non-blocking query path.
+
+    ``aquery`` calls the index's data plane REST endpoint through the pooled
+    async HTTP client of the running loop, so concurrent chats share
+    keep-alive connections instead of tying up a thread per query.
+
+    Args:
+        host (str): Data plane host of the index.
+    """
+
+    host: Optional[str] = None
+
+    def __init__(self, *args: Any, host: Optional[str] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.host = host
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AsyncPineconeVectorStore"
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        if query.query_embedding is None or not self.host:
+            return self.query(query, **kwargs)
+
+        payload = {
+            "vector": query.query_embedding,
+            "topK": query.similarity_top_k,
+            "includeMetadata": True,
+            "includeValues": False,
+        }
+        if self.namespace:
+            payload["namespace"] = self.namespace
+        if query.filters is not None:
+            payload["filter"] = _to_pinecone_filter(query.filters)
+
+        response = await get_async_http_client().post(
+            f"https://{self.host}/query",
+            json=payload,
+            headers={
+                "Api-Key": self.api_key,
+                "X-Pinecone-API-Version": PINECONE_API_VERSION,
+            },
+        )
+        response.raise_for_status()
+
+        nodes, similarities, ids = [], [], []
+        for match in response.json().get("matches", []):
+            nodes.append(metadata_dict_to_node(match["metadata"]))
+            similarities.append(match["score"])
+            ids.append(match["id"])
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+
+def partition_name(value: Optional[str]) -> str:
+    """
+    Name the partition of a research area, e.g. "aerial-robot-control".
+
+    Args:
+        value (Optional[str]): Research area. None or "" is the default
+            partition, which also holds vectors written before partitioning.
+
+    Returns:
+        str: Name usable as a Pinecone namespace or a directory name.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", (value or "").casefold()).strip("-")
+
+
+def partition_path(root: str, name: str) -> str:
+    return os.path.join(root, name) if name else root
+
+
+def _split_partition_filter(
+    filters: Optional[MetadataFilters], key: str
+) -> Tuple[Optional[str], Optional[MetadataFilters]]:
+    if filters is None or (
+        filters.condition == FilterCondition.OR and len(filters.filters) > 1
+    ):
+        return None, filters
+    for index, metadata_filter in enumerate(filters.filters):
+        if (
+            isinstance(metadata_filter, MetadataFilter)
+            and metadata_filter.key == key
+            and metadata_filter.operator == FilterOperator.EQ
+        ):
+            rest = filters.filters[:index] + filters.filters[index + 1 :]
+            remaining = (
+                MetadataFilters(filters=rest, condition=filters.condition)
+                if rest
+                else None
+            )
+            return metadata_filter.value, remaining
+    return None, filters
+
+
+def _merge_results(
+    results: Iterable[VectorStoreQueryResult], top_k: int
+) -> VectorStoreQueryResult:
+    matches = [
+        (similarity, node, node_id)
+        for result in results
+        for node, similarity, node_id in zip(
+            result.nodes or [], result.similarities or [], result.ids or []
+        )
+    ]
+    matches.sort(key=lambda match: match[0], reverse=True)
+    # A vector being migrated can briefly be in two partitions.
+    unique, seen = [], set()
+    for match in matches:
+        if match[2] not in seen:
+            seen.add(match[2])
+            unique.append(match)
+    matches = unique[:top_k]
+    return VectorStoreQueryResult(
+        nodes=[node for _, node, _ in matches],
+        similarities=[similarity for similarity, _, _ in matches],
+        ids=[node_id for _, _, node_id in matches],
+    )
+
+
+class PartitionedVectorStore(BasePydanticVectorStore):
+    """
+    Vector store split into one partition per research area.
+
+    Nodes are written to the partition of their ``research_area``. A query
+    filtered on one research area searches only that partition, without the
+    metadata filter, so it no longer scans the whole index. Other queries,
+    such as "All", run on every partition in parallel and the top k results
+    are merged by similarity. Deletes go to every partition, since a paper
+    may have moved between research areas.
+
+    Until ``migrate_to_partitions`` has moved the vectors written before
+    partitioning, which it records in ``migration_path``, a query filtered
+    on one research area also searches the default partition, with the
+    filter, so those vectors are still found.
+
+    Args:
+        factory (Callable[[str], BasePydanticVectorStore]): Opens the store of
+            a partition, given its ``partition_name``.
+        research_areas (Iterable[str]): Research areas whose partitions exist
+            up front; others are opened when first written.
+        partition_key (str, optional): Metadata key that picks the partition.
+            Defaults to "research_area".
+        migration_path (Optional[str], optional): File marking the migration
+            as done. Defaults to None, for a store that never held
+            unpartitioned vectors.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    partition_key: str = PARTITION_KEY
+    migration_path: Optional[str] = None
+
+    _factory: Callable[[str], BasePydanticVectorStore] = PrivateAttr()
+    _partitions: Dict[str, BasePydanticVectorStore] = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _executor: ThreadPoolExecutor = PrivateAttr()
+    _migrated: bool = PrivateAttr()
+
+    def __init__(
+        self,
+        factory: Callable[[str], BasePydanticVectorStore],
+        research_areas: Iterable[str],
+        partition_key: str = PARTITION_KEY,
+        migration_path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(
+            partition_key=partition_key, migration_path=migration_path, **kwargs
+        )
+        self._factory = factory
+        self._migrated = migration_path is None
+        self._lock = threading.Lock()
+        self._partitions = {}
+        for research_area in ["", *research_areas]:
+            self.partition(research_area)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._partitions), thread_name_prefix="partition"
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PartitionedVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def partitions(self) -> Dict[str, BasePydanticVectorStore]:
+        return dict(self._partitions)
+
+    def partition(self, research_area: Optional[str]) -> BasePydanticVectorStore:
+        """
+        Get the store of a research area, opening it on first use.
+
+        Args:
+            research_area (Optional[str]): Research area, or None for the default.
+
+        Returns:
+            BasePydanticVectorStore: Store of the partition.
+        """
+        name = partition_name(research_area)
+        store = self._partitions.get(name)
+        if store is None:
+            with self._lock:
+                store = self._partitions.get(name)
+                if store is None:
+                    store = self._partitions[name] = self._factory(name)
+        return store
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        groups: Dict[str, List[BaseNode]] = {}
+        for node in nodes:
+            groups.setdefault(node.metadata.get(self.partition_key), []).append(node)
+        ids = []
+        for research_area, group in groups.items():
+            ids.extend(self.partition(research_area).add(group, **add_kwargs))
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        for store in self.partitions.values():
+            store.delete(ref_doc_id, **delete_kwargs)
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        for store in self.partitions.values():
+            store.delete_nodes(node_ids, filters, **delete_kwargs)
+
+    def clear(self) -> None:
+        for store in self.partitions.values():
+            store.clear()
+
+    @property
+    def migrated(self) -> bool:
+        """Whether the vectors written before partitioning have been moved."""
+        if not self._migrated:
+            self._migrated = os.path.exists(self.migration_path)
+        return self._migrated
+
+    def _route(
+        self, query: VectorStoreQuery
+    ) -> List[Tuple[BasePydanticVectorStore, VectorStoreQuery]]:
+        research_area, filters = _split_partition_filter(
+            query.filters, self.partition_key
+        )
+        if research_area is None:
+            return [(store, query) for store in self.partitions.values()]
+        routes = [
+            (self.partition(research_area), dataclasses.replace(query, filters=filters))
+        ]
+        if partition_name(research_area) and not self.migrated:
+            routes.append((self.partition(None), query))
+        return routes
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        routes = self._route(query)
+        if len(routes) == 1:
+            store, query = routes[0]
+            return store.query(query, **kwargs)
+        results = self._executor.map(
+            lambda route: route[0].query(route[1], **kwargs), routes
+        )
+        return _merge_results(results, query.similarity_top_k)
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        routes = self._route(query)
+        if len(routes) == 1:
+            store, query = routes[0]
+            return await store.aquery(query, **kwargs)
+        results = await asyncio.gather(
+            *(store.aquery(query, **kwargs) for store, query in routes)
+        )
+        return _merge_results(results, query.similarity_top_k)
+
+
+def _create_partition_factory(
+    config: Config,
+) -> Callable[[str], BasePydanticVectorStore]:
+    if config.VECTOR_STORE_BACKEND == "local":
+        from libs.local_vector_store import LocalVectorStore
+
+        return lambda name: LocalVectorStore(
+            persist_path=partition_path(config.LOCAL_VECTOR_STORE_PATH, name)
+        )
+
+    if config.VECTOR_STORE_BACKEND == "pinecone":
+        from pinecone import Pinecone
+
+        pc = Pinecone(
+            api_key=config.PINECONE_API_KEY,
+        )
+        host = pc.describe_index(config.PINECONE_INDEX).host
+        pinecone_index = pc.Index(host=host)
+        return lambda name: AsyncPineconeVectorStore(
+            pinecone_index=pinecone_index,
+            api_key=config.PINECONE_API_KEY,
+            host=host,
+            namespace=name or None,
+        )
+
+    raise ValueError(f"Unknown vector store backend: {config.VECTOR_STORE_BACKEND}")
+
+
+def create_vector_store(config: Config) -> BasePydanticVectorStore:
+    """
+    Create the vector store selected by ``VECTOR_STORE_BACKEND``.
+
+    With ``VECTOR_STORE_PARTITIONING``, every research area gets its own
+    Pinecone namespace or local shard. Vectors written before partitioning
+    stay searchable until ``python -m libs.vector_stores`` has moved them.
+
+    Args:
+        config (Config): Application configuration.
+
+    Returns:
+        BasePydanticVectorStore: A Pinecone store or the local NumPy store,
+            possibly partitioned.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    factory = _create_partition_factory(config)
+    if config.VECTOR_STORE_PARTITIONING:
+        return PartitionedVectorStore(
+            factory,
+            RESEARCH_AREAS,
+            migration_path=config.VECTOR_STORE_MIGRATION_PATH,
+        )
+    return factory("")
+
+
+def read_records(
+    store: BasePydanticVectorStore,
+) -> Iterable[Tuple[str, List[float], Dict[str, Any]]]:
+    """
+    Read every vector of a store, from every partition if it is partitioned.
+
+    Args:
+        store (BasePydanticVectorStore): A store from ``create_vector_store``.
+
+    Returns:
+        Iterable[Tuple[str, List[float], Dict[str, Any]]]: ``(id, embedding,
+            metadata)`` records, with the metadata as stored by the backend.
+    """
+    from libs.local_vector_store import LocalVectorStore, read_pinecone_records
+
+    if isinstance(store, PartitionedVectorStore):
+        return itertools.chain.from_iterable(
+            read_records(partition) for partition in store.partitions.values()
+        )
+    if isinstance(store, LocalVectorStore):
+        return store.iter_records()
+    return read_pinecone_records(store.client, namespace=store.namespace or "")
+
+
+def _write_records(
+    store: BasePydanticVectorStore,
+    records: List[Tuple[str, List[float], Dict[str, Any]]],
+) -> None:
+    from libs.local_vector_store import LocalVectorStore
+
+    if isinstance(store, LocalVectorStore):
+        store.upsert_records(records)
+        return
+    store.client.upsert(
+        vectors=[
+            {"id": node_id, "values": values, "metadata": metadata}
+            for node_id, values, metadata in records
+        ],
+        namespace=store.namespace or "",
+    )
+
+
+def migrate_to_partitions(
+    store: PartitionedVectorStore,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Move vectors of the default partition to the partition of their research area.
+
+    Vectors are copied before they are deleted, batch by batch, so an
+    interrupted migration can simply be run again. Once every vector has
+    moved, the store's ``migration_path`` is written, so queries on one
+    research area stop searching the default partition.
+
+    Args:
+        store (PartitionedVectorStore): Store to migrate.
+        batch_size (int, optional): Vectors per write. Defaults to 100.
+        dry_run (bool, optional): Only count the vectors to move. Defaults to False.
+
+    Returns:
+        Dict[str, int]: Vectors moved into each partition.
+    """
+    default = store.partition(None)
+    moved: Dict[str, int] = {}
+    batches: Dict[str, List[Tuple[str, List[float], Dict[str, Any]]]] = {}
+
+    def flush(name: str) -> None:
+        records = batches.pop(name, [])
+        if records and not dry_run:
+            _write_records(store.partition(name), records)
+            default.delete_nodes([node_id for node_id, _, _ in records])
+
+    # Read everything first: deleting while paging through Pinecone skips ids.
+    for node_id, values, metadata in list(read_records(default)):
+        name = partition_name(metadata.get(store.partition_key))
+        if not name:
+            continue
+        moved[name] = moved.get(name, 0) + 1
+        batches.setdefault(name, []).append((node_id, values, metadata))
+        if len(batches[name]) >= batch_size:
+            flush(name)
+    for name in list(batches):
+        flush(name)
+
+    if store.migration_path and not dry_run:
+        directory = os.path.dirname(os.path.abspath(store.migration_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{store.migration_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(f"{sum(moved.values())}\n")
+        os.replace(tmp_path, store.migration_path)
+    return moved
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(
+        description="Move vectors into one partition per research area."
+    )
+    argument_parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    argument_parser.add_argument(
+        "--dry-run", action="store_true", help="Only report what would move."
+    )
+    arguments = argument_parser.parse_args()
+
+    config = Config()
+    store = PartitionedVectorStore(
+        _create_partition_factory(config),
+        RESEARCH_AREAS,
+        migration_path=config.VECTOR_STORE_MIGRATION_PATH,
+    )
+    moved = migrate_to_partitions(store, arguments.batch_size, arguments.dry_run)
+    for name, count in sorted(moved.items()):
+        print(f"{name}: {count}")
+    verb = "Would move" if arguments.dry_run else "Moved"
+    print(f"{verb} {sum(moved.values())} vectors")
+
+    if moved and not arguments.dry_run:
+        from libs.resources import get_index_generation
+
+        get_index_generation().bump()
+
+
+if __name__ == "__main__":
+    main()
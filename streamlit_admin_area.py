@@ -1,10 +1,16 @@
 import hmac
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from typing import List, Optional
 
 import streamlit as st
 
-from libs.indexing_articles import embed_documents
+from libs.config import RESEARCH_AREAS
+from libs.indexing_articles import (
+    create_article_metadata,
+    delete_paper,
+    embed_documents,
+    list_papers,
+)
 
 
 def set_page_config():
@@ -53,17 +59,7 @@ def check_password() -> bool:
 
 
 def get_research_areas() -> List[str]:
-    return [
-        "Aerial Robot Control",
-        "Ground Robot Control",
-        "Robot Formation",
-        "Robot Control",
-        "Formation Control",
-        "Human-Robot Interaction",
-        "Artificial Intelligence",
-        "Robotics Competition",
-        "Educational Robotics",
-    ]
+    return list(RESEARCH_AREAS)
 
 
 def display_admin_page() -> None:
@@ -109,6 +105,34 @@ def display_admin_page() -> None:
                 gdrive_url,
             )
 
+    st.markdown("# 🗑️ Remove papers")
+    display_delete_paper_form()
+
+
+def display_delete_paper_form() -> None:
+    """Displays the form for removing an indexed paper."""
+    papers = list_papers()
+    st.caption(
+        "Papers indexed before removal was supported are listed after running "
+        "`python -m libs.paper_ledger`."
+    )
+    if not papers:
+        st.info("No indexed papers were found.")
+        return
+
+    with st.form("delete_form"):
+        paper_key = st.selectbox(
+            "Paper",
+            options=list(papers),
+            format_func=lambda key: f'{papers[key]["metadata"]["article_title"]} ({key})',
+            index=None,
+            placeholder="Select the paper to remove",
+        )
+
+        submitted = st.form_submit_button("Remove")
+        if submitted:
+            handle_paper_deletion(paper_key)
+
 
 def validate_form_data(
     article_doc: bytes,
@@ -133,28 +157,6 @@ def validate_form_data(
     return None
 
 
-def create_article_metadata(
-    article_title: str,
-    first_author: str,
-    research_area: str,
-    publication_year: int,
-    gdrive_url: str,
-) -> Dict[str, Union[str, int]]:
-    """
-    Creates a metadata dictionary for the article.
-
-    Returns:
-        Dict[str, Union[str, int]]: The article metadata.
-    """
-    return {
-        "article_title": article_title,
-        "first_author": first_author,
-        "research_area": research_area,
-        "publication_year": publication_year,
-        "source": gdrive_url,
-    }
-
-
 def handle_form_submission(
     article_doc: Optional[bytes],
     article_title: str,
@@ -201,5 +203,27 @@ def handle_form_submission(
         st.error(f"An error occurred: {str(e)}")
 
 
+def handle_paper_deletion(paper_key: Optional[str]) -> None:
+    """
+    Handles the form submission for removing an article.
+
+    Args:
+        paper_key (Optional[str]): The key of the selected paper.
+    """
+    if not paper_key:
+        st.error("Please select a paper.")
+        return
+
+    try:
+        with st.spinner("Removing the paper..."):
+            deleted = delete_paper(paper_key)
+        if deleted:
+            st.success("Paper removed successfully!")
+        else:
+            st.warning("The paper was not found in the index.")
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
+
+
 set_page_config()
 display_admin_page()
@@ -1,8 +1,14 @@
 from typing import Dict, List
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
+from libs.config import RESEARCH_AREAS, Config
 from libs.inference import chat_answer
+from libs.limiter import DeadlineExceeded
+from libs.streaming import ThrottledRenderer, format_sources
+
+config = Config()
 
 
 def set_page_config():
@@ -40,24 +46,37 @@ def handle_user_input(question: str, research_area: str):
 
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        full_response = ""
+        sources_placeholder = st.empty()
+        renderer = ThrottledRenderer(
+            message_placeholder.markdown,
+            frame_rate=config.STREAM_FRAME_RATE,
+            flush_bytes=config.STREAM_FLUSH_BYTES,
+        )
         sources = []
-
-        for chunk in chat_answer(question, st.session_state.messages, research_area):
-            if isinstance(chunk, list):
-                sources = chunk
-            else:
-                full_response += chunk
-                message_placeholder.markdown(full_response + "▌")
-
-        message_placeholder.markdown(full_response)
-
+        context = get_script_run_ctx()
+
+        try:
+            for chunk in chat_answer(
+                question,
+                st.session_state.messages,
+                research_area,
+                session_id=context.session_id if context else None,
+            ):
+                if isinstance(chunk, list):
+                    if chunk != sources:
+                        sources = chunk
+                        sources_placeholder.markdown(format_sources(sources))
+                else:
+                    renderer.write(chunk)
+        except DeadlineExceeded:
+            renderer.close()
+            st.warning("AuRoRa is very busy right now. Please ask again in a moment.")
+            st.session_state.messages.pop()
+            return
+
+        full_response = renderer.close()
         if sources:
-            source_response = "\nSources:"
-            for index, source in enumerate(sources, start=1):
-                source_response += f"\n\n[{index}] {source}"
-            st.markdown(source_response)
-            full_response += "\n" + source_response
+            full_response += "\n" + format_sources(sources)
 
         st.session_state.messages.append(
             {"role": "assistant", "content": full_response}
@@ -203,18 +222,7 @@ def main():
         st.image("assets/nero_banner.png")
         research_area = st.selectbox(
             "Filter by research area",
-            (
-                "All",
-                "Aerial Robot Control",
-                "Ground Robot Control",
-                "Robot Formation",
-                "Robot Control",
-                "Formation Control",
-                "Human-Robot Interaction",
-                "Artificial Intelligence",
-                "Robotics Competition",
-                "Educational Robotics",
-            ),
+            ("All", *RESEARCH_AREAS),
         )
         st.button("New Chat", on_click=new_chat, type="primary")
         set_sidebar_text()
@@ -0,0 +1,18 @@
+from libs.answer_cache import AnswerCache
+from libs.cache import IndexGeneration
+
+
+def test_answer_generated_before_a_bump_is_not_stored(tmp_path):
+    generation = IndexGeneration(str(tmp_path / "generation"))
+    cache = AnswerCache(generation)
+
+    answer, seen = cache.lookup([1.0, 0.0], "All", "history")
+    assert answer is None
+    generation.bump()
+    cache.store([1.0, 0.0], "All", "history", ["stale"], ["source"], seen)
+    assert cache.stats()["size"] == 0
+
+    answer, seen = cache.lookup([1.0, 0.0], "All", "history")
+    cache.store([1.0, 0.0], "All", "history", ["fresh"], ["source"], seen)
+    answer, _ = cache.lookup([1.0, 0.0], "All", "history")
+    assert list(answer.replay()) == ["fresh", ["source"]]
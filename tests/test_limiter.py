@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from libs.limiter import (
+    ANONYMOUS_SESSION,
+    DeadlineExceeded,
+    UpstreamLimiter,
+    _session,
+    request_scope,
+)
+
+
+async def hold(limiter, session, events, release):
+    with request_scope(session):
+        async with limiter.slot():
+            events.append(session)
+            await release.wait()
+
+
+def test_per_session_cap():
+    async def main():
+        limiter = UpstreamLimiter("test", max_in_flight=10, max_per_session=2)
+        events, release = [], asyncio.Event()
+        tasks = [
+            asyncio.create_task(hold(limiter, "a", events, release)) for _ in range(3)
+        ]
+        tasks.append(asyncio.create_task(hold(limiter, "b", events, release)))
+        await asyncio.sleep(0.01)
+
+        assert sorted(events) == ["a", "a", "b"]
+        assert limiter.in_flight == 3
+        assert limiter.queued == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert events.count("a") == 3
+        assert limiter.in_flight == 0
+        assert limiter.queued == 0
+
+    asyncio.run(main())
+
+
+def test_freed_slots_go_to_sessions_in_turn():
+    async def main():
+        limiter = UpstreamLimiter("test", max_in_flight=1, max_per_session=1)
+        order = []
+
+        async def call(session):
+            with request_scope(session):
+                async with limiter.slot():
+                    order.append(session)
+                    await asyncio.sleep(0)
+
+        # Session "a" queues many calls before "b" and "c" queue one each.
+        blocker = asyncio.Event()
+        first = asyncio.create_task(hold(limiter, "x", [], blocker))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(call("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call(session)) for session in ("b", "c")]
+        await asyncio.sleep(0)
+
+        blocker.set()
+        await asyncio.gather(first, *tasks)
+        assert order == ["a", "b", "c", "a", "a"]
+
+    asyncio.run(main())
+
+
+def test_expired_deadline_is_shed_without_queueing():
+    async def main():
+        limiter = UpstreamLimiter("test", max_in_flight=1, max_per_session=1)
+        with request_scope("a", timeout=0.01):
+            await asyncio.sleep(0.02)
+            with pytest.raises(DeadlineExceeded):
+                await limiter.acquire()
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_queued_call_is_shed_at_the_deadline():
+    async def main():
+        limiter = UpstreamLimiter("test", max_in_flight=1, max_per_session=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(limiter, "a", [], release))
+        await asyncio.sleep(0)
+
+        with request_scope("b", timeout=0.05):
+            with pytest.raises(DeadlineExceeded):
+                await limiter.acquire()
+        assert limiter.queued == 0
+
+        release.set()
+        await holder
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_scopes_without_a_session_get_their_own():
+    sessions = []
+    for _ in range(2):
+        with request_scope():
+            sessions.append(_session.get())
+            with request_scope():
+                assert _session.get() == sessions[-1]
+
+    assert ANONYMOUS_SESSION not in sessions
+    assert sessions[0] != sessions[1]
@@ -0,0 +1,153 @@
+import multiprocessing
+import random
+import zlib
+
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import (
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+)
+
+from libs.local_vector_store import LocalVectorStore
+
+DIMENSION = 4
+
+
+def make_record(node_id, area="Robot Control", seed=None):
+    rng = np.random.default_rng(
+        seed if seed is not None else zlib.crc32(node_id.encode())
+    )
+    return node_id, rng.normal(size=DIMENSION).tolist(), {"research_area": area}
+
+
+def stored(store):
+    return {node_id: metadata for node_id, _, metadata in store.iter_records()}
+
+
+def test_upsert_delete_reload_round_trip(tmp_path):
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    store.upsert_records([make_record(f"n{i}") for i in range(5)])
+    store.upsert_records([make_record("n1", "Robot Formation"), make_record("n5")])
+    store.delete_nodes(["n2"])
+
+    expected = {f"n{i}" for i in (0, 1, 3, 4, 5)}
+    assert set(stored(store)) == expected
+    reloaded = LocalVectorStore(persist_path=str(tmp_path))
+    assert set(stored(reloaded)) == expected
+    assert stored(reloaded)["n1"] == {"research_area": "Robot Formation"}
+
+
+def test_query_returns_the_nodes_added(tmp_path):
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    store.add(
+        [
+            TextNode(id_=node_id, text=node_id, embedding=values, metadata=metadata)
+            for node_id, values, metadata in map(make_record, ["a", "b", "c"])
+        ]
+    )
+    store.delete_nodes(["c"])
+    _, embedding, _ = make_record("b")
+
+    result = LocalVectorStore(persist_path=str(tmp_path)).query(
+        VectorStoreQuery(query_embedding=embedding, similarity_top_k=3)
+    )
+    assert result.ids[0] == "b"
+    assert result.nodes[0].get_content() == "b"
+    assert result.similarities[0] == pytest.approx(1.0, abs=1e-5)
+    assert "c" not in result.ids
+
+
+def test_delete_nodes_with_filters(tmp_path):
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    store.upsert_records(
+        [make_record("a", "Robot Control"), make_record("b", "Robot Formation")]
+    )
+    filters = MetadataFilters(
+        filters=[MetadataFilter(key="research_area", value="Robot Formation")]
+    )
+    store.delete_nodes(["a", "b"], filters=filters)
+
+    assert set(stored(store)) == {"a"}
+    result = store.query(
+        VectorStoreQuery(query_embedding=[1.0] * DIMENSION, filters=filters)
+    )
+    assert result.ids == []
+
+
+def test_tombstones_survive_merges(tmp_path):
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    store.upsert_records([make_record(f"old{i}") for i in range(8)])
+    store.delete_nodes(["old3"])
+    # Small writes after the tombstone merge the newest segments together.
+    for i in range(6):
+        store.upsert_records([make_record(f"new{i}")])
+    store.upsert_records([make_record("old3")])
+    store.delete_nodes(["new0"])
+    for i in range(6, 10):
+        store.upsert_records([make_record(f"new{i}")])
+
+    expected = {f"old{i}" for i in range(8)} | {f"new{i}" for i in range(1, 10)}
+    assert set(stored(store)) == expected
+    assert set(stored(LocalVectorStore(persist_path=str(tmp_path)))) == expected
+
+
+def test_matches_a_reference_model(tmp_path):
+    rng = random.Random(0)
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    expected = {}
+    for _ in range(60):
+        if expected and rng.random() < 0.3:
+            node_ids = rng.sample(sorted(expected), k=min(len(expected), 3))
+            store.delete_nodes(node_ids)
+            for node_id in node_ids:
+                expected.pop(node_id)
+        else:
+            records = [
+                make_record(f"n{rng.randrange(40)}", seed=rng.randrange(1000))
+                for _ in range(rng.randrange(1, 6))
+            ]
+            store.upsert_records(records)
+            expected.update({node_id: values for node_id, values, _ in records})
+
+    for current in (store, LocalVectorStore(persist_path=str(tmp_path))):
+        records = {node_id: values for node_id, values, _ in current.iter_records()}
+        assert set(records) == set(expected)
+        for node_id, values in expected.items():
+            normalized = np.asarray(values) / np.linalg.norm(values)
+            assert np.allclose(records[node_id], normalized, atol=1e-5)
+
+
+def _write_records(path, prefix, count):
+    store = LocalVectorStore(persist_path=path)
+    for i in range(count):
+        store.upsert_records([make_record(f"{prefix}{i}")])
+
+
+def test_concurrent_writers_keep_each_others_records(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_write_records, args=(str(tmp_path), prefix, 15))
+        for prefix in ("a", "b", "c")
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    expected = {f"{prefix}{i}" for prefix in ("a", "b", "c") for i in range(15)}
+    assert set(stored(LocalVectorStore(persist_path=str(tmp_path)))) == expected
+
+
+def test_clear_removes_everything(tmp_path):
+    store = LocalVectorStore(persist_path=str(tmp_path))
+    store.upsert_records([make_record("a"), make_record("b")])
+    store.clear()
+
+    assert stored(store) == {}
+    assert stored(LocalVectorStore(persist_path=str(tmp_path))) == {}
+    store.upsert_records([make_record("c")])
+    assert set(stored(LocalVectorStore(persist_path=str(tmp_path)))) == {"c"}
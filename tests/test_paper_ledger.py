@@ -0,0 +1,71 @@
+import multiprocessing
+
+from libs.paper_ledger import PaperLedger
+
+METADATA = {
+    "article_title": "Formation Control of Aerial Robots",
+    "first_author": "Author",
+    "research_area": "Formation Control",
+    "publication_year": 2020,
+    "source": "https://example.org/papers/1",
+}
+
+
+def test_record_and_remove(tmp_path):
+    ledger = PaperLedger(str(tmp_path / "ledger.json"))
+    ledger.record("paper-1", "doc-1", METADATA, ["a", "b"])
+    ledger.record("paper-2", "doc-2", METADATA, ["c"])
+    ledger.record("paper-1", "doc-3", METADATA, ["d"])
+
+    reopened = PaperLedger(str(tmp_path / "ledger.json"))
+    assert set(reopened.papers()) == {"paper-1", "paper-2"}
+    assert reopened.get("paper-1")["document_id"] == "doc-3"
+    assert reopened.get("paper-1")["chunk_ids"] == ["d"]
+
+    removed = reopened.remove("paper-1")
+    assert removed["chunk_ids"] == ["d"]
+    assert reopened.remove("paper-1") is None
+    assert set(ledger.papers()) == {"paper-2"}
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_backfill_groups_chunks_by_source(tmp_path):
+    ledger = PaperLedger(str(tmp_path / "ledger.json"))
+    ledger.record(METADATA["source"], "doc-1", METADATA, ["known"])
+    other = {**METADATA, "source": "https://example.org/papers/2", "doc_id": "x"}
+    records = [
+        ("known", [0.0], METADATA),
+        ("c1", [0.0], other),
+        ("c2", [0.0], other),
+        ("orphan", [0.0], {"article_title": "No source"}),
+    ]
+
+    assert ledger.backfill(records) == 1
+    assert ledger.get(METADATA["source"])["chunk_ids"] == ["known"]
+    entry = ledger.get(other["source"])
+    assert entry["document_id"] is None
+    assert entry["chunk_ids"] == ["c1", "c2"]
+    assert "doc_id" not in entry["metadata"]
+    assert ledger.backfill(records) == 0
+
+
+def _record_papers(path, prefix, count):
+    ledger = PaperLedger(path)
+    for i in range(count):
+        ledger.record(f"{prefix}{i}", f"doc-{prefix}{i}", METADATA, [f"{prefix}{i}"])
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    path = str(tmp_path / "ledger.json")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_record_papers, args=(path, prefix, 20))
+        for prefix in ("a", "b", "c")
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert len(PaperLedger(path).papers()) == 60